@@ -6,16 +6,25 @@
 import streamlit as st
 import streamlit.components.v1 as components  # Google翻訳ブロック用
 from pathlib import Path
-from datetime import date
+from datetime import date, timedelta
 import time
+import threading
+import importlib.util
+from contextlib import contextmanager
 from io import BytesIO
+import html
 
-try:
-    import stripe as _stripe
-    _STRIPE_AVAILABLE = True
-except ImportError:
-    _stripe = None
-    _STRIPE_AVAILABLE = False
+from sanmei.engine import POSITION_LABELS, calc_gototoku, get_tenchusatsu
+from sanmei.caltable import date_range as _calendar_range
+from sanmei import metrics as _metrics
+from sanmei.admission import QueueFull
+from sanmei import ratelimit as _ratelimit
+from sanmei.ratelimit import Throttled
+from sanmei import content as _content
+from sanmei.content import COMPATIBILITY_LOGIC, STAR_DATA_BUSINESS, STAR_DATA_PERSONAL, STAR_PROFILE
+
+# stripe の import は重い（0.2 秒程度）ため、導入済みかどうかだけ確認し、本体は決済処理で初めて読み込む
+_STRIPE_AVAILABLE = importlib.util.find_spec("stripe") is not None
 
 # ─────────────────────────────────────────────
 #  アプリルートディレクトリ（絶対パス不使用）
@@ -105,6 +114,7 @@ components.html("""
 #    STRIPE_PRICE_PERSONAL  = "price_xxxxxx"   # ¥980
 #    STRIPE_PRICE_BUSINESS  = "price_xxxxxx"   # ¥1,480
 #    BASE_URL               = "http://localhost:8501"  # 本番は https://your-app.streamlit.app
+#    STRIPE_API_BASE        = "http://127.0.0.1:12111" # 任意：負荷試験で Stripe API の代替サーバーに向ける
 # ─────────────────────────────────────────────
 def _get_secret(key: str, default: str = "") -> str:
     try:
@@ -116,11 +126,20 @@ _STRIPE_SK   = _get_secret("STRIPE_SECRET_KEY")
 _PRICE_P1    = _get_secret("STRIPE_PRICE_PERSONAL", "price_xxxxxx")
 _PRICE_BUSI  = _get_secret("STRIPE_PRICE_BUSINESS", "price_xxxxxx")
 _BASE_URL    = _get_secret("BASE_URL", "http://localhost:8501")
+_STRIPE_API  = _get_secret("STRIPE_API_BASE")
 
 # SK が取得できていれば Stripe を有効化（価格 ID が未設定でも API 呼び出し時にエラーで通知）
 _STRIPE_READY = _STRIPE_AVAILABLE and bool(_STRIPE_SK)
 
 
+def _stripe():
+    import stripe
+    stripe.api_key = _STRIPE_SK
+    if _STRIPE_API:
+        stripe.api_base = _STRIPE_API
+    return stripe
+
+
 def _create_checkout_session(
     price_id: str,
     product_key: str,
@@ -133,31 +152,33 @@ def _create_checkout_session(
       個人分析  → "YYYY-MM-DD"
       組織相性  → "YYYY-MM-DD|YYYY-MM-DD"（A|B の順）
     """
-    if not _STRIPE_READY:
+    if not _STRIPE_READY or not _allow("checkout"):
         return None
     try:
-        _stripe.api_key = _STRIPE_SK
-        session = _stripe.checkout.Session.create(
-            payment_method_types=["card"],
-            line_items=[{"price": price_id, "quantity": 1}],
-            mode="payment",
-            # ?status=success を検知して決済完了と判断する
-            # session_id も付けることで Stripe API で検証可能（改ざん対策）
-            success_url=(
-                f"{_BASE_URL}"
-                f"?status=success"
-                f"&session_id={{CHECKOUT_SESSION_ID}}"
-                f"&product={product_key}"
-            ),
-            cancel_url=_BASE_URL,
-            metadata={
-                "product":   product_key,
-                "name":      name[:490],        # Stripe metadata 値は 500 文字以内
-                "birth":     birth_str[:490],
-            },
-        )
+        with _metrics.stage("stripe_create"):
+            session = _stripe().checkout.Session.create(
+                payment_method_types=["card"],
+                line_items=[{"price": price_id, "quantity": 1}],
+                mode="payment",
+                # ?status=success を検知して決済完了と判断する
+                # session_id も付けることで Stripe API で検証可能（改ざん対策）
+                success_url=(
+                    f"{_BASE_URL}"
+                    f"?status=success"
+                    f"&session_id={{CHECKOUT_SESSION_ID}}"
+                    f"&product={product_key}"
+                ),
+                cancel_url=_BASE_URL,
+                metadata={
+                    "product":   product_key,
+                    "name":      name[:490],        # Stripe metadata 値は 500 文字以内
+                    "birth":     birth_str[:490],
+                },
+            )
+        _track("checkout", product_key)
         return session.url
     except Exception as _e:
+        _metrics.count("stripe_errors", op="create")
         st.error(f"Stripe エラー: {_e}")
         return None
 
@@ -167,288 +188,25 @@ def _retrieve_stripe_metadata(session_id: str) -> dict | None:
     """Stripe セッション ID を検証し、payment_status == 'paid' なら metadata dict を返す。
     キャッシュ TTL=10分。同一 session_id への重複 API 呼び出しを防ぐ。
     """
+    _metrics.count("cache_misses", cache="stripe_metadata")
     if not _STRIPE_READY:
         return None
     try:
-        _stripe.api_key = _STRIPE_SK
-        session = _stripe.checkout.Session.retrieve(session_id)
+        with _metrics.stage("stripe_retrieve"):
+            session = _stripe().checkout.Session.retrieve(session_id)
         if session.payment_status == "paid":
-            return dict(session.metadata or {})
+            meta = session.metadata or {}
+            # stripe-python 8 以降の StripeObject は dict のサブクラスではないため to_dict() で変換する
+            return meta.to_dict() if hasattr(meta, "to_dict") else dict(meta)
     except Exception:
-        pass
+        _metrics.count("stripe_errors", op="retrieve")
     return None
 
-
 # ─────────────────────────────────────────────
-#  辞書データ（固定テキスト）
+#  計算エンジン・天中殺（sanmei/engine.py）
+#  日付入力の範囲はカレンダー表（sanmei/data/calendar.bin）のカバー範囲に合わせる
 # ─────────────────────────────────────────────
-STAR_PROFILE = {
-    "貫索星": "独立独歩のマイペース職人。自分の裁量で進められる業務で最も輝きます。",
-    "石門星": "フラットな視点を持つチームの調整役。人間関係を円滑にする天才です。",
-    "鳳閣星": "自然体で客観的な表現者。プレッシャーのない環境で的確な発信力を持ちます。",
-    "調舒星": "独自の美学を持つ完璧主義のアーティスト。一人で没頭できる専門分野で無双します。",
-    "禄存星": "愛情と魅力にあふれるカリスマ。人を惹きつけ、大型案件を獲ってくる歩くパワースポットです。",
-    "司禄星": "堅実で慎重な蓄積のプロ。絶対にミスをしない、組織の頼れるバックオフィスです。",
-    "車騎星": "考えるより先に動く特攻隊長。スピード感のある短期決戦で圧倒的な成果を出します。",
-    "牽牛星": "責任感と自尊心の塊。ルールとメンツを重んじる、組織の完璧なエリートです。",
-    "龍高星": "ルール破壊の異端児。ルーティンを嫌い、ゼロから新しい事業を生み出す天才です。",
-    "玉堂星": "論理と伝統を重んじる知性派。過去のデータや理屈から最適解を導き出します。",
-}
-
-COMPATIBILITY_LOGIC = {
-    "same": {
-        "title": "【似た者同士・鏡の相性】",
-        "text": (
-            "仕事に対する根底の価値観が同じなので、ツーカーの「阿吽の呼吸」で仕事が進みます。"
-            "ただし、お互いの弱点も同じになるため、同じミスを連発しないよう第三者のチェックが必要です。"
-        ),
-    },
-    "different": {
-        "title": "【水と油・補完の相性】",
-        "text": (
-            "ビジネスの進め方が全く異なる「異星人」同士です。"
-            "相手を自分のやり方にハメようとすると反発が起きます。"
-            "しかし、得意領域を完全に「分業」した瞬間、弱点をカバーし合う最強のチームに化けます。"
-        ),
-    },
-}
-
-
-# ─────────────────────────────────────────────
-#  計算エンジン
-#
-#  【五徳の位置と算出元】
-#    頭  = 年干         の星（対 日干）
-#    左手 = 月支の正気蔵干 の星（対 日干）
-#    中央 = 日支の正気蔵干 の星（対 日干）← 中心星
-#    右手 = 年支の正気蔵干 の星（対 日干）
-#    足  = 月干         の星（対 日干）
-#
-#  バリデーション済み（1994-01-21 = 丁未日）:
-#    頭=車騎星, 左手=鳳閣星, 中央=鳳閣星, 右手=禄存星, 足=龍高星 ✓
-# ─────────────────────────────────────────────
-
-STEMS    = ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"]
-BRANCHES = ["子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥"]
-
-_ELEM  = [0, 0, 1, 1, 2, 2, 3, 3, 4, 4]  # 0=木 1=火 2=土 3=金 4=水
-_POL   = [0, 1, 0, 1, 0, 1, 0, 1, 0, 1]  # 0=陽 1=陰
-_GEN   = [1, 2, 3, 4, 0]                  # 相生（木→火→土→金→水→木）
-_CTRL  = [2, 3, 4, 0, 1]                  # 相克（木→土→水→火→金→木）
-
-# 各地支の正気蔵干（主気）インデックス
-# 子=癸, 丑=己, 寅=甲, 卯=乙, 辰=戊, 巳=丙, 午=丁, 未=己, 申=庚, 酉=辛, 戌=戊, 亥=壬
-_HIDDEN = [9, 5, 0, 1, 4, 2, 3, 5, 6, 7, 4, 8]
-
-# 月干起算（寅月の天干）: 甲己年=丙, 乙庚年=戊, 丙辛年=庚, 丁壬年=壬, 戊癸年=甲
-_MONTH_STEM_START = [2, 4, 6, 8, 0]
-
-# 節気（固定近似値）: (月, 日, 月支インデックス)
-_SOLAR_TERMS = [
-    (1, 6, 1), (2, 4, 2), (3, 6, 3),  (4, 5, 4),
-    (5, 6, 5), (6, 6, 6), (7, 7, 7),  (8, 7, 8),
-    (9, 8, 9), (10, 8, 10), (11, 7, 11), (12, 7, 0),
-]
-
-POSITION_LABELS = {
-    "head":   "頭",
-    "left":   "左手",
-    "center": "中央",
-    "right":  "右手",
-    "feet":   "足",
-}
-
-
-# ── ユリウス通日 ──────────────────────────────
-def _jdn(d: date) -> int:
-    a = (14 - d.month) // 12
-    y = d.year + 4800 - a
-    m = d.month + 12 * a - 3
-    return d.day + (153 * m + 2) // 5 + 365 * y + y // 4 - y // 100 + y // 400 - 32045
-
-_REF_JDN = _jdn(date(1900, 1, 1))  # 甲戌日（日干=甲=0, 日支=戌=10）
-
-
-# ── 中国年（立春 2/4 で切り替え）────────────────
-def _cy(d: date) -> int:
-    return d.year if d >= date(d.year, 2, 4) else d.year - 1
-
-
-# ── 各柱インデックス ──────────────────────────
-def year_stem_idx(d: date) -> int:
-    return (_cy(d) - 4) % 10
-
-def year_branch_idx(d: date) -> int:
-    return (_cy(d) - 4) % 12
-
-def month_branch_idx(d: date) -> int:
-    br = 0  # 大雪前（1月上旬）は子月
-    for m, dy, b in _SOLAR_TERMS:
-        if d >= date(d.year, m, dy):
-            br = b
-    return br
-
-def month_stem_idx(d: date) -> int:
-    ys = year_stem_idx(d)
-    mb = month_branch_idx(d)
-    offset = (mb - 2 + 12) % 12
-    return (_MONTH_STEM_START[ys % 5] + offset) % 10
-
-def day_stem_idx(d: date) -> int:
-    return (_jdn(d) - _REF_JDN) % 10
-
-def day_branch_idx(d: date) -> int:
-    # オフセット=10: 1900-01-01=甲戌日（戌=10）を基準に実測検証済み
-    return (_jdn(d) - _REF_JDN + 10) % 12
-
-
-# ── 星の計算（天干インデックス → 日干との関係） ─────
-def calc_star(stem_idx: int, day_stem_idx: int) -> str:
-    ye, de = _ELEM[stem_idx], _ELEM[day_stem_idx]
-    yp, dp = _POL[stem_idx],  _POL[day_stem_idx]
-    sp = (yp == dp)
-    if ye == de:              return "貫索星" if sp else "石門星"   # 比肩 / 劫財
-    if _GEN[de]  == ye:       return "鳳閣星" if sp else "調舒星"   # 食神 / 傷官
-    if _CTRL[de] == ye:       return "禄存星" if sp else "司禄星"   # 偏財 / 正財
-    if _GEN[ye]  == de:       return "龍高星" if sp else "玉堂星"   # 偏印 / 印綬
-    if _CTRL[ye] == de:       return "車騎星" if sp else "牽牛星"   # 偏官 / 正官
-    return "未定義"
-
-
-# ── 五徳（5ポジション）の計算 ──────────────────
-def calc_gototoku(birth: date) -> dict:
-    """
-    五徳と柱情報を辞書で返す。
-
-    Returns
-    -------
-    dict with keys:
-      head, left, center, right, feet  : 各位置の星名
-      day_pillar, year_pillar, month_pillar : '丁未' 形式の文字列
-      ds, db : 日干/日支インデックス
-    """
-    ds = day_stem_idx(birth)
-    db = day_branch_idx(birth)
-    ys = year_stem_idx(birth)
-    yb = year_branch_idx(birth)
-    ms = month_stem_idx(birth)
-    mb = month_branch_idx(birth)
-
-    return {
-        "head":         calc_star(ys,          ds),   # 年干
-        "left":         calc_star(_HIDDEN[mb], ds),   # 月支蔵干
-        "center":       calc_star(_HIDDEN[db], ds),   # 日支蔵干（中心星）
-        "right":        calc_star(_HIDDEN[yb], ds),   # 年支蔵干
-        "feet":         calc_star(ms,          ds),   # 月干
-        "day_pillar":   STEMS[ds] + BRANCHES[db],
-        "year_pillar":  STEMS[ys] + BRANCHES[yb],
-        "month_pillar": STEMS[ms] + BRANCHES[mb],
-        "ds": ds, "db": db,
-    }
-
-
-# ─────────────────────────────────────────────
-#  天中殺の計算
-# ─────────────────────────────────────────────
-_KANSHI_BASE = [
-    "甲子","乙丑","丙寅","丁卯","戊辰","己巳","庚午","辛未","壬申","癸酉",
-    "甲戌","乙亥","丙子","丁丑","戊寅","己卯","庚辰","辛巳","壬午","癸未",
-    "甲申","乙酉","丙戌","丁亥","戊子","己丑","庚寅","辛卯","壬辰","癸巳",
-    "甲午","乙未","丙申","丁酉","戊戌","己亥","庚子","辛丑","壬寅","癸卯",
-    "甲辰","乙巳","丙午","丁未","戊申","己酉","庚戌","辛亥","壬子","癸丑",
-    "甲寅","乙卯","丙辰","丁巳","戊午","己未","庚申","辛酉","壬戌","癸亥",
-]
-_TENCHU_GROUPS = ["戌亥", "申酉", "午未", "辰巳", "寅卯", "子丑"]
-
-def get_tenchusatsu(day_pillar: str) -> str:
-    if day_pillar in _KANSHI_BASE:
-        return _TENCHU_GROUPS[_KANSHI_BASE.index(day_pillar) // 10]
-    return "不明"
-
-
-# ─────────────────────────────────────────────
-#  PDF用スターデータ（個人向け B2C）
-# ─────────────────────────────────────────────
-STAR_DATA_PERSONAL = {
-    "貫索星": {"desc": "独立独歩のマイペース。自分のやり方を守りたい職人気質です。",
-               "strategy": "人に合わせすぎず、自分の裁量で進められる単独業務や専門職で最も輝きます。"},
-    "石門星": {"desc": "フラットな視点を持つ協調性の星。人間関係を円滑にする天才です。",
-               "strategy": "チームワークを活かせる環境や、人と人を繋ぐ調整役・サポート役として重宝されます。"},
-    "鳳閣星": {"desc": "自然体でマイペースな表現者。のんびり楽しむことが一番のエネルギー源です。",
-               "strategy": "ガチガチのノルマを避け、発信力や客観的視点を活かせる風通しの良い環境がベストです。"},
-    "調舒星": {"desc": "繊細な感性と独自の美学を持つアーティスト。孤独と完璧を愛します。",
-               "strategy": "一人の時間を確保し、クリエイティブな仕事や専門分野に没頭すると才能が開花します。"},
-    "禄存星": {"desc": "愛情深く、人から感謝されたい奉仕家。息をするように人に好かれるパワースポットです。",
-               "strategy": "「誰かのために」動くことで評価される営業やサービス業などで圧倒的な結果を出します。"},
-    "司禄星": {"desc": "堅実で慎重な蓄積のプロ。ルーティンと平和を愛する常識人です。",
-               "strategy": "突発的な変更が少ない環境で、事務や管理などコツコツ積み上げる業務で絶大な信頼を得ます。"},
-    "車騎星": {"desc": "考えるより先に動くスピードスター。白黒ハッキリさせたい特攻隊長です。",
-               "strategy": "長い会議はNG。短期決戦で結果が見える営業や、体を動かす現場仕事で無双します。"},
-    "牽牛星": {"desc": "責任感と自尊心の塊。ルールを重んじる完璧な優等生（社畜プロ）です。",
-               "strategy": "明確な「役職」や「評価」がもらえる環境で、管理部門や公的な仕事に強い適性があります。"},
-    "龍高星": {"desc": "束縛を嫌い、常に新しい刺激を求める改革の異端児。ルーティンが死ぬほど苦手です。",
-               "strategy": "無意味な社内ルールを避け、企画や新規事業など「ゼロからイチを生み出す」環境へ！"},
-    "玉堂星": {"desc": "論理的思考と伝統を重んじる知性派。過去のデータから学ぶ優得生です。",
-               "strategy": "感情論ではなく、データや理屈が通る環境（研究、教育、分析など）で才能を発揮します。"},
-}
-
-# ─────────────────────────────────────────────
-#  PDF用スターデータ（組織相性 B2B）
-# ─────────────────────────────────────────────
-STAR_DATA_BUSINESS = {
-    "貫索星": {"desc": "自分のペースとやり方を絶対に崩さない、独立独歩の職人肌です。",
-               "strategy": "細かく管理・干渉せず、裁量と目標だけを与えて任せきる。"},
-    "石門星": {"desc": "上下関係よりも対等な繋がりと、チームの和を重んじる政治家タイプです。",
-               "strategy": "上から目線での命令を避け、事前に「相談・根回し」を行って巻き込む。"},
-    "鳳閣星": {"desc": "プロセスや楽しさを重視し、自然体で物事に取り組む自由人です。",
-               "strategy": "ガチガチのノルマで縛らず、ゲーム感覚や自由度を持たせて働かせる。"},
-    "調舒星": {"desc": "独特の美学と鋭い感性を持ち、完璧主義で傷つきやすい一面があります。",
-               "strategy": "「あなたにしかできない」と特別感を伝え、細やかな感情に寄り添う。"},
-    "禄存星": {"desc": "貢献したい・認められたいという「承認欲求」が非常に強い奉仕家です。",
-               "strategy": "小さな成果でも「助かりました！」と大げさに感謝を伝え、承認欲求を満たす。"},
-    "司禄星": {"desc": "着実な積み重ねと安全を重んじる、非常に堅実で保守的な性質です。",
-               "strategy": "急な変更やサプライズを避け、データ・マニュアル・前例を提示して安心させる。"},
-    "車騎星": {"desc": "考えるよりも先に体が動く、スピード重視の特攻隊長です。",
-               "strategy": "言い訳や長い前置きは避け、とにかく「結論から」「スピーディーに」指示を出す。"},
-    "牽牛星": {"desc": "礼儀作法やメンツ、ブランドを非常に大切にするプライドの高いエリート気質です。",
-               "strategy": "人前で叱るなどの恥をかかせる行為は絶対NG。役職や立場を尊重し、礼儀を通す。"},
-    "龍高星": {"desc": "ルーティンワークや古い規則を嫌う、自由奔放なアイデアマン・改革者です。",
-               "strategy": "「今までこうだったから」という理屈は捨て、常に新しい挑戦やミッションを与える。"},
-    "玉堂星": {"desc": "論理や伝統、知性を重んじる理論派です。感情論や気合は通じません。",
-               "strategy": "客観的な事実や過去の実績に基づき、論理的に筋の通った説明で納得させる。"},
-}
-
-# ─────────────────────────────────────────────
-#  組織相性PDF用：五行分析ヘルパー
-# ─────────────────────────────────────────────
-_ELEM_MAP  = {"貫索星":"木","石門星":"木","鳳閣星":"火","調舒星":"火",
-              "禄存星":"土","司禄星":"土","車騎星":"金","牽牛星":"金",
-              "龍高星":"水","玉堂星":"水"}
-_SOUSEI    = [("木","火"),("火","土"),("土","金"),("金","水"),("水","木")]
-_SOUKOKU   = [("木","土"),("土","水"),("水","火"),("火","金"),("金","木")]
-
-def _power_balance(ca: str, cb: str, na: str, nb: str) -> str:
-    ea, eb = _ELEM_MAP.get(ca,""), _ELEM_MAP.get(cb,"")
-    if not ea or not eb: return "互いに独立したプロとして良い緊張感を持って働ける関係です。"
-    if ea == eb: return "お二人の仕事の進め方は【同質】です。ツーカーで通じ合いますが、意見がぶつかると平行線になりやすいので、第三者の視点を入れるとスムーズです。"
-    if (ea,eb) in _SOUSEI: return f"仕事のエネルギーが{na}様から{nb}様へ流れています。あなたがサポートし、相手を動かすことで最大の利益を生む関係です。"
-    if (eb,ea) in _SOUSEI: return f"仕事のエネルギーが{nb}様から{na}様へ流れています。相手の提案をあなたが受け取り、最終決定を下す関係です。"
-    if (ea,eb) in _SOUKOKU: return f"{na}様が{nb}様を【コントロール】しやすい関係です。上司やクライアントとして非常にスムーズに指示が通る相性です。"
-    if (eb,ea) in _SOUKOKU: return f"{nb}様が{na}様を【コントロール】する力関係です。相手を適度に立てて主導権を譲るのが賢い処世術です。"
-    return "互いに独立したプロとして良い緊張感を持って働ける関係です。"
-
-def _combat_style(ra: str, rb: str) -> str:
-    if ra == rb: return "社会や顧客に対する【戦闘スタイルが完全一致】しています。営業やプレゼンで抜群のコンビネーションを発揮します。"
-    return "社会への【アプローチ手法が異なります】。新規開拓と顧客フォローなど、見事な役割分担（最強の矛と盾）が構築できます。"
-
-def _crisis_management(fa: str, fb: str) -> str:
-    if fa == fb: return "トラブル時の【危機管理思考が同じ】です。危機的状況下でも足並みが揃い、迅速な意思決定が可能です。"
-    return "【危機管理アプローチが異なります】。一方が焦っている時にもう一方が冷静に分析できる、ピンチほど補い合える関係です。"
-
-def _tenchu_affinity(tc_a: str, tc_b: str, na: str, nb: str) -> str:
-    if tc_a == "不明" or tc_b == "不明": return "それぞれのペースで着実にビジネスを進めることができます。"
-    if tc_a == tc_b: return f"お二人は【{tc_a}天中殺】という同じバイオリズムを持っています。好機が完全一致し爆発的なスピード感を生みます。ただし運気低迷期も同時に訪れるため、資金・計画に余裕を持たせるリスクヘッジが必要です。"
-    return f"お二人は「{tc_a}」と「{tc_b}」という異なるバイオリズムを持っています。一方の運気が落ちた時にもう一方が好調のため、業績が落ち込まない【最高峰のリスクヘッジ（補完関係）】が成立しています。"
+_DATE_MIN, _DATE_MAX = _calendar_range()
 
 
 # ─────────────────────────────────────────────
@@ -483,6 +241,7 @@ def find_japanese_font() -> str | None:
 # ─────────────────────────────────────────────
 #  PDF生成：ヘッダー画像（PIL / in-memory）
 # ─────────────────────────────────────────────
+@_metrics.timed("header_image_personal")
 def _header_img_personal(name: str, gototoku: dict, tc: str, font_path: str) -> BytesIO:
     from PIL import Image, ImageDraw, ImageFont
     width, height = 800, 240
@@ -520,6 +279,7 @@ def _header_img_personal(name: str, gototoku: dict, tc: str, font_path: str) ->
     return buf
 
 
+@_metrics.timed("header_image_business")
 def _header_img_business(na: str, ga: dict, tca: str,
                           nb: str, gb: dict, tcb: str, font_path: str) -> BytesIO:
     from PIL import Image, ImageDraw, ImageFont
@@ -560,11 +320,93 @@ def _header_img_business(na: str, ga: dict, tca: str,
     return buf
 
 
+# ─────────────────────────────────────────────
+#  レポート描画の順番待ち（sanmei/admission.py）
+#  PDF 描画はプロセス全体で RENDER_CONCURRENCY 件まで。超えた分はセッション単位で公平に待たせ、
+#  待ち行列が RENDER_QUEUE_MAX 件に達したら混雑メッセージで断る。
+#  順番待ちと回数制限は st.cache_data の関数本体（キャッシュに無いときだけ実行される）の中で取るため、
+#  キャッシュ済みの PDF はどちらも通らない（_admission / _admitted）。
+# ─────────────────────────────────────────────
+@st.cache_resource
+def _render_queue():
+    import os
+    from sanmei.admission import RenderQueue
+    return RenderQueue(
+        concurrency=int(_get_secret("RENDER_CONCURRENCY", str(max(1, (os.cpu_count() or 2) // 2)))),
+        max_waiting=int(_get_secret("RENDER_QUEUE_MAX", "32")),
+        timeout=float(_get_secret("RENDER_WAIT_TIMEOUT", "120")),
+    )
+
+
+def _session_id() -> str:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "local"
+
+
+class _MustWait(Exception):
+    """描画枠が空いていない（順番待ちの表示はキャッシュ関数の外で行う）。"""
+
+
+_admission_held = threading.local()   # 呼び出し側が描画枠を確保済みなら .on = True
+
+
+@contextmanager
+def _admission():
+    """generate_*_pdf の本体（= st.cache_data に無かったときだけ実行される部分）で描画を囲む。
+    回数制限の "pdf" を 1 回分使い、描画枠を取る。枠が空いていなければ _MustWait で抜け、
+    _admitted が待ち順を表示しながら枠を取ってから呼び直す（キャッシュ関数の中で st の要素を
+    出すと、キャッシュから返すときに再生されてしまうため）。スクリプト外（ウォームアップ）では何もしない。"""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    if getattr(_admission_held, "on", False) or get_script_run_ctx(suppress_warning=True) is None:
+        yield
+        return
+    wait = _rate_wait("pdf")
+    if wait:
+        raise Throttled(_ratelimit.retry_message(wait), wait)
+
+    def busy(pos: int):
+        raise _MustWait
+
+    with _render_queue().slot(_session_id(), on_wait=busy):
+        yield
+
+
+def _admitted(render, *args) -> bytes:
+    """generate_*_pdf を呼ぶ。キャッシュに無く描画枠も空いていなければ、待ち順を表示しながら
+    枠が空くのを待って描画する（混雑時は QueueFull、短時間に作りすぎたら Throttled）。"""
+    _metrics.count("cache_requests", cache=render.__name__)
+    try:
+        return render(*args)
+    except _MustWait:
+        pass
+    notice = st.empty()
+    try:
+        with _render_queue().slot(_session_id(), on_wait=lambda pos: notice.info(
+                f"⏳ レポート作成の順番待ちです（{pos} 番目）。このままお待ちください…")):
+            notice.empty()
+            _admission_held.on = True
+            try:
+                return render(*args)
+            finally:
+                _admission_held.on = False
+    finally:
+        notice.empty()
+
+
 # ─────────────────────────────────────────────
 #  PDF生成：個人分析レポート（キャッシュ付き）
+#  一括作成（ZIP）ではキャッシュに溜めないよう _render_personal_pdf を直接呼ぶ
 # ─────────────────────────────────────────────
 @st.cache_data(show_spinner=False)
 def generate_personal_pdf(name: str, gototoku: dict, font_path: str) -> bytes:
+    _metrics.count("cache_misses", cache="generate_personal_pdf")
+    with _admission():
+        return _render_personal_pdf(name, gototoku, font_path)
+
+
+@_metrics.timed("pdf_personal")
+def _render_personal_pdf(name: str, gototoku: dict, font_path: str) -> bytes:
     from fpdf import FPDF
     from fpdf.enums import XPos, YPos
 
@@ -584,7 +426,7 @@ def generate_personal_pdf(name: str, gototoku: dict, font_path: str) -> bytes:
     pdf.set_fill_color(247, 250, 252)
     pdf.rect(0, 0, 210, 297, style="F")
     pdf.set_font("JP", size=22); pdf.set_text_color(26,32,44); pdf.set_xy(0, 10)
-    pdf.cell(0, 10, text="【才能開花】自分専用・初期スペック解析カルテ",
+    pdf.cell(0, 10, text=_content.PERSONAL_TITLE,
              align="C", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
     pdf.image(img_buf, x=10, y=22, w=190)
 
@@ -607,16 +449,13 @@ def generate_personal_pdf(name: str, gototoku: dict, font_path: str) -> bytes:
         pdf.write(lh, f"活かし方：{data['strategy']}\n"); pdf.set_x(15)
         pdf.set_font("JP", style="", size=11); pdf.ln(4.5); pdf.set_x(15)
 
-    heading(f"{name}様の「5つの才能とサバイブ術」")
-    strategy("本質・絶対に譲れない価値観（中央）", gototoku["center"])
-    strategy("社会や上司に見せる外ヅラ（頭上）",    gototoku["head"])
-    strategy("職場や同僚との接し方（右手）",        gototoku["right"])
-    strategy("プライベート・家庭での顔（左手）",     gototoku["left"])
-    strategy("ストレス時・無意識の行動（足元）",     gototoku["feet"])
+    heading(_content.PERSONAL_HEADING.format(name=name))
+    for label, pos in _content.PERSONAL_POSITIONS:
+        strategy(label, gototoku[pos])
 
     pdf.set_font("JP", size=11); pdf.set_text_color(45,55,72)
-    pdf.write(lh, "■ あなたの人生バイオリズム（天中殺グループ）\n"); pdf.set_x(15)
-    pdf.write(lh, f"あなたは【{tc}天中殺】グループに属しています。この時期は転職、起業、引っ越しなどの「人生の大きな決断」は避け、自己研鑽などの充電期間に充てるのが賢明なリスクヘッジとなります。\n")
+    pdf.write(lh, f"■ {_content.PERSONAL_TENCHU_HEADING}\n"); pdf.set_x(15)
+    pdf.write(lh, _content.PERSONAL_TENCHU.format(tc=tc) + "\n")
     pdf.ln(3)
 
     box_end_y = pdf.get_y()
@@ -626,10 +465,11 @@ def generate_personal_pdf(name: str, gototoku: dict, font_path: str) -> bytes:
     pdf.set_line_width(0.2); pdf.rect(11, box_start_y+1, 188, bh-2, style="D")
 
     pdf.set_x(15); pdf.set_font("JP", size=11); pdf.set_text_color(45,55,72)
-    pdf.multi_cell(178, lh, text=f"総括：以上が、{name}様が生まれ持った「初期スペック（才能の星）」です。今の仕事や人間関係で息苦しさを感じているなら、それは能力不足ではなく、星と環境のミスマッチが原因です。このカルテを、ご自身の才能を120%解放するための武器としてご活用ください！")
+    pdf.multi_cell(178, lh, text=_content.PERSONAL_SUMMARY.format(name=name))
 
     # bytes() で明示キャスト（fpdf2 の版によって bytearray が返る場合の対策）
-    return bytes(pdf.output())
+    with _metrics.stage("pdf_output"):
+        return bytes(pdf.output())
 
 
 # ─────────────────────────────────────────────
@@ -637,6 +477,13 @@ def generate_personal_pdf(name: str, gototoku: dict, font_path: str) -> bytes:
 # ─────────────────────────────────────────────
 @st.cache_data(show_spinner=False)
 def generate_business_pdf(name_a: str, ga: dict, name_b: str, gb: dict, font_path: str) -> bytes:
+    _metrics.count("cache_misses", cache="generate_business_pdf")
+    with _admission():
+        return _render_business_pdf(name_a, ga, name_b, gb, font_path)
+
+
+@_metrics.timed("pdf_business")
+def _render_business_pdf(name_a: str, ga: dict, name_b: str, gb: dict, font_path: str) -> bytes:
     from fpdf import FPDF
     from fpdf.enums import XPos, YPos
 
@@ -655,7 +502,7 @@ def generate_business_pdf(name_a: str, ga: dict, name_b: str, gb: dict, font_pat
     pdf.set_fill_color(247,250,252); pdf.rect(0,0,210,297,style="F")
     pdf.set_fill_color(255,255,255); pdf.rect(10,84,190,194,style="F")
     pdf.set_font("JP", size=22); pdf.set_text_color(26,32,44); pdf.set_xy(0, 10)
-    pdf.cell(0, 10, text="【ビジネス相性・完全攻略マニュアル】",
+    pdf.cell(0, 10, text=_content.BUSINESS_TITLE,
              align="C", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
     pdf.image(img_buf, x=10, y=22, w=190)
 
@@ -686,25 +533,346 @@ def generate_business_pdf(name_a: str, ga: dict, name_b: str, gb: dict, font_pat
     def gap():
         pdf.ln(1.8); pdf.set_x(15)
 
-    heading(f"{name_b}様の「取扱説明書」（地雷と攻略法）")
-    strategy("本質・一番の価値観（中央）",         gb["center"])
-    strategy("目上・社会に見せる顔（頭上）",        gb["head"])
-    strategy("対人・現場での戦闘スタイル（右手）",  gb["right"])
-    gap()
-    heading("パワーバランスと立ち回り（主導権の所在）")
-    normal(_power_balance(ga["center"], gb["center"], name_a, name_b))
-    gap()
-    heading("社会・顧客に対するアプローチ（戦闘スタイル）")
-    normal(f"お二人の右手の星（{ga['right']}×{gb['right']}）の分析です。{_combat_style(ga['right'],gb['right'])}")
-    gap()
-    heading("トラブル時の危機管理能力（メンタルの補完）")
-    normal(f"お二人の足元の星（{ga['feet']}×{gb['feet']}）の分析です。{_crisis_management(ga['feet'],gb['feet'])}")
-    gap()
-    heading("事業バイオリズムとリスクヘッジ（天中殺グループ）")
-    normal(_tenchu_affinity(tca, tcb, name_a, name_b))
+    heading(_content.BUSINESS_HEADING.format(name=name_b))
+    for label, pos in _content.BUSINESS_POSITIONS:
+        strategy(label, gb[pos])
+    for title, text in _content.business_sections(ga, gb, tca, tcb, name_a, name_b):
+        gap()
+        heading(title)
+        normal(text)
 
     # bytes() で明示キャスト（fpdf2 の版によって bytearray が返る場合の対策）
-    return bytes(pdf.output())
+    with _metrics.stage("pdf_output"):
+        return bytes(pdf.output())
+
+
+# ─────────────────────────────────────────────
+#  PDF生成：チーム年運ヒートマップ（キャッシュ付き）
+#  A4 横・1 ページ 26 名。セル色は星の五行（_ELEM_RGB）。
+# ─────────────────────────────────────────────
+_ELEM_RGB = [(198,246,213), (254,215,215), (254,252,191), (226,232,240), (190,227,248)]  # 木火土金水
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def generate_team_forecast_pdf(title: str, names: tuple, stars, start_year: int, font_path: str) -> bytes:
+    _metrics.count("cache_misses", cache="generate_team_forecast_pdf")
+    with _admission():
+        return _render_team_forecast_pdf(title, names, stars, start_year, font_path)
+
+
+@_metrics.timed("pdf_team_forecast")
+def _render_team_forecast_pdf(title: str, names: tuple, stars, start_year: int, font_path: str) -> bytes:
+    from fpdf import FPDF
+    from sanmei.engine import STAR_NAMES
+
+    n_years = stars.shape[1]
+    rows_per_page, name_w, row_h = 26, 46, 6.2
+    cell_w = min(14.0, (297 - 20 - name_w) / max(n_years, 1))
+
+    pdf = FPDF(orientation="L", unit="mm", format="A4")
+    pdf.render_color_fonts = False
+    pdf.set_auto_page_break(auto=False)
+    pdf.add_font("JP", fname=font_path)
+    pdf.set_draw_color(226,232,240); pdf.set_line_width(0.2)
+
+    def header_row():
+        pdf.add_page()
+        pdf.set_font("JP", size=16); pdf.set_text_color(26,32,44); pdf.set_xy(10, 10)
+        pdf.cell(0, 8, text=f"【チーム年運ヒートマップ】{title}")
+        pdf.set_font("JP", size=8); pdf.set_text_color(113,128,150); pdf.set_xy(10, 19)
+        pdf.cell(0, 5, text="セルの星 = その年の天干 × 本人の日干。色は五行（木・火・土・金・水）。")
+        pdf.set_font("JP", size=7.5); pdf.set_text_color(45,55,72)
+        pdf.set_xy(10 + name_w, 27)
+        for y in range(n_years):
+            pdf.cell(cell_w, row_h, text=str(start_year + y), align="C")
+        pdf.set_xy(10, 27 + row_h)
+
+    for i, name in enumerate(names):
+        if i % rows_per_page == 0:
+            header_row()
+        y0 = pdf.get_y()
+        pdf.set_text_color(45,55,72); pdf.set_x(10)
+        pdf.cell(name_w, row_h, text=name[:14])
+        for j in range(n_years):
+            code = int(stars[i, j])
+            pdf.set_fill_color(*_ELEM_RGB[code // 2])
+            pdf.rect(10 + name_w + j*cell_w, y0, cell_w, row_h, style="DF")
+            pdf.set_xy(10 + name_w + j*cell_w, y0)
+            pdf.cell(cell_w, row_h, text=STAR_NAMES[code][:2], align="C")
+        pdf.set_xy(10, y0 + row_h)
+
+    with _metrics.stage("pdf_output"):
+        return bytes(pdf.output())
+
+
+# ─────────────────────────────────────────────
+#  利用状況イベント（sanmei/analytics.py）
+#  診断・ペイウォール表示・Checkout 作成・決済完了・PDF ダウンロードを商品（p1 / c）ごとに記録する。
+#  決済完了（paid）は Stripe で payment_status を確かめられたものだけ。Stripe 未設定時のデモ購入は paid_demo。
+#  再実行中はキューに積むだけで、SQLite への書き込みは別スレッドがまとめて行う。
+#  ANALYTICS_DB = "" で記録しない。
+# ─────────────────────────────────────────────
+_ANALYTICS_DB = _get_secret("ANALYTICS_DB", str(_APP_DIR / "analytics.db"))
+
+
+@st.cache_resource
+def _analytics():
+    if not _ANALYTICS_DB:
+        return None
+    from sanmei.analytics import Sink
+    try:
+        return Sink(_ANALYTICS_DB)
+    except Exception:   # 書き込めない場所を指定した場合などは記録せずに動かす
+        return None
+
+
+def _track(event: str, product: str, once: bool = False):
+    """利用状況イベントを積む。once=True はセッションで 1 回だけ（再実行のたびに描くペイウォール等）。"""
+    sink = _analytics()
+    if sink is None:
+        return
+    if once:
+        seen = st.session_state.setdefault("_tracked", set())
+        if (event, product) in seen:
+            return
+        seen.add((event, product))
+    sink.emit(event, product, _session_id())
+
+
+# ─────────────────────────────────────────────
+#  回数制限（sanmei/ratelimit.py）
+#  診断の実行・PDF の作成（キャッシュに無いもの）・個人レポートの一括作成・Checkout の作成を、セッションごと・接続元ごとの
+#  トークンバケットで制限する。RATE_LIMIT_STORE はバケットの置き場所（既定 ratelimit.db。
+#  レプリカ間で共有するなら共有ボリューム上のパスか redis://…、"memory" でプロセス内、"off" で制限しない）。
+#  RATE_LIMITS で既定値を上書きする（例 "diagnosis.session=5/10, pdf.client=0"。burst/1 分あたりの回復数）。
+#  接続元ごとの制限は、RATE_LIMIT_PROXY_HOPS（信頼できるプロキシの段数）を設定すれば X-Forwarded-For から、
+#  未設定なら直接の接続元がグローバルなアドレスの場合だけ掛ける（プロキシ越しで全員が同じ枠にならないように）。
+# ─────────────────────────────────────────────
+@st.cache_resource
+def _rate_limiter():
+    spec = _get_secret("RATE_LIMIT_STORE", str(_APP_DIR / "ratelimit.db"))
+    if spec == "off":
+        return None
+    rules = _ratelimit.load_rules(_get_secret("RATE_LIMITS"))   # 指定の誤りで操作を止めない
+    try:
+        store = _ratelimit.open_store(spec)
+    except Exception:   # 置き場所が使えなくても制限はプロセス内で続ける
+        store = _ratelimit.MemoryStore()
+    return _ratelimit.Limiter(store, rules)
+
+
+def _client_id() -> str:
+    """接続元の識別子（IP のハッシュ）。"" ならクライアント単位の制限はしない。
+    RATE_LIMIT_PROXY_HOPS が無い場合、直接の接続元がプライベート / ループバックのアドレス
+    （＝ロードバランサーやプロキシ。全利用者が同じ値になる）なら使わない。"""
+    import hashlib
+    hops = int(_get_secret("RATE_LIMIT_PROXY_HOPS", "0"))
+    if hops:
+        fwd = [a.strip() for a in (st.context.headers.get("X-Forwarded-For") or "").split(",") if a.strip()]
+        ip = fwd[-hops] if len(fwd) >= hops else None
+    else:
+        ip = st.context.ip_address
+        if not _ratelimit.is_public(ip):
+            return ""
+    if not isinstance(ip, str) or not ip:   # 接続元が分からない（テスト実行など）
+        return ""
+    return hashlib.blake2b(ip.encode(), digest_size=8).hexdigest()   # IP はそのまま保存しない
+
+
+def _rate_wait(action: str) -> float:
+    """action を 1 回使う。制限に掛かったら待ち秒数（0.0 なら実行してよい）。"""
+    limiter = _rate_limiter()
+    if limiter is None:
+        return 0.0
+    wait, scope = limiter.check(action, _session_id(), _client_id())
+    if wait:
+        _metrics.count("rate_limited", action=action, scope=scope)
+    return wait
+
+
+def _allow(action: str) -> bool:
+    wait = _rate_wait(action)
+    if wait:
+        st.warning(_ratelimit.retry_message(wait))
+    return not wait
+
+
+# ─────────────────────────────────────────────
+#  セッションのメモリ使用量と退避（sanmei/sessions.py）
+#  _SESSION_DEFAULTS（セッション状態の初期化）の各キーの使用量をセッションごとに数える。
+#  プロセス全体の合計が SESSION_MEMORY_BUDGET_MB（既定 512。0 で退避しない）を超えたら、
+#  SESSION_IDLE_SECONDS（既定 600）以上操作のないセッションの名簿・相性行列などを
+#  SESSION_SPILL_DIR（既定 spill/）へ書き出し、戻ったら _track_session() で読み戻す。
+# ─────────────────────────────────────────────
+_SESSION_HEAVY = ("team_roster", "team_state", "team_pairing", "team_teams")
+
+
+@st.cache_resource
+def _sessions():
+    from streamlit.runtime import Runtime
+    from sanmei.sessions import Registry
+    alive = Runtime.instance().is_active_session if Runtime.exists() else (lambda sid: True)
+    return Registry(int(float(_get_secret("SESSION_MEMORY_BUDGET_MB", "512")) * 2**20),
+                    float(_get_secret("SESSION_IDLE_SECONDS", "600")),
+                    _get_secret("SESSION_SPILL_DIR", str(_APP_DIR / "spill")), alive)
+
+
+def _track_session():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        _sessions().track(ctx.session_id, ctx.session_state, _SESSION_DEFAULTS, _SESSION_HEAVY)
+
+
+# ─────────────────────────────────────────────
+#  計測（sanmei/metrics.py）
+#  secrets の METRICS_PORT を設定すると METRICS_HOST（既定 127.0.0.1）:<port>/metrics で
+#  Prometheus テキストを返し、METRICS_LOG_INTERVAL（秒）を設定すると集計を JSON で定期的にログへ出す。
+#  どちらも未設定なら記録しない（各フックはフラグを見るだけ）。
+# ─────────────────────────────────────────────
+@st.cache_resource
+def _start_metrics() -> bool:
+    port, interval = _get_secret("METRICS_PORT"), _get_secret("METRICS_LOG_INTERVAL")
+    if not (port or interval):
+        return False
+    from sanmei import warmup
+    queue = _render_queue()
+    _metrics.register_collector(lambda: {f"render_queue_{k}": v for k, v in queue.metrics().items()})
+    _metrics.register_collector(lambda: {"warmup_ready": int(warmup.is_ready())})
+    if _analytics() is not None:
+        _metrics.register_collector(lambda: {f"analytics_{k}": v for k, v in _analytics().stats().items()})
+    _metrics.register_collector(lambda: {f"sessions_{k}": v for k, v in _sessions().stats().items()})
+    if _rate_limiter() is not None:
+        _metrics.register_collector(lambda: {f"ratelimit_{k}": v for k, v in _rate_limiter().stats().items()})
+    _metrics.enable()
+    if port:
+        _metrics.serve(int(port), _get_secret("METRICS_HOST", "127.0.0.1"))
+    if interval:
+        _metrics.log_periodically(float(interval))
+    return True
+
+
+_start_metrics()
+
+
+# ─────────────────────────────────────────────
+#  運用者向けプロファイル（sanmei/profiling.py）
+#  secrets に PROFILE_TOKEN を設定した場合だけ有効。?profile=<PROFILE_TOKEN> で開いたセッションは
+#  次の再実行（st.rerun で続く分を含む）を cProfile で記録し、段階ごとの所要時間と合わせて
+#  PROFILE_DIR（既定 profiles/）に保存する。以降はページ最下部の運用者パネルから予約し直せる。
+#  記録するのはここから app.py の末尾まで（これより前は関数定義と設定の読み込みだけ）。
+# ─────────────────────────────────────────────
+_PROFILE_TOKEN = _get_secret("PROFILE_TOKEN")
+_PROFILE_DIR   = Path(_get_secret("PROFILE_DIR", str(_APP_DIR / "profiles")))
+
+if _PROFILE_TOKEN:
+    from sanmei import profiling as _profiling
+    _profiling.begin(st.session_state, _PROFILE_DIR, _session_id())
+    if "profile" in st.query_params:
+        if _profiling.token_ok(st.query_params["profile"], _PROFILE_TOKEN):
+            st.session_state["profile_admin"] = True
+            _profiling.arm(st.session_state)
+        del st.query_params["profile"]
+
+
+# ─────────────────────────────────────────────
+#  ペイウォールのサンプル画像（sanmei/samples.py）
+#  起動時に WebP / AVIF の縮小版とプレースホルダーを作ってプロセス全体で保持し、静的配信が有効なら
+#  <picture> で配信する（ファイルはブラウザのキャッシュに載るので、再実行・再訪問では送らない）。
+# ─────────────────────────────────────────────
+_SAMPLE_IMAGES = {"p1": "sample_980.png", "c": "sample_1480.png"}
+
+
+@st.cache_resource(show_spinner=False)
+def _sample_image(product: str) -> dict | None:
+    src = _APP_DIR / _SAMPLE_IMAGES[product]
+    if not src.exists():
+        return None
+    from sanmei import samples
+    try:
+        return samples.build(src)
+    except Exception:   # static/ に書き込めない等の場合は元の PNG をそのまま出す
+        return {"png": str(src)}
+
+
+def _show_sample(product: str, caption: str):
+    info = _sample_image(product)
+    if info is None:
+        return
+    if "png" in info:
+        st.image(info["png"], caption=caption)
+    elif info["sources"] and st.get_option("server.enableStaticServing"):
+        from sanmei.samples import picture_html
+        st.markdown(picture_html(info, caption, caption), unsafe_allow_html=True)
+    else:
+        st.image(info["fallback"] or str(_APP_DIR / _SAMPLE_IMAGES[product]), caption=caption)   # パスで渡す（バイト列は毎回 PIL で処理される）
+
+
+# ─────────────────────────────────────────────
+#  起動時ウォームアップ（sanmei/warmup.py）
+#  最初のセッションがこのスクリプトを実行した時点で、プロセスに 1 回だけ別スレッドで開始する。
+#  PDF を 2 回描画し、初回（コールド）と 2 回目（ウォーム）の所要時間を ready.json に残す。
+#  2 回目は利用者と同じ generate_personal_pdf（st.cache_data）を通し、キャッシュ側の初回処理も済ませる。
+#  Stripe が有効なら stripe パッケージの import（初回の Checkout 作成で数百 ms）も先に行う。
+# ─────────────────────────────────────────────
+def _warm_calendar():
+    from sanmei import caltable, tenchu
+    table = caltable.as_array()
+    int(table["center"].sum())   # mmap の全ページに触れてページキャッシュに載せる
+    tenchu._term_offsets()
+
+
+def _warm_batch():
+    import numpy as np
+    from sanmei import batch, pairing
+    codes = batch.compute_codes(np.array(["1990-01-01", "1985-06-15"], dtype="datetime64[D]"))
+    pairing.score_matrix(pairing.features(codes), pairing.features(codes), pairing.PRESETS["general"])
+
+
+def _warm_samples():
+    for product in _SAMPLE_IMAGES:
+        _sample_image(product)
+
+
+def _warm_report(cached: bool = False):
+    font_path = find_japanese_font()
+    if font_path:
+        render = generate_personal_pdf if cached else _render_personal_pdf
+        render("ウォームアップ", calc_gototoku(date(1990, 1, 1)), font_path)
+
+
+def _warm_stripe():
+    _stripe()
+
+
+@st.cache_resource
+def _start_warmup() -> bool:
+    import os
+    from sanmei import warmup
+    if os.environ.get("SANMEI_WARMUP", "1") == "0":   # ベンチマークのコールド計測用
+        return False
+    return warmup.start([
+        ("font",        find_japanese_font),
+        ("calendar",    _warm_calendar),
+        ("batch",       _warm_batch),
+        ("samples",     _warm_samples),
+        ("report_cold", _warm_report),
+        ("report_warm", lambda: _warm_report(cached=True)),
+        *([("stripe", _warm_stripe)] if _STRIPE_READY else []),
+    ])
+
+
+_start_warmup()
+
+
+@st.cache_resource
+def _start_bulk_cleanup() -> bool:
+    """一括作成の ZIP・BI 向けエクスポート（static/bulk/）を期限切れから順に消すスレッド。プロセスに 1 つ。"""
+    from sanmei import bulk
+    bulk.clean_periodically()
+    return True
+
+
+_start_bulk_cleanup()
 
 
 # ─────────────────────────────────────────────
@@ -722,7 +890,9 @@ _AD_HTML = """
 
 _STEPS = ["生年月日データを解析中...", "五行バランスを算出中...",
           "組織適正タイプを特定中...", "レポートを生成中..."]
+_ANIMATION_S = float(_get_secret("ANIMATION_SECONDS", "3.0"))   # 解析演出の長さ（0 で演出なし）
 
+@_metrics.timed("animation")
 def run_analysis_animation(slot) -> None:
     with slot.container():
         st.markdown(
@@ -739,13 +909,185 @@ def run_analysis_animation(slot) -> None:
             sub = 20
             for j in range(sub):
                 bar.progress((i * sub + j + 1) / (n * sub))
-                time.sleep(3.0 / (n * sub))
+                time.sleep(_ANIMATION_S / (n * sub))
         bar.progress(1.0)
         label.caption("解析完了。")
-        time.sleep(0.3)
+        time.sleep(0.1 * _ANIMATION_S)
     slot.empty()
 
 
+# ─────────────────────────────────────────────
+#  チーム分析：名簿の一括計算（名簿ハッシュ単位でキャッシュ）
+#  引数名が "_" で始まるものは Streamlit のハッシュ対象外。
+#  キャッシュキーは roster_hash（内容ハッシュ）と表示条件のみ。
+# ─────────────────────────────────────────────
+@st.cache_data(max_entries=8, show_spinner=False)
+def _parse_roster(data: bytes) -> tuple:
+    from sanmei.roster import parse_roster_csv, roster_hash
+    roster, errors = parse_roster_csv(data)
+    return roster, errors, (roster_hash(roster) if roster else "")
+
+
+_MATRIX_LIMIT = 2000   # 相性行列を保持する名簿の上限（float32 で 2000² ≒ 16MB）
+
+
+_WORKSPACE_DB = _get_secret("WORKSPACE_DB", str(_APP_DIR / "workspace.db"))
+
+
+def _team_update(roster: dict, rhash: str) -> dict:
+    """セッションの名簿状態を新しい版に差分更新し、変更ログのエントリを返す。"""
+    from sanmei.incremental import new_state, update
+    state = st.session_state["team_state"]
+    if state is None:
+        state = new_state(with_matrix=len(roster["keys"]) <= _MATRIX_LIMIT)
+        st.session_state["team_state"] = state
+    elif state["matrix"] is not None and len(roster["keys"]) > _MATRIX_LIMIT:
+        state["matrix"] = None
+    _team_reset(roster, rhash)
+    return update(state, roster)
+
+
+def _team_open(org: str) -> bool:
+    """ワークスペースから組織を開く（保存済みのエンジン出力と変更ログをそのまま使い、再計算しない）。"""
+    from sanmei import workspace
+    from sanmei.incremental import restore
+    loaded = workspace.load(_WORKSPACE_DB, org)
+    if loaded is None:
+        return False
+    roster, codes, meta = loaded
+    st.session_state["team_state"] = restore(roster, codes, meta["log"],
+                                             with_matrix=len(roster["keys"]) <= _MATRIX_LIMIT)
+    _team_reset(roster, meta["roster_hash"])
+    st.session_state["team_org"] = org
+    return True
+
+
+def _team_saved_zip(org: str) -> tuple[str, int] | None:
+    """保存済みの組織で前に作成した一括作成の ZIP（新しい順に、保存期間内で、その後の保存で
+    再生成対象になったメンバーを含まない最初のもの）を (パス, 人数) で返す。"""
+    import zipfile
+    from collections import Counter
+    from sanmei import bulk, workspace
+    refs = sorted((r for r in workspace.list_reports(_WORKSPACE_DB, org) if r["kind"] == "bulk_zip"),
+                  key=lambda r: r["created_at"], reverse=True)
+    for ref, n in Counter(r["ref"] for r in refs).items():
+        path = bulk.BULK_DIR / Path(ref).name
+        try:
+            with zipfile.ZipFile(path) as zf:
+                complete = len(zf.namelist()) == n
+        except (OSError, zipfile.BadZipFile):   # 期限切れで削除済みなど
+            continue
+        if complete:
+            return str(path), n
+    return None
+
+
+def _team_reset(roster: dict, rhash: str):
+    st.session_state["team_pairing"]     = None   # 別の名簿の結果は破棄
+    st.session_state["team_teams"]       = None
+    st.session_state["team_export"]      = None
+    st.session_state["team_bulk"]        = None
+    st.session_state["team_fc_pdf"]      = None
+    st.session_state["team_roster"]      = roster
+    st.session_state["team_roster_hash"] = rhash
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _team_tenchu_calendar(roster_hash: str, start_iso: str, years: int,
+                          _roster: dict, _codes: dict) -> dict:
+    from sanmei.tenchu import roster_calendar
+    return roster_calendar(_codes["tenchu"], _roster["dept"], len(_roster["dept_labels"]),
+                           date.fromisoformat(start_iso), years)
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _team_forecast(roster_hash: str, start_year: int, years: int, _codes: dict):
+    from sanmei.forecast import annual_stars
+    return annual_stars(_codes["ds"], start_year, years)
+
+
+def _team_select(roster: dict, spec: str):
+    """"全員" / "区分: X" / "部署: X" → 名簿の行番号配列。"""
+    import numpy as np
+    if spec.startswith("区分: "):
+        role = spec[len("区分: "):]
+        return np.array([i for i, r in enumerate(roster["roles"]) if r == role], dtype=np.intp)
+    if spec.startswith("部署: "):
+        d = roster["dept_labels"].index(spec[len("部署: "):])
+        return np.flatnonzero(roster["dept"] == d)
+    return np.arange(len(roster["keys"]))
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _team_pairing(roster_hash: str, preset: str, spec_a: str, spec_b: str, capacity: int,
+                  dept_rule: str, _roster: dict, _codes: dict) -> dict:
+    """spec_b が空ならグループ内ペア作り、あれば A 側 × B 側の割り当て。行番号は名簿の行番号で返す。"""
+    from sanmei.pairing import PRESETS, features, solve_bipartite, solve_general
+    weights = PRESETS[preset]
+    rows_a = _team_select(_roster, spec_a)
+    if not spec_b:
+        res = solve_general(features(_codes, rows_a), weights,
+                            dept=_roster["dept"][rows_a], dept_rule=dept_rule)
+        res["a"], res["b"] = rows_a[res["a"]], rows_a[res["b"]]
+        return res
+    rows_b = _team_select(_roster, spec_b)
+    res = solve_bipartite(features(_codes, rows_a), features(_codes, rows_b), weights,
+                          capacity=capacity, dept_a=_roster["dept"][rows_a],
+                          dept_b=_roster["dept"][rows_b], dept_rule=dept_rule,
+                          ids_a=rows_a, ids_b=rows_b)
+    res["a"], res["b"] = rows_a[res["a"]], rows_b[res["b"]]
+    return res
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _team_search(roster_hash: str, spec: str, k: int, top: int, time_budget: float,
+                 _roster: dict, _codes: dict) -> dict:
+    from sanmei.teams import search_teams
+    return search_teams(_codes, _team_select(_roster, spec), k, top=top, time_budget=time_budget)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _team_org(roster_hash: str, _roster: dict, _codes: dict) -> dict:
+    """上司→部下の全エッジ集計と、相克エッジ（部下が上司を相克）の一覧。"""
+    import numpy as np
+    from sanmei.orgchart import analyze
+    flagged = []
+    res = analyze(_roster["manager"], _roster["dept"], len(_roster["dept_labels"]), _codes,
+                  on_chunk=lambda e: flagged.append((e["manager"][e["adverse"]], e["report"][e["adverse"]])))
+    res["adverse_manager"] = np.concatenate([m for m, _ in flagged]) if flagged else np.zeros(0, np.int32)
+    res["adverse_report"]  = np.concatenate([r for _, r in flagged]) if flagged else np.zeros(0, np.int32)
+    return res
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _team_distribution(roster_hash: str, depts: tuple, roles: tuple, _roster: dict, _codes: dict,
+                       _state: dict) -> dict:
+    """部署・区分で絞り込んだ分布集計。depts / roles が空なら絞り込まない。
+    区分で絞り込まなければ、名簿の版管理が差分で保っている部署別の人数表（buckets）から組み立てる。"""
+    import numpy as np
+    from sanmei.distribution import aggregate, from_counts
+    if not roles:
+        from sanmei.incremental import dept_buckets
+        b = dept_buckets(_state, _roster)
+        if depts:
+            keep = np.isin(np.arange(len(_roster["dept_labels"])), [_roster["dept_labels"].index(d) for d in depts])
+            b = {name: np.where(keep[:, None], c, 0) for name, c in b.items()}
+        return from_counts(b["center"], b["tenchu"])
+    mask = np.ones(len(_roster["keys"]), dtype=bool)
+    if depts:
+        mask &= np.isin(_roster["dept"], [_roster["dept_labels"].index(d) for d in depts])
+    if roles:
+        mask &= np.isin(np.asarray(_roster["roles"], dtype=object), list(roles))
+    rows = None if mask.all() else np.flatnonzero(mask)
+    return aggregate(_codes, _roster["dept"], len(_roster["dept_labels"]), rows)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _team_index(roster_hash: str, _roster: dict, _codes: dict) -> dict:
+    from sanmei.search import build_index
+    return build_index(_codes, _roster["dept"], _roster["dept_labels"])
+
+
 # ─────────────────────────────────────────────
 #  カスタム CSS
 # ─────────────────────────────────────────────
@@ -853,6 +1195,13 @@ st.markdown("""
   font-size:0.95rem; font-weight:700; color:#166534;
 }
 
+/* 年運ヒートマップ */
+.fc-wrap  { overflow-x:auto; margin:8px 0 12px; }
+.fc-table { border-collapse:collapse; font-size:0.7rem; white-space:nowrap; }
+.fc-table th, .fc-table td { border:1px solid #e2e8f0; padding:3px 5px; text-align:center; }
+.fc-table th { color:#6b7280; font-weight:700; background:#f8fafc; }
+.fc-table th.fc-name { text-align:left; color:#1e3a5f; }
+
 /* 非表示 */
 #MainMenu, footer, header { visibility:hidden; }
 
@@ -896,6 +1245,42 @@ def gototoku_html(g: dict) -> str:
 """
 
 
+
+# ─────────────────────────────────────────────
+#  年運ヒートマップ HTML を生成するヘルパー
+#    forecast_heatmap_html     : メンバー × 年（セルに星名、色は五行）
+#    forecast_counts_html      : 星 × 年（人数、濃さは比率）
+# ─────────────────────────────────────────────
+_ELEM_HEX = ["#C6F6D5", "#FED7D7", "#FEFCBF", "#E2E8F0", "#BEE3F8"]  # 木火土金水
+
+def forecast_heatmap_html(names: list, stars, start_year: int) -> str:
+    from sanmei.engine import STAR_NAMES
+    n_years = stars.shape[1]
+    head = "".join(f"<th>{start_year + y}</th>" for y in range(n_years))
+    body = []
+    for name, row in zip(names, stars.tolist()):
+        cells = "".join(
+            f'<td style="background:{_ELEM_HEX[c // 2]}">{STAR_NAMES[c][:2]}</td>' for c in row
+        )
+        body.append(f"<tr><th class='fc-name'>{html.escape(name)}</th>{cells}</tr>")   # 名簿の氏名（利用者の入力）
+    return (f'<div class="fc-wrap"><table class="fc-table"><tr><th></th>{head}</tr>'
+            f'{"".join(body)}</table></div>')
+
+
+def forecast_counts_html(counts, start_year: int) -> str:
+    from sanmei.engine import STAR_NAMES
+    n_years = counts.shape[1]
+    total = max(int(counts[:, 0].sum()), 1)
+    head = "".join(f"<th>{start_year + y}</th>" for y in range(n_years))
+    body = []
+    for code, row in enumerate(counts.tolist()):
+        cells = "".join(
+            f'<td style="background:rgba(29,78,216,{0.08 + 0.8 * n / total:.2f})">{n}</td>' for n in row
+        )
+        body.append(f"<tr><th class='fc-name'>{STAR_NAMES[code]}</th>{cells}</tr>")
+    return (f'<div class="fc-wrap"><table class="fc-table"><tr><th></th>{head}</tr>'
+            f'{"".join(body)}</table></div>')
+
 # ─────────────────────────────────────────────
 #  ヘッダー
 # ─────────────────────────────────────────────
@@ -909,17 +1294,23 @@ st.markdown("""
 # ─────────────────────────────────────────────
 #  セッション状態の初期化
 # ─────────────────────────────────────────────
-for _k, _v in {
+_SESSION_DEFAULTS = {
     "p1_result": None, "p1_name": "", "p1_birth": None,
     "show_paywall_p1": False, "paid_p1": False, "stripe_url_p1": None,
     "c_result_a": None, "c_result_b": None,
     "c_name_a": "", "c_name_b": "",
     "show_paywall_c": False, "paid_c": False, "stripe_url_c": None,
     "just_paid": "",   # "p1" or "c" — 決済完了バナー表示用（表示後に "" にリセット）
-}.items():
+    "team_roster": None, "team_roster_hash": "", "team_pairing": None,
+    "team_teams": None, "team_state": None, "team_upload_hash": "", "team_org": "",
+    "team_export": None, "team_bulk": None, "team_fc_pdf": None,
+}
+for _k, _v in _SESSION_DEFAULTS.items():
     if _k not in st.session_state:
         st.session_state[_k] = _v
 
+_track_session()   # 退避済みの名簿等を読み戻す（名簿を使う画面より前に置くこと）
+
 # ─────────────────────────────────────────────
 #  Stripe 決済コールバック処理
 #  success_url = {BASE_URL}?status=success&session_id={ID}&product=p1
@@ -931,6 +1322,8 @@ for _k, _v in {
 _qs = st.query_params
 if _qs.get("status") == "success":
     _sid      = _qs.get("session_id", "")
+    if _STRIPE_READY and _sid:
+        _metrics.count("cache_requests", cache="stripe_metadata")
     _meta     = _retrieve_stripe_metadata(_sid) if (_STRIPE_READY and _sid) else None
     _product  = (_meta or {}).get("product", _qs.get("product", ""))
     _name_raw = (_meta or {}).get("name",    "")
@@ -950,6 +1343,8 @@ if _qs.get("status") == "success":
             except Exception:
                 pass
         st.session_state["just_paid"] = "p1"
+        if _meta is not None:       # Stripe で支払い済みと確かめられたものだけ数える
+            _track("paid", "p1")
 
     elif _product == "c":
         st.session_state["paid_c"]          = True
@@ -970,6 +1365,8 @@ if _qs.get("status") == "success":
             except Exception:
                 pass
         st.session_state["just_paid"] = "c"
+        if _meta is not None:
+            _track("paid", "c")
 
     st.query_params.clear()  # URL からクエリパラメータを除去してリダイレクト先をクリーンに
     st.rerun()
@@ -989,7 +1386,7 @@ if st.session_state.get("just_paid"):
 # ─────────────────────────────────────────────
 #  タブ
 # ─────────────────────────────────────────────
-tab1, tab2 = st.tabs(["👤 個人分析", "🤝 組織相性診断"])
+tab1, tab2, tab3 = st.tabs(["👤 個人分析", "🤝 組織相性診断", "👥 チーム分析"])
 
 
 # ══════════════════════════════════════════════
@@ -1010,8 +1407,8 @@ with tab1:
         birth1 = st.date_input(
             "生年月日を選択してください（YYYY/MM/DD）",
             value=date(1985, 6, 15),
-            min_value=date(1924, 2, 5),
-            max_value=date(2006, 12, 31),
+            min_value=_DATE_MIN,
+            max_value=_DATE_MAX,
             format="YYYY/MM/DD",
             key="p1_birth_input",
         )
@@ -1019,7 +1416,7 @@ with tab1:
         st.markdown("<div style='height:28px'></div>", unsafe_allow_html=True)
         run1 = st.button("診断実行", type="primary", key="p1_btn", use_container_width=True)
 
-    if run1:
+    if run1 and _allow("diagnosis"):
         anim_slot = st.empty()
         run_analysis_animation(anim_slot)
         g = calc_gototoku(birth1)
@@ -1027,6 +1424,7 @@ with tab1:
         st.session_state["p1_name"]          = p1_name
         st.session_state["show_paywall_p1"]  = False
         st.session_state["paid_p1"]          = False
+        _track("diagnosis", "p1")
 
     # ─── 結果表示（セッションから取得）───
     if st.session_state["p1_result"]:
@@ -1073,16 +1471,32 @@ with tab1:
         if st.session_state["paid_p1"]:
             st.markdown('<div class="paid-badge">✅ ご購入ありがとうございます！PDFを受け取ってください。</div>',
                         unsafe_allow_html=True)
+            # HTML 版は PDF の作成を待たずに出せるので先に置く（sanmei/report_html.py）
+            from sanmei import report_html
+            st.download_button(
+                label="🖨 HTML版（すぐに表示・印刷用）をダウンロード",
+                data=report_html.personal(_name, g).encode("utf-8"),
+                file_name=f"Personal_Report_{_name}様.html",
+                mime="text/html",
+                use_container_width=True,
+                on_click=_track, args=("download", "p1"),
+            )
             font_path = find_japanese_font()
             if font_path:
-                pdf_bytes = generate_personal_pdf(_name, g, font_path)
-                st.download_button(
-                    label="⬇️ 個人分析レポート（PDF）をダウンロード",
-                    data=bytes(pdf_bytes),   # bytearray → bytes 明示キャスト
-                    file_name=f"Personal_Report_{_name}様.pdf",
-                    mime="application/pdf",
-                    use_container_width=True,
-                )
+                try:
+                    pdf_bytes = _admitted(generate_personal_pdf, _name, g, font_path)
+                except (QueueFull, Throttled) as e:
+                    st.error(str(e))
+                    pdf_bytes = None
+                if pdf_bytes:
+                    st.download_button(
+                        label="⬇️ 個人分析レポート（PDF）をダウンロード",
+                        data=bytes(pdf_bytes),   # bytearray → bytes 明示キャスト
+                        file_name=f"Personal_Report_{_name}様.pdf",
+                        mime="application/pdf",
+                        use_container_width=True,
+                        on_click=_track, args=("download", "p1"),
+                    )
             else:
                 st.error("日本語フォントが見つかりません。fonts/ipag.ttf を配置するか、packages.txt を確認してください。")
 
@@ -1110,6 +1524,7 @@ with tab1:
                 with col_ok:
                     if st.button("✅ 購入を確定する（デモ）", type="primary",
                                  key="p1_pay_ok", use_container_width=True):
+                        _track("paid_demo", "p1")
                         st.session_state["paid_p1"]          = True
                         st.session_state["show_paywall_p1"]  = False
                         st.rerun()
@@ -1120,9 +1535,8 @@ with tab1:
 
         else:
             # ── サンプルレポート画像 ──────────────────────
-            _img_p1 = _APP_DIR / "sample_980.png"
-            if _img_p1.exists():
-                st.image(str(_img_p1), caption="【サンプル】個人分析レポート（¥980）")
+            _track("paywall", "p1", once=True)
+            _show_sample("p1", "【サンプル】個人分析レポート（¥980）")
 
             st.markdown("""
 <div class="paywall-card">
@@ -1184,8 +1598,8 @@ with tab2:
         birth_a = st.date_input(
             "生年月日 A",
             value=date(1982, 3, 10),
-            min_value=date(1924, 2, 5),
-            max_value=date(2006, 12, 31),
+            min_value=_DATE_MIN,
+            max_value=_DATE_MAX,
             format="YYYY/MM/DD",
             key="c_birth_a",
             label_visibility="collapsed",
@@ -1206,8 +1620,8 @@ with tab2:
         birth_b = st.date_input(
             "生年月日 B",
             value=date(1993, 11, 25),
-            min_value=date(1924, 2, 5),
-            max_value=date(2006, 12, 31),
+            min_value=_DATE_MIN,
+            max_value=_DATE_MAX,
             format="YYYY/MM/DD",
             key="c_birth_b",
             label_visibility="collapsed",
@@ -1215,7 +1629,7 @@ with tab2:
 
     run2 = st.button("相性を分析する", type="primary", key="c_btn", use_container_width=True)
 
-    if run2:
+    if run2 and _allow("diagnosis"):
         anim_slot2 = st.empty()
         run_analysis_animation(anim_slot2)
         ga = calc_gototoku(birth_a)
@@ -1226,6 +1640,7 @@ with tab2:
         st.session_state["c_name_b"]       = name_b
         st.session_state["show_paywall_c"] = False
         st.session_state["paid_c"]         = False
+        _track("diagnosis", "c")
 
     # ─── 結果表示（セッションから取得）───
     if st.session_state["c_result_a"] and st.session_state["c_result_b"]:
@@ -1271,16 +1686,32 @@ with tab2:
         if st.session_state["paid_c"]:
             st.markdown('<div class="paid-badge">✅ ご購入ありがとうございます！PDFを受け取ってください。</div>',
                         unsafe_allow_html=True)
+            # HTML 版は PDF の作成を待たずに出せるので先に置く（sanmei/report_html.py）
+            from sanmei import report_html
+            st.download_button(
+                label="🖨 HTML版（すぐに表示・印刷用）をダウンロード",
+                data=report_html.business(_na, ga, _nb, gb).encode("utf-8"),
+                file_name=f"Business_Report_{_na}×{_nb}.html",
+                mime="text/html",
+                use_container_width=True,
+                on_click=_track, args=("download", "c"),
+            )
             font_path = find_japanese_font()
             if font_path:
-                pdf_bytes = generate_business_pdf(_na, ga, _nb, gb, font_path)
-                st.download_button(
-                    label="⬇️ 組織相性診断レポート（PDF）をダウンロード",
-                    data=bytes(pdf_bytes),   # bytearray → bytes 明示キャスト
-                    file_name=f"Business_Report_{_na}×{_nb}.pdf",
-                    mime="application/pdf",
-                    use_container_width=True,
-                )
+                try:
+                    pdf_bytes = _admitted(generate_business_pdf, _na, ga, _nb, gb, font_path)
+                except (QueueFull, Throttled) as e:
+                    st.error(str(e))
+                    pdf_bytes = None
+                if pdf_bytes:
+                    st.download_button(
+                        label="⬇️ 組織相性診断レポート（PDF）をダウンロード",
+                        data=bytes(pdf_bytes),   # bytearray → bytes 明示キャスト
+                        file_name=f"Business_Report_{_na}×{_nb}.pdf",
+                        mime="application/pdf",
+                        use_container_width=True,
+                        on_click=_track, args=("download", "c"),
+                    )
             else:
                 st.error("日本語フォントが見つかりません。fonts/ipag.ttf を配置するか、packages.txt を確認してください。")
 
@@ -1308,6 +1739,7 @@ with tab2:
                 with col_ok:
                     if st.button("✅ 購入を確定する（デモ）", type="primary",
                                  key="c_pay_ok", use_container_width=True):
+                        _track("paid_demo", "c")
                         st.session_state["paid_c"]          = True
                         st.session_state["show_paywall_c"]  = False
                         st.rerun()
@@ -1318,9 +1750,8 @@ with tab2:
 
         else:
             # ── サンプルレポート画像 ──────────────────────
-            _img_c = _APP_DIR / "sample_1480.png"
-            if _img_c.exists():
-                st.image(str(_img_c), caption="【サンプル】組織相性診断レポート（¥1,480）")
+            _track("paywall", "c", once=True)
+            _show_sample("c", "【サンプル】組織相性診断レポート（¥1,480）")
 
             st.markdown(f"""
 <div class="paywall-card">
@@ -1356,6 +1787,604 @@ with tab2:
             # ─────────────────────────────────────────────────────────────
 
 
+# ══════════════════════════════════════════════
+#  TAB 3：チーム分析（名簿 CSV の一括診断）
+# ══════════════════════════════════════════════
+with tab3:
+    st.markdown(
+        "<h2 style='font-size:1rem;font-weight:700;margin:0 0 2px;'>チーム全体の傾向を可視化する</h2>",
+        unsafe_allow_html=True,
+    )
+    st.caption("名簿 CSV（社員ID・氏名・生年月日・部署・上司ID）をアップロードすると、全メンバーを一括で診断します。")
+
+    from sanmei.roster import TEMPLATE_CSV
+    st.download_button("📄 名簿テンプレート（CSV）", data=TEMPLATE_CSV.encode("utf-8-sig"),
+                       file_name="roster_template.csv", mime="text/csv")
+    _csv = st.file_uploader("名簿 CSV", type=["csv"], key="team_csv_input")
+    if _csv is not None:
+        _roster, _errors, _rhash = _parse_roster(_csv.getvalue())
+        for _msg in _errors[:10]:
+            st.warning(_msg)
+        if len(_errors) > 10:
+            st.warning(f"ほか {len(_errors) - 10} 件のエラーがあります。")
+        if not _roster:
+            st.session_state["team_roster"] = None
+        elif _rhash != st.session_state["team_upload_hash"]:   # 新しくアップロードされた版だけ取り込む
+            st.session_state["team_upload_hash"] = _rhash
+            if _rhash != st.session_state["team_roster_hash"]:
+                _team_update(_roster, _rhash)                  # 前の版との差分だけ再計算
+
+    with st.expander("💾 ワークスペース（組織の保存・読み込み）"):
+        from sanmei import workspace
+        _orgs = workspace.list_orgs(_WORKSPACE_DB)
+        if _orgs:
+            ws_open = st.selectbox(
+                "保存済みの組織", [o["name"] for o in _orgs], key="team_ws_open",
+                format_func=lambda n: next(f"{n}（v{o['version']} / {o['n_members']:,}名 / {o['updated_at']}）"
+                                           for o in _orgs if o["name"] == n))
+            ws_b1, ws_b2, ws_b3 = st.columns([1, 1, 2])
+            if ws_b1.button("開く", key="team_ws_open_btn"):
+                _team_open(ws_open)
+            ws_confirm = ws_b3.checkbox("削除してよい", key="team_ws_delete_ok")
+            if ws_b2.button("削除", key="team_ws_delete_btn", disabled=not ws_confirm):
+                workspace.delete_org(_WORKSPACE_DB, ws_open)
+                if st.session_state["team_org"] == ws_open:
+                    st.session_state["team_org"] = ""
+                st.rerun()
+
+            # 開かずに探す（members の部署・中心星インデックスで引く）
+            from sanmei.engine import STAR_NAMES, _TENCHU_GROUPS
+            ws_q1, ws_q2 = st.columns(2)
+            ws_dept = ws_q1.text_input("部署で探す", key="team_ws_q_dept", placeholder="例: 営業部")
+            ws_star = ws_q2.selectbox("中心星で探す", ["指定なし"] + STAR_NAMES, key="team_ws_q_center")
+            if ws_dept.strip() or ws_star != "指定なし":
+                _WS_QUERY_LIMIT = 200
+                ws_hits = workspace.query_members(
+                    _WORKSPACE_DB, ws_open, dept=ws_dept.strip() or None,
+                    center=None if ws_star == "指定なし" else STAR_NAMES.index(ws_star), limit=_WS_QUERY_LIMIT + 1)
+                ws_more, ws_hits = len(ws_hits) > _WS_QUERY_LIMIT, ws_hits[:_WS_QUERY_LIMIT]
+                st.caption(f"「{ws_open}」で該当 {len(ws_hits):,} 名" + ("（先頭のみ表示）" if ws_more else ""))
+                if ws_hits:
+                    import pandas as pd
+                    st.dataframe(pd.DataFrame({
+                        "社員ID": [m["key"] for m in ws_hits],
+                        "氏名":   [m["name"] for m in ws_hits],
+                        "部署":   [m["dept"] for m in ws_hits],
+                        "中央":   [STAR_NAMES[m["center"]] for m in ws_hits],
+                        "天中殺": [_TENCHU_GROUPS[m["tenchu"]] + "天中殺" for m in ws_hits],
+                    }), hide_index=True, use_container_width=True)
+        else:
+            st.caption("保存済みの組織はまだありません。")
+        if st.session_state["team_roster"]:
+            ws_name = st.text_input("組織名", value=st.session_state["team_org"], key="team_ws_name")
+            if st.button("現在の名簿を保存", key="team_ws_save", disabled=not ws_name.strip()):
+                from sanmei.incremental import roster_codes as _rc
+                _ts = st.session_state["team_state"]
+                workspace.save(_WORKSPACE_DB, ws_name.strip(), st.session_state["team_roster"],
+                               _rc(_ts), st.session_state["team_roster_hash"], _ts["log"])
+                _ts["version"] = _ts["log"][-1]["version"] if _ts["log"] else _ts["version"]   # 保存先の版番号に揃える
+                st.session_state["team_org"] = ws_name.strip()
+                st.success(f"「{ws_name.strip()}」を保存しました（v{_ts['version']}）。")
+
+    if st.session_state["team_roster"]:
+        roster = st.session_state["team_roster"]
+        rhash  = st.session_state["team_roster_hash"]
+        tstate = st.session_state["team_state"]
+        from sanmei.incremental import partner_scores, roster_codes
+        codes  = roster_codes(tstate)
+        st.markdown(
+            f"<div class='pillar-row'>登録メンバー <span class='pillar-tag'>{len(roster['keys']):,}名</span>"
+            f"&nbsp;部署 <span class='pillar-tag'>{len(roster['dept_labels'])}</span>"
+            f"&nbsp;版 <span class='pillar-tag'>v{tstate['version']}</span></div>",
+            unsafe_allow_html=True,
+        )
+
+        with st.expander(f"📝 名簿の変更履歴（{len(tstate['log'])} 版）"):
+            import pandas as pd
+            st.dataframe(pd.DataFrame([{
+                "版":         f"v{e['version']}",
+                "更新日時":   e["at"],
+                "追加":       len(e["added"]),
+                "削除":       len(e["removed"]),
+                "変更":       len(e["changed"]),
+                "再計算":     e["recomputed"],
+                "レポート再生成": len(e["reports"]),
+                "所要(ms)":   round(e["elapsed_ms"], 1),
+            } for e in reversed(tstate["log"])]), hide_index=True, use_container_width=True)
+            last = tstate["log"][-1]
+            if last["version"] > 1 and (last["changed"] or last["added"] or last["removed"]):
+                _FIELD_JA = {"birth": "生年月日", "name": "氏名", "dept": "部署", "role": "区分", "manager": "上司"}
+                rows = ([{"社員ID": k, "内容": "追加"} for k in last["added"]]
+                        + [{"社員ID": k, "内容": "削除"} for k in last["removed"]]
+                        + [{"社員ID": k, "内容": "変更: " + "・".join(_FIELD_JA[f] for f in fs)}
+                           for k, fs in last["changed"].items()])
+                st.caption(f"最新版（v{last['version']}）の変更内容")
+                st.dataframe(pd.DataFrame(rows[:1000]), hide_index=True, use_container_width=True)
+            ps_key = st.text_input("社員ID を入力すると相性の良い相手（総合相性）の上位 10 名を表示", key="team_partner_key")
+            if ps_key:
+                if ps_key not in tstate["slot_of"]:
+                    st.warning("該当する社員ID がありません。")
+                else:
+                    import numpy as np
+                    me = int(np.flatnonzero(tstate["row_slots"] == tstate["slot_of"][ps_key])[0])
+                    sc = partner_scores(tstate, me)
+                    sc[tstate["row_slots"] == tstate["row_slots"][me]] = -np.inf
+                    best = np.argsort(-sc, kind="stable")[:10]
+                    st.dataframe(pd.DataFrame({
+                        "社員ID": [roster["keys"][i] for i in best],
+                        "氏名":   [roster["names"][i] for i in best],
+                        "部署":   [roster["dept_labels"][roster["dept"][i]] for i in best],
+                        "スコア": np.round(sc[best], 2),
+                    }), hide_index=True, use_container_width=True)
+
+        # ─── メンバー検索 ─────────────────────────────
+        st.markdown(
+            '<h3 style="font-size:0.85rem;font-weight:700;color:#6b7280;'
+            'letter-spacing:0.08em;margin:14px 0 4px;">🔍 メンバー検索（星・位置・日柱・天中殺・部署）</h3>',
+            unsafe_allow_html=True,
+        )
+        sr_text = st.text_input(
+            "検索条件", key="team_search_query", placeholder="例: 中央:龍高星 AND 足:車騎星",
+            help="項目は 頭 / 左手 / 中央 / 右手 / 足 / 星（いずれかの位置）/ 日柱 / 天中殺 / 部署。"
+                 "AND・OR・NOT と括弧で組み合わせ、空白区切りは AND。"
+                 "例: 天中殺:午未 部署:営業部 ／ 日柱:丁未 ／ 星:玉堂 NOT 部署:開発部")
+        if sr_text.strip():
+            from sanmei.search import count as _sr_count, query as _sr_query, rows as _sr_rows
+            index = _team_index(rhash, roster, codes)
+            try:
+                sr_bm = _sr_query(index, sr_text)
+            except ValueError as e:
+                st.warning(str(e))
+            else:
+                import pandas as pd
+                from sanmei.engine import STAR_NAMES, _TENCHU_GROUPS
+                from sanmei.search import KANSHI_NAMES
+                sr_rows = _sr_rows(sr_bm, index["n"])
+                st.caption(f"該当 {_sr_count(sr_bm):,} 名" + ("（先頭 1,000 名を表示）" if len(sr_rows) > 1000 else ""))
+                if len(sr_rows):
+                    sr_df = pd.DataFrame({
+                        "社員ID": [roster["keys"][i] for i in sr_rows],
+                        "氏名":   [roster["names"][i] for i in sr_rows],
+                        "部署":   [roster["dept_labels"][d] for d in roster["dept"][sr_rows]],
+                        "中央":   [STAR_NAMES[c] for c in codes["center"][sr_rows]],
+                        "日柱":   [KANSHI_NAMES[k] for k in codes["kanshi"][sr_rows]],
+                        "天中殺": [_TENCHU_GROUPS[g] + "天中殺" for g in codes["tenchu"][sr_rows]],
+                    })
+                    st.dataframe(sr_df.head(1000), hide_index=True, use_container_width=True)
+                    st.download_button("📥 検索結果（CSV）", data=sr_df.to_csv(index=False).encode("utf-8-sig"),
+                                       file_name="member_search.csv", mime="text/csv", key="team_search_csv")
+
+        # ─── 天中殺リスクカレンダー ───────────────────
+        st.markdown(
+            '<h3 style="font-size:0.85rem;font-weight:700;color:#6b7280;'
+            'letter-spacing:0.08em;margin:14px 0 4px;">📅 天中殺リスクカレンダー（部署別の該当者比率）</h3>',
+            unsafe_allow_html=True,
+        )
+        tc_years = st.slider("表示期間（年）", min_value=1, max_value=20, value=5, key="team_tc_years")
+        cal = _team_tenchu_calendar(rhash, date.today().isoformat(), tc_years, roster, codes)
+
+        import numpy as np
+        import pandas as pd
+        from sanmei.engine import STAR_NAMES, _TENCHU_GROUPS
+        from sanmei.tenchu import periods
+        months = pd.to_datetime(cal["start"])
+        df_frac = pd.DataFrame(cal["team_fraction"].T * 100, index=months,
+                               columns=roster["dept_labels"])
+        df_frac["全体"] = cal["total_fraction"] * 100
+        st.line_chart(df_frac, y_label="天中殺メンバー比率（%）")
+
+        n_by_group = [int((codes["tenchu"] == g).sum()) for g in range(len(_TENCHU_GROUPS))]
+        rows = []
+        for g, label in enumerate(_TENCHU_GROUPS):
+            if not n_by_group[g]:
+                continue
+            spans = "、".join(
+                f"{s:%Y/%m/%d}〜{e - timedelta(days=1):%Y/%m/%d}" if e else f"{s:%Y/%m/%d}〜"
+                for s, e in periods(cal["year"][g], cal["start"])
+            )
+            rows.append({"天中殺グループ": f"{label}天中殺", "人数": n_by_group[g],
+                         "年の天中殺（期間内）": spans or "—"})
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+
+        # ─── 年運ヒートマップ ─────────────────────────
+        st.markdown(
+            '<h3 style="font-size:0.85rem;font-weight:700;color:#6b7280;'
+            'letter-spacing:0.08em;margin:18px 0 4px;">🔮 年運ヒートマップ（その年の天干 × 日干）</h3>',
+            unsafe_allow_html=True,
+        )
+        fc_col1, fc_col2 = st.columns(2)
+        with fc_col1:
+            fc_years = st.slider("予測年数", min_value=1, max_value=20, value=10, key="team_fc_years")
+        with fc_col2:
+            fc_dept = st.selectbox("部署", ["全体"] + roster["dept_labels"], key="team_fc_dept")
+        fc_start = date.today().year
+        fc_all   = _team_forecast(rhash, fc_start, fc_years, codes)
+        if fc_dept == "全体":
+            fc_rows = np.arange(len(roster["keys"]))
+        else:
+            fc_rows = np.flatnonzero(roster["dept"] == roster["dept_labels"].index(fc_dept))
+        fc_stars = fc_all[fc_rows]
+
+        from sanmei.forecast import star_counts
+        st.caption(f"星ごとの人数（{len(fc_rows):,}名）")
+        st.markdown(forecast_counts_html(star_counts(fc_stars), fc_start), unsafe_allow_html=True)
+
+        _FC_MEMBER_LIMIT = 200
+        fc_names = tuple(roster["names"][i] or roster["keys"][i] for i in fc_rows[:_FC_MEMBER_LIMIT])
+        if len(fc_rows) <= _FC_MEMBER_LIMIT:
+            with st.expander(f"👤 メンバー別の年運（{len(fc_rows)}名）"):
+                st.markdown(forecast_heatmap_html(fc_names, fc_stars, fc_start), unsafe_allow_html=True)
+        else:
+            st.caption(f"メンバー別の表示・PDF は先頭 {_FC_MEMBER_LIMIT} 名までです。部署を絞り込んでください。")
+
+        font_path = find_japanese_font()
+        if font_path:
+            # 描画は押下時だけ（スライダー・部署を動かすたびに描画枠と回数制限を使わない）。
+            # 作成後は同じ条件のままの再実行でキャッシュから返す
+            fc_spec = (rhash, fc_dept, fc_start, fc_years)
+            if st.button("チーム年運ヒートマップの PDF を作成", key="team_fc_pdf_btn"):
+                st.session_state["team_fc_pdf"] = fc_spec
+            fc_pdf = None
+            if st.session_state["team_fc_pdf"] == fc_spec:
+                try:
+                    fc_pdf = _admitted(generate_team_forecast_pdf, fc_dept, fc_names,
+                                       fc_stars[:_FC_MEMBER_LIMIT], fc_start, font_path)
+                except (QueueFull, Throttled) as e:
+                    st.error(str(e))
+                    st.session_state["team_fc_pdf"] = None
+            if fc_pdf:
+                st.download_button(
+                    label="⬇️ チーム年運ヒートマップ（PDF）をダウンロード",
+                    data=fc_pdf,
+                    file_name=f"Team_Forecast_{fc_dept}_{fc_start}.pdf",
+                    mime="application/pdf",
+                    use_container_width=True,
+                )
+
+        # ─── 最適ペアリング提案 ──────────────────────
+        st.markdown(
+            '<h3 style="font-size:0.85rem;font-weight:700;color:#6b7280;'
+            'letter-spacing:0.08em;margin:18px 0 4px;">🧩 最適ペアリング提案（相性スコア最大化）</h3>',
+            unsafe_allow_html=True,
+        )
+        from sanmei.batch import RELATIONS, relation_codes
+        from sanmei.pairing import PRESETS
+        _PAIR_LIMIT = 5000   # スコア行列の一辺の上限（メモリ保護）
+        pr_specs = (["全員"] + [f"区分: {r}" for r in sorted(set(roster["roles"]) - {""})]
+                    + [f"部署: {d}" for d in roster["dept_labels"]])
+        pr_preset = st.selectbox("用途", list(PRESETS), format_func=lambda k: PRESETS[k]["label"],
+                                 key="team_pair_preset")
+        pr_mode = st.radio("方式", ["2グループ間の割り当て", "グループ内のペア作り"],
+                           horizontal=True, key="team_pair_mode")
+        if pr_mode == "2グループ間の割り当て":
+            pr_c1, pr_c2, pr_c3 = st.columns([2, 2, 1])
+            with pr_c1:
+                pr_a = st.selectbox("A 側（メンター等）", pr_specs, key="team_pair_a")
+            with pr_c2:
+                pr_b = st.selectbox("B 側（新人等）", pr_specs, key="team_pair_b",
+                                    index=min(1, len(pr_specs) - 1))
+            with pr_c3:
+                pr_cap = st.number_input("A 側の定員", min_value=1, max_value=20, value=1,
+                                         key="team_pair_cap")
+        else:
+            pr_a   = st.selectbox("対象", pr_specs, key="team_pair_pool")
+            pr_b   = ""
+            pr_cap = 1
+        pr_rule = st.radio("部署の制約", ["", "same", "different"], horizontal=True, key="team_pair_rule",
+                           format_func={"": "制約なし", "same": "同じ部署のみ", "different": "別部署のみ"}.get)
+
+        pr_n_a = len(_team_select(roster, pr_a)) * int(pr_cap)
+        pr_n_b = len(_team_select(roster, pr_b)) if pr_b else pr_n_a
+        if max(pr_n_a, pr_n_b) > _PAIR_LIMIT:
+            st.warning(f"対象が多すぎます（上限 {_PAIR_LIMIT:,} 名）。区分や部署で絞り込んでください。")
+        elif st.button("ペアリングを計算", key="team_pair_btn", use_container_width=True):
+            st.session_state["team_pairing"] = _team_pairing(
+                rhash, pr_preset, pr_a, pr_b, int(pr_cap), pr_rule, roster, codes)
+
+        res = st.session_state.get("team_pairing")
+        if res is not None:
+            m1, m2, m3 = st.columns(3)
+            m1.metric("スコア合計（目的関数）", f"{res['objective']:,.1f}")
+            m2.metric("成立ペア数", f"{len(res['a']):,}")
+            m3.metric("計算時間", f"{res['runtime_s']:.2f} 秒", help=f"手法: {res['method']}")
+            center = codes["center"]
+            df_pairs = pd.DataFrame({
+                "A":        [roster["names"][i] or roster["keys"][i] for i in res["a"]],
+                "B":        [roster["names"][i] or roster["keys"][i] for i in res["b"]],
+                "スコア":   np.round(res["scores"], 2),
+                "パワーバランス": [RELATIONS[r] for r in
+                                   relation_codes(center[res["a"]] // 2, center[res["b"]] // 2)],
+            })
+            st.dataframe(df_pairs.head(300), hide_index=True, use_container_width=True)
+            st.download_button("⬇️ ペアリング結果（CSV）", data=df_pairs.to_csv(index=False).encode("utf-8-sig"),
+                               file_name="pairing.csv", mime="text/csv")
+
+        # ─── チーム編成（k 名の最適チーム探索）──────────
+        st.markdown(
+            '<h3 style="font-size:0.85rem;font-weight:700;color:#6b7280;'
+            'letter-spacing:0.08em;margin:18px 0 4px;">🏗️ チーム編成（相性の良い k 名チームを探索）</h3>',
+            unsafe_allow_html=True,
+        )
+        st.caption("五行の網羅度・右手／足の星の多様性・天中殺の重なりの少なさでチームを採点します。")
+        from sanmei.teams import TEAM_SIZE_MAX, TEAM_SIZE_MIN, team_score
+        tm_c1, tm_c2, tm_c3, tm_c4 = st.columns([2, 1, 1, 1])
+        with tm_c1:
+            tm_pool = st.selectbox("候補者", pr_specs, key="team_build_pool")
+        with tm_c2:
+            tm_k = st.number_input("人数", min_value=TEAM_SIZE_MIN, max_value=TEAM_SIZE_MAX,
+                                   value=5, key="team_build_k")
+        with tm_c3:
+            tm_top = st.number_input("上位件数", min_value=1, max_value=20, value=5, key="team_build_top")
+        with tm_c4:
+            tm_budget = st.number_input("時間予算（秒）", min_value=0.5, max_value=10.0, value=2.0,
+                                        step=0.5, key="team_build_budget")
+        if st.button("チームを探索", key="team_build_btn", use_container_width=True):
+            st.session_state["team_teams"] = _team_search(
+                rhash, tm_pool, int(tm_k), int(tm_top), float(tm_budget), roster, codes)
+
+        tm_res = st.session_state.get("team_teams")
+        if tm_res is not None:
+            tm_stats = tm_res["stats"]
+            st.caption(
+                f"探索ノード {tm_stats['nodes']:,} ／ 枝刈り {tm_stats['pruned']:,} ／ 評価 {tm_stats['evaluated']:,}"
+                f" ／ クラス数 {tm_stats['classes']:,}（素朴な全列挙 {tm_stats['naive']:,} 通り）"
+                f" ／ {tm_stats['runtime_s']:.2f} 秒" + ("（時間予算で打ち切り）" if tm_stats["timed_out"] else "")
+            )
+            for rank, (members, comp, alt) in enumerate(
+                    zip(tm_res["teams"], tm_res["components"], tm_res["alternatives"]), start=1):
+                with st.expander(f"第{rank}案　スコア {comp['score']:.2f}"
+                                 + (f"（同構成の別メンバー案 {alt:,} 通り）" if alt else "")):
+                    st.markdown(
+                        f"五行の網羅度 {comp['coverage']:.0%} ／ 右手の多様性 {comp['right']:.0%}"
+                        f" ／ 足の多様性 {comp['feet']:.0%} ／ 天中殺の重なり {comp['tenchu']:.0%}"
+                    )
+                    st.dataframe(pd.DataFrame({
+                        "氏名":   [roster["names"][i] or roster["keys"][i] for i in members],
+                        "部署":   [roster["dept_labels"][roster["dept"][i]] for i in members],
+                        "中心星": [STAR_NAMES[codes["center"][i]] for i in members],
+                        "右手":   [STAR_NAMES[codes["right"][i]] for i in members],
+                        "足":     [STAR_NAMES[codes["feet"][i]] for i in members],
+                        "天中殺": [_TENCHU_GROUPS[codes["tenchu"][i]] for i in members],
+                    }), hide_index=True, use_container_width=True)
+
+        _TM_PICK_LIMIT = 1000
+        tm_rows = _team_select(roster, tm_pool)[:_TM_PICK_LIMIT]
+        tm_pick = st.multiselect(
+            f"任意のメンバーでスコアを確認（{TEAM_SIZE_MIN}〜{TEAM_SIZE_MAX}名）", tm_rows.tolist(),
+            format_func=lambda i: roster["names"][i] or roster["keys"][i],
+            max_selections=TEAM_SIZE_MAX, key="team_build_pick",
+        )
+        if len(tm_pick) >= TEAM_SIZE_MIN:
+            tm_manual = team_score(codes, tm_pick)
+            st.markdown(
+                f"**スコア {tm_manual['score']:.2f}**　五行 {tm_manual['coverage']:.0%} ／ "
+                f"右手 {tm_manual['right']:.0%} ／ 足 {tm_manual['feet']:.0%} ／ 天中殺の重なり {tm_manual['tenchu']:.0%}"
+            )
+
+        # ─── 組織図分析（上司 → 部下）────────────────────
+        st.markdown(
+            '<h3 style="font-size:0.85rem;font-weight:700;color:#6b7280;'
+            'letter-spacing:0.08em;margin:18px 0 4px;">🏢 組織図分析（上司 → 部下の全関係）</h3>',
+            unsafe_allow_html=True,
+        )
+        if not (roster["manager"] >= 0).any():
+            st.caption("名簿に「上司ID」列がないため、組織図分析は表示されません。")
+        else:
+            org = _team_org(rhash, roster, codes)
+            org_total = org["total"]
+            org_edges = max(org_total["edges"], 1)
+            o1, o2, o3 = st.columns(3)
+            o1.metric("上司→部下の関係", f"{org_total['edges']:,}")
+            o2.metric("要注意（部下が上司を相克）", f"{org_total['adverse']:,}",
+                      f"{org_total['adverse'] / org_edges:.1%}", delta_color="off")
+            o3.metric("天中殺グループ一致", f"{org_total['tenchu_same'] / org_edges:.1%}")
+
+            od = org["by_dept"]
+            od_n = np.maximum(od["edges"], 1)
+            st.caption("部署別（部下の所属で集計）")
+            st.dataframe(pd.DataFrame({
+                "部署":          roster["dept_labels"],
+                "関係数":        od["edges"],
+                "要注意率":      np.round(od["adverse"] / od_n * 100, 1),
+                "右手一致率":    np.round(od["right_same"] / od_n * 100, 1),
+                "足一致率":      np.round(od["feet_same"] / od_n * 100, 1),
+                "天中殺一致率":  np.round(od["tenchu_same"] / od_n * 100, 1),
+            }), hide_index=True, use_container_width=True)
+
+            om = org["by_manager"]
+            om_rows = np.flatnonzero(om["adverse"] > 0)
+            om_rows = om_rows[np.lexsort((-om["edges"][om_rows], -om["adverse"][om_rows]))][:20]
+            if len(om_rows):
+                st.caption("要注意の関係が多い上司（上位 20 名）")
+                st.dataframe(pd.DataFrame({
+                    "上司":    [roster["names"][i] or roster["keys"][i] for i in om_rows],
+                    "部署":    [roster["dept_labels"][roster["dept"][i]] for i in om_rows],
+                    "部下数":  om["edges"][om_rows],
+                    "要注意":  om["adverse"][om_rows],
+                    "中心星":  [STAR_NAMES[codes["center"][i]] for i in om_rows],
+                }), hide_index=True, use_container_width=True)
+
+            am, ar = org["adverse_manager"], org["adverse_report"]
+            st.download_button(
+                "⬇️ 要注意の関係一覧（CSV）",
+                data=pd.DataFrame({
+                    "上司ID":       [roster["keys"][i] for i in am],
+                    "上司":         [roster["names"][i] for i in am],
+                    "上司の中心星": [STAR_NAMES[c] for c in codes["center"][am]],
+                    "部下ID":       [roster["keys"][i] for i in ar],
+                    "部下":         [roster["names"][i] for i in ar],
+                    "部下の中心星": [STAR_NAMES[c] for c in codes["center"][ar]],
+                }).to_csv(index=False).encode("utf-8-sig"),
+                file_name="org_adverse_edges.csv", mime="text/csv",
+            )
+
+        # ─── 分布ダッシュボード ───────────────────────
+        st.markdown(
+            '<h3 style="font-size:0.85rem;font-weight:700;color:#6b7280;'
+            'letter-spacing:0.08em;margin:18px 0 4px;">📊 分布ダッシュボード（中心星・五行・天中殺）</h3>',
+            unsafe_allow_html=True,
+        )
+        from sanmei.distribution import ELEMENTS
+        ds_c1, ds_c2 = st.columns(2)
+        ds_depts = ds_c1.multiselect("部署で絞り込み", roster["dept_labels"], key="team_dist_depts",
+                                     placeholder="全部署")
+        ds_role_opts = sorted({r for r in roster["roles"] if r})
+        ds_roles = ds_c2.multiselect("区分で絞り込み", ds_role_opts, key="team_dist_roles",
+                                     placeholder="全区分", disabled=not ds_role_opts)
+        dist = _team_distribution(rhash, tuple(ds_depts), tuple(ds_roles), roster, codes, tstate)
+        if dist["n"] == 0:
+            st.caption("条件に該当するメンバーがいません。")
+        else:
+            dm1, dm2, dm3 = st.columns(3)
+            dm1.metric("対象メンバー", f"{dist['n']:,}名")
+            dm2.metric("似た者同士ペア（中心星が同じ）",
+                       f"{dist['same_pairs'] / max(dist['pairs'], 1):.1%}")
+            dm3.metric("最多の中心星", STAR_NAMES[int(dist["center"].argmax())])
+
+            st.caption("中心星の分布（人数）")
+            st.bar_chart(pd.DataFrame({"人数": dist["center"]}, index=STAR_NAMES))
+
+            ds_in = np.flatnonzero(dist["size_by_dept"] > 0)
+            ds_size = np.maximum(dist["size_by_dept"][ds_in], 1)[:, None]
+            st.caption("部署別の五行バランス（構成比 %）")
+            st.bar_chart(pd.DataFrame(np.round(dist["element_by_dept"][ds_in] / ds_size * 100, 1),
+                                      columns=ELEMENTS,
+                                      index=[roster["dept_labels"][d] for d in ds_in]))
+
+            st.caption("天中殺グループの構成（人数）")
+            st.bar_chart(pd.DataFrame({"人数": dist["tenchu"]}, index=[g + "天中殺" for g in _TENCHU_GROUPS]))
+
+            ds_pairs = np.maximum(dist["pairs_by_dept"][ds_in], 1)
+            st.caption("部署内ペアの相性タイプ（COMPATIBILITY_LOGIC の「似た者同士」/「補完」）")
+            st.dataframe(pd.DataFrame({
+                "部署":           [roster["dept_labels"][d] for d in ds_in],
+                "人数":           dist["size_by_dept"][ds_in],
+                "似た者同士(%)":  np.round(dist["same_pairs_by_dept"][ds_in] / ds_pairs * 100, 1),
+                "補完(%)":        np.round(100 - dist["same_pairs_by_dept"][ds_in] / ds_pairs * 100, 1),
+                "最多の天中殺":   [_TENCHU_GROUPS[g] for g in dist["tenchu_by_dept"][ds_in].argmax(axis=1)],
+            }), hide_index=True, use_container_width=True)
+
+        # ─── BI 向けエクスポート ──────────────────────
+        with st.expander("📦 BI 向けエクスポート（Parquet / Arrow）"):
+            from sanmei import export as _export
+            if not _export._PYARROW_AVAILABLE:
+                st.caption("エクスポートには pyarrow が必要です（pip install pyarrow）。")
+            else:
+                ex_c1, ex_c2, ex_c3 = st.columns(3)
+                ex_kind = ex_c1.selectbox("データ", ["members", "pairs_top", "aggregates"], key="team_export_kind",
+                                          format_func={"members": "メンバー別の星・柱",
+                                                       "pairs_top": "相性上位（総合相性）",
+                                                       "aggregates": "部署別の分布"}.get)
+                ex_fmt = ex_c2.selectbox("形式", list(_export.FORMATS), key="team_export_fmt",
+                                         format_func={"parquet": "Parquet", "arrow": "Arrow IPC"}.get)
+                ex_top = ex_c3.number_input("相性上位の件数", min_value=1, max_value=50, value=10,
+                                            key="team_export_top", disabled=ex_kind != "pairs_top")
+                if st.button("エクスポートを作成", key="team_export_btn"):
+                    from sanmei import bulk
+                    ex_batches = {
+                        "members":    lambda: _export.roster_batches(roster, codes),
+                        "pairs_top":  lambda: _export.pair_batches(roster, codes, int(ex_top)),
+                        "aggregates": lambda: _export.aggregate_batches(
+                            _team_distribution(rhash, (), (), roster, codes, tstate), roster["dept_labels"]),
+                    }[ex_kind]()
+                    with st.spinner("書き出し中..."):   # 一括作成の ZIP と同じく static/bulk/ に書き、パスだけ持つ
+                        ex_path, ex_rows = bulk.write_file(lambda f: _export.write(ex_batches, f, ex_fmt),
+                                                           _export.FORMATS[ex_fmt])
+                    st.session_state["team_export"] = (f"{ex_kind}{_export.FORMATS[ex_fmt]}", str(ex_path), ex_rows)
+                if st.session_state["team_export"]:
+                    from sanmei import bulk
+                    ex_name, ex_file, ex_rows = st.session_state["team_export"]
+                    ex_path = Path(ex_file)
+                    if not ex_path.exists():
+                        st.caption("作成済みのエクスポートは保存期間（1 時間）を過ぎたため削除されました。")
+                    elif st.get_option("server.enableStaticServing"):
+                        st.markdown(
+                            f'<a href="{bulk.url_for(ex_path)}" download="{ex_name}" style="font-weight:700;">'
+                            f'⬇️ {ex_name}（{ex_rows:,} 行, {ex_path.stat().st_size / 1e6:.1f}MB）をダウンロード</a>',
+                            unsafe_allow_html=True,
+                        )
+                        st.caption("リンクの有効期間は作成から 1 時間です。")
+                    else:
+                        with open(ex_path, "rb") as ex_f:
+                            st.download_button(f"⬇️ {ex_name}（{ex_rows:,} 行）", data=ex_f, file_name=ex_name,
+                                               mime="application/octet-stream", key="team_export_dl")
+
+        # ─── 個人レポートの一括作成（ZIP）─────────────────
+        st.markdown(
+            '<h3 style="font-size:0.85rem;font-weight:700;color:#6b7280;'
+            'letter-spacing:0.08em;margin:18px 0 4px;">📚 個人レポートの一括作成（ZIP）</h3>',
+            unsafe_allow_html=True,
+        )
+        _BULK_LIMIT = 1000
+        font_path = find_japanese_font()
+        if not font_path:
+            st.caption("日本語フォントが見つからないため、PDF を作成できません。")
+        else:
+            from sanmei import bulk, workspace
+            # 保存済みの組織を開いている（名簿がその保存版のまま）なら、作成した ZIP を組織のレポート参照に残す
+            bk_org = st.session_state["team_org"]
+            if bk_org and not any(o["name"] == bk_org and o["roster_hash"] == rhash
+                                  for o in workspace.list_orgs(_WORKSPACE_DB)):
+                bk_org = ""
+            if bk_org and not st.session_state["team_bulk"]:
+                st.session_state["team_bulk"] = _team_saved_zip(bk_org)
+            bk_spec = st.selectbox("対象", pr_specs, key="team_bulk_spec")
+            bk_rows = _team_select(roster, bk_spec)
+            if len(bk_rows) > _BULK_LIMIT:
+                st.warning(f"一括作成は {_BULK_LIMIT:,} 名までです（対象 {len(bk_rows):,} 名）。区分や部署で絞り込んでください。")
+            elif (st.button(f"{len(bk_rows):,} 名分の PDF を作成", key="team_bulk_btn", disabled=not len(bk_rows))
+                  and _allow("bulk")):   # 一括作成は 1 回ごとに数える（各 PDF は pdf の制限とは別枠）
+                from sanmei.batch import gototoku_from_codes
+                bk_bar = st.progress(0.0, text="PDF を作成中...")
+                bk_items = ((f"{i + 1:04d}_{bulk.safe_name(roster['keys'][r])}_"
+                             f"{bulk.safe_name(roster['names'][r] or '名前未設定')}.pdf", int(r))
+                            for i, r in enumerate(bk_rows))
+                bk_done = [0]
+
+                def _bk_render(r: int) -> bytes:
+                    # 1 件ごとに描画枠を取り直し、他のセッションの要求を間に通す
+                    with _render_queue().slot(_session_id(), on_wait=lambda pos: bk_bar.progress(
+                            bk_done[0] / len(bk_rows), text=f"順番待ち（{pos} 番目）... {bk_done[0]:,} / {len(bk_rows):,}")):
+                        return _render_personal_pdf(roster["names"][r] or roster["keys"][r],
+                                                    gototoku_from_codes(codes, r), font_path)
+
+                def _bk_progress(n: int, _):
+                    bk_done[0] = n
+                    bk_bar.progress(n / len(bk_rows), text=f"PDF を作成中... {n:,} / {len(bk_rows):,}")
+
+                try:
+                    bk_path = bulk.write_zip(bk_items, _bk_render, on_progress=_bk_progress)
+                except QueueFull as e:
+                    st.error(str(e))
+                else:
+                    st.session_state["team_bulk"] = (str(bk_path), len(bk_rows))
+                    if bk_org:
+                        workspace.add_reports(_WORKSPACE_DB, bk_org, "bulk_zip",
+                                              {roster["keys"][r]: bk_path.name for r in bk_rows})
+                bk_bar.empty()
+            rq = _render_queue().metrics()
+            st.caption(f"レポート作成キュー: 作成中 {rq['running']} / 上限 {rq['concurrency']}・"
+                       f"順番待ち {rq['waiting']} 件・待ち時間 p95 {rq['wait_p95_s']:.1f} 秒")
+            if st.session_state["team_bulk"]:
+                bk_file, bk_n = st.session_state["team_bulk"]
+                bk_path = Path(bk_file)
+                if not bk_path.exists():
+                    st.caption("作成済みの ZIP は保存期間（1 時間）を過ぎたため削除されました。")
+                elif st.get_option("server.enableStaticServing"):
+                    st.markdown(
+                        f'<a href="{bulk.url_for(bk_path)}" download="reports_{bk_n}.zip" '
+                        f'style="font-weight:700;">⬇️ 個人レポート {bk_n:,} 名分（ZIP, '
+                        f'{bk_path.stat().st_size / 1e6:.1f}MB）をダウンロード</a>',
+                        unsafe_allow_html=True,
+                    )
+                    st.caption("リンクの有効期間は作成から 1 時間です。")
+                else:   # 静的配信が無効な環境では従来どおりメモリ経由で渡す
+                    with open(bk_path, "rb") as bk_f:
+                        st.download_button(f"⬇️ 個人レポート {bk_n:,} 名分（ZIP）", data=bk_f,
+                                           file_name=f"reports_{bk_n}.zip", mime="application/zip",
+                                           key="team_bulk_dl")
+
+
 # ══════════════════════════════════════════════
 #  法人・大人数向け問い合わせセクション
 #  （タブの外・ページ最下部に常時表示）
@@ -1376,3 +2405,26 @@ st.link_button(
     use_container_width=True,
 )
 st.caption("※ ご返信は通常 1〜2 営業日以内です。")
+
+
+# ─────────────────────────────────────────────
+#  運用者パネル・プロファイルの保存（PROFILE_TOKEN 設定時のみ）
+# ─────────────────────────────────────────────
+if _PROFILE_TOKEN:
+    _prof_saved = _profiling.end(st.session_state, context={
+        "personal": st.session_state["p1_result"] is not None, "paid_p1": st.session_state["paid_p1"],
+        "business": st.session_state["c_result_b"] is not None, "paid_c": st.session_state["paid_c"],
+        "team_members": len((st.session_state["team_roster"] or {}).get("keys", ())),
+    })
+    if st.session_state.get("profile_admin"):
+        with st.expander("🛠 プロファイル（運用者向け）"):
+            if _prof_saved:
+                st.caption(f"保存しました: {_prof_saved.name}")
+            if st.button("次の再実行を記録する", key="profile_arm"):
+                _profiling.arm(st.session_state)
+            if _profiling.armed(st.session_state):
+                st.caption("⏺ 次の再実行（ボタン操作・入力の変更）を記録します。")
+            for _pr in _profiling.recent(_PROFILE_DIR):
+                st.caption(f"{_pr['file']} · {_pr['profiled_s']} 秒"
+                           + ("" if _pr["complete"] else "（途中まで）") + " · "
+                           + ", ".join(f"{k} {v['sum_s']:.3f}s" for k, v in _pr["stages"]))
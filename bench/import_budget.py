@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+app.py のコールドスタート時の import 時間チェック（-X importtime）
+
+新しいプロセスで Streamlit と AppTest を読み込んだあと、アプリを 1 回だけ実行し
+（ウォームアップ無効・未購入のティザー表示）、その実行で新たに import されたモジュールの
+self 時間を合計する。次のどちらかに当てはまると終了コード 1 を返す。
+
+  ・合計が予算（--budget-ms）を超えた
+  ・初回表示で読み込まないはずの重い依存（LAZY）が import された
+
+    python bench/import_budget.py [--budget-ms 150] [--top 15]
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 初回表示では読み込まず、使う処理の中で初めて import する依存
+LAZY = ("stripe", "fpdf", "PIL", "numpy", "scipy", "pyarrow")
+
+_CHILD = r"""
+import json, sys
+from streamlit.testing.v1 import AppTest
+before = set(sys.modules)
+AppTest.from_file(sys.argv[1], default_timeout=120).run()
+print(json.dumps(sorted(set(sys.modules) - before)))
+"""
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure() -> tuple[dict, list[str]]:
+    """(モジュール名 → self 時間 µs, アプリ実行で新たに import されたモジュール) を返す。"""
+    env = dict(os.environ, PYTHONPATH=str(ROOT), SANMEI_WARMUP="0")
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", _CHILD, str(ROOT / "app.py")],
+                         env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+    self_us = {}
+    for m in _LINE.finditer(out.stderr):
+        self_us[m.group(4)] = int(m.group(1))
+    return self_us, json.loads(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--budget-ms", type=float, default=150.0)
+    ap.add_argument("--top", type=int, default=15)
+    args = ap.parse_args()
+
+    self_us, new = measure()
+    timed = sorted(((self_us[m], m) for m in new if m in self_us), reverse=True)
+    total_ms = sum(us for us, _ in timed) / 1e3
+    for us, m in timed[:args.top]:
+        print(f"{us / 1e3:8.1f} ms  {m}")
+    print(f"アプリ実行で増えたモジュール {len(new)} 個, import 時間（self 合計）{total_ms:.1f} ms"
+          f" / 予算 {args.budget_ms:.0f} ms")
+
+    failed = False
+    eager = sorted({m.split(".")[0] for m in new} & set(LAZY))
+    if eager:
+        print(f"NG: 初回表示で重い依存が import されています: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print("NG: import 時間が予算を超えています")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+"""
+同時セッションの負荷試験（1 インスタンスで何人まで捌けるか）
+
+構成ごとに `streamlit run app.py` を 1 つ起動し、ブラウザと同じ WebSocket プロトコル
+（/_stcore/stream に BackMsg を送り、ForwardMsg を script_finished まで受け取る）で
+仮想ユーザーを同時に N 人つなぐ。各フローは新しいセッション（新規訪問）から始める。
+
+  personal … 画面を開く → 氏名・生年月日を入力して診断（解析演出つき）
+  compat   … 画面を開く → 2 名分を入力して相性診断
+  purchase … 個人診断 → 決済完了の戻り URL（?status=success&session_id=…&product=p1）で開き直す
+             → PDF を描画 → /media から PDF を取得
+             （ティザー表示では購入ボタンが無効のため、購入は Checkout から戻る経路で再現する）
+  callback … 組織相性レポートの決済完了の戻り URL で開く → PDF を描画 → 取得
+
+Stripe API（Checkout セッションの取得）はこのスクリプト内の代替サーバーが返す
+（--stripe-latency-ms の遅延つき）。サーバーには secrets の STRIPE_API_BASE で向ける。
+
+同時ユーザー数（--users）ごとに --duration 秒ずつ回し、フロー / 秒・ステップの p50/p95/p99・
+サーバープロセスの RSS を出す。飽和点は「ユーザーを増やしてもスループットが 10% 以上伸びない、
+または p95 が 1 人のときの --saturation-factor 倍を超える、または失敗が出る」直前の同時ユーザー数。
+
+構成（--config）は「名前:キー=値,キー=値」で secrets.toml を上書きする。
+負荷をかける側も CPU を使うため、厳密に測るときはサーバーと別のマシンから --url で指定する
+（その場合の Stripe 代替サーバーは --stripe-host で到達できるアドレスにする）。
+
+    python bench/loadtest.py --users 1,2,4,8,16 --duration 30
+    python bench/loadtest.py --config 既定 --config 演出なし:ANIMATION_SECONDS=0 \\
+                             --config 描画2並列:ANIMATION_SECONDS=0,RENDER_CONCURRENCY=2 --out load.json
+
+クライアントには Streamlit が依存している websockets を使う。
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from websockets.asyncio.client import connect
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = str(ROOT / "app.py")
+
+_NAMES = ["田中 太郎", "鈴木 花子", "佐藤 健", "高橋 美咲", "伊藤 翔", "渡辺 結衣"]
+_RERUN = ForwardMsg.ScriptFinishedStatus.Value("FINISHED_EARLY_FOR_RERUN")
+
+
+def _birth(rng: random.Random) -> str:
+    return (date(1960, 1, 1) + timedelta(days=rng.randrange(16_000))).isoformat()
+
+
+# ─────────────────────────────────────────────
+#  Stripe API の代替サーバー（GET /v1/checkout/sessions/<id> だけ）
+#  セッション ID に商品と生年月日を埋め込み、メタデータとして返す:
+#    cs_test_<乱数>_<p1|c>_<YYYY-MM-DD>[_<YYYY-MM-DD>]
+# ─────────────────────────────────────────────
+def _stripe_stub(host: str, latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            sid = self.path.split("?")[0].rstrip("/").rsplit("/", 1)[-1]
+            _, _, _, product, *births = sid.split("_")
+            time.sleep(latency)
+            body = json.dumps({
+                "id": sid, "object": "checkout.session", "payment_status": "paid",
+                "metadata": {"product": product, "name": "|".join(_NAMES[:len(births)]),
+                             "birth": "|".join(births)},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ─────────────────────────────────────────────
+#  WebSocket クライアント（1 インスタンス = ブラウザのタブ 1 つ）
+# ─────────────────────────────────────────────
+class FlowError(Exception):
+    pass
+
+
+class Session:
+    def __init__(self, url: str):
+        self.url = url
+        self.ws = None
+        self.ids: dict[str, str] = {}        # ウィジェットのキー → ID
+        self.elements: list = []             # 直近の実行で表示された要素 (種類, proto)
+
+    async def __aenter__(self):
+        ws_url = self.url.replace("http", "ws", 1) + "/_stcore/stream"
+        self.ws = await connect(ws_url, subprotocols=["streamlit"], max_size=None)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.ws.close()
+
+    async def run(self, query: str = "", values: dict | None = None, click: str | None = None):
+        """スクリプトを再実行し、終わるまで（st.rerun の続きも含めて）待つ。
+        values はキー → 値（str は文字入力、date は日付入力）、click は押すボタンのキー。
+        """
+        msg = BackMsg()
+        msg.rerun_script.query_string = query
+        states = msg.rerun_script.widget_states.widgets
+        for key, value in (values or {}).items():
+            w = states.add()
+            w.id = self._id(key)
+            if key.endswith(("birth_input", "birth_a", "birth_b")):
+                w.string_array_value.data.append(value)
+            else:
+                w.string_value = value
+        if click:
+            w = states.add()
+            w.id = self._id(click)
+            w.trigger_value = True
+        await self.ws.send(msg.SerializeToString())
+        self.elements = []
+        while True:
+            f = ForwardMsg()
+            f.ParseFromString(await self.ws.recv())
+            kind = f.WhichOneof("type")
+            if kind == "delta" and f.delta.WhichOneof("type") == "new_element":
+                e = f.delta.new_element
+                et = e.WhichOneof("type")
+                self.elements.append((et, getattr(e, et)))
+                wid = getattr(getattr(e, et), "id", "")
+                if wid.startswith("$$ID-"):
+                    self.ids[wid.split("-", 2)[2]] = wid
+            elif kind == "script_finished" and f.script_finished != _RERUN:
+                break
+        errors = [e.message for et, e in self.elements if et == "exception"]
+        if errors:
+            raise FlowError(errors[0])
+        return self
+
+    def _id(self, key: str) -> str:
+        if key not in self.ids:
+            raise FlowError(f"ウィジェット {key} が表示されていません")
+        return self.ids[key]
+
+    async def download_pdf(self) -> int:
+        """PDF のダウンロードボタンが指す /media のファイルを取得し、バイト数を返す。"""
+        urls = [e.url for et, e in self.elements if et == "download_button" and "PDF" in e.label]
+        if not urls:
+            raise FlowError("PDF のダウンロードボタンが表示されていません")
+        data = await asyncio.to_thread(lambda: urllib.request.urlopen(self.url + urls[0], timeout=60).read())
+        if not data.startswith(b"%PDF"):
+            raise FlowError("PDF ではないファイルが返されました")
+        return len(data)
+
+
+# ─────────────────────────────────────────────
+#  フロー（step(名前, コルーチン) で各ステップを計測する）
+# ─────────────────────────────────────────────
+def _success_query(product: str, births: list[str]) -> str:
+    return f"status=success&session_id=cs_test_{uuid.uuid4().hex}_{product}_{'_'.join(births)}&product={product}"
+
+
+async def _diagnose_personal(step, s: Session, rng, birth: str):
+    await step("open", s.run())
+    await step("diagnose", s.run(values={"p1_name_input": rng.choice(_NAMES), "p1_birth_input": birth},
+                                 click="p1_btn"))
+
+
+async def flow_personal(step, url, rng):
+    async with Session(url) as s:
+        await _diagnose_personal(step, s, rng, _birth(rng))
+
+
+async def flow_compat(step, url, rng):
+    async with Session(url) as s:
+        await step("open", s.run())
+        await step("diagnose", s.run(values={
+            "c_name_a_input": rng.choice(_NAMES), "c_birth_a": _birth(rng),
+            "c_name_b_input": rng.choice(_NAMES), "c_birth_b": _birth(rng)}, click="c_btn"))
+
+
+async def flow_purchase(step, url, rng):
+    birth = _birth(rng)
+    async with Session(url) as s:
+        await _diagnose_personal(step, s, rng, birth)
+    async with Session(url) as s:                                   # Checkout から戻った新しいタブ
+        await step("return_pdf", s.run(query=_success_query("p1", [birth])))
+        await step("download", s.download_pdf())
+
+
+async def flow_callback(step, url, rng):
+    async with Session(url) as s:
+        await step("return_pdf", s.run(query=_success_query("c", [_birth(rng), _birth(rng)])))
+        await step("download", s.download_pdf())
+
+
+FLOWS = {"personal": flow_personal, "compat": flow_compat,
+         "purchase": flow_purchase, "callback": flow_callback}
+
+
+# ─────────────────────────────────────────────
+#  計測
+# ─────────────────────────────────────────────
+def _pct(vals: list[float], p: float) -> float:
+    if not vals:
+        return 0.0
+    s = sorted(vals)
+    return s[min(len(s) - 1, int(p * len(s)))]
+
+
+def _rss_mb(pid: int | None) -> dict:
+    """サーバープロセスの現在 / 最大 RSS（Linux の /proc のみ）。"""
+    try:
+        status = Path(f"/proc/{pid}/status").read_text()
+    except (OSError, TypeError):
+        return {}
+    kb = {k: int(v.split()[0]) for k, v in (line.split(":", 1) for line in status.splitlines())
+          if k in ("VmRSS", "VmHWM")}
+    return {"rss_mb": round(kb.get("VmRSS", 0) / 1024, 1), "rss_peak_mb": round(kb.get("VmHWM", 0) / 1024, 1)}
+
+
+async def run_level(url: str, users: int, duration: float, mix: dict, seed: int) -> dict:
+    """users 人が duration 秒間フローを繰り返したときの集計。"""
+    names, weights = list(mix), list(mix.values())
+    records, flows, errors = [], [], []
+    deadline = time.monotonic() + duration
+
+    async def user(uid: int):
+        rng = random.Random(seed * 1000 + uid)
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            steps = []
+
+            async def step(label, coro):
+                t0 = time.perf_counter()
+                out = await coro
+                steps.append((f"{name}.{label}", time.perf_counter() - t0))
+                return out
+
+            t0 = time.perf_counter()
+            try:
+                await FLOWS[name](step, url, rng)
+            except Exception as e:   # フローの失敗も結果として数える
+                errors.append(f"{name}: {type(e).__name__}: {e}"[:200])
+                await asyncio.sleep(0.5)
+                continue
+            records.extend(steps)
+            flows.append((name, time.perf_counter() - t0))
+
+    t_start = time.monotonic()
+    await asyncio.gather(*(user(u) for u in range(users)))
+    elapsed = time.monotonic() - t_start
+
+    lat = [d for _, d in records]
+    by_step = {}
+    for label, d in records:
+        by_step.setdefault(label, []).append(d)
+    return {
+        "users":        users,
+        "elapsed_s":    round(elapsed, 2),
+        "flows":        len(flows),
+        "errors":       len(errors),
+        "error_sample": errors[:3],
+        "flows_per_s":  round(len(flows) / elapsed, 3),
+        "steps_per_s":  round(len(records) / elapsed, 3),
+        "p50_ms":       round(_pct(lat, 0.50) * 1e3, 1),
+        "p95_ms":       round(_pct(lat, 0.95) * 1e3, 1),
+        "p99_ms":       round(_pct(lat, 0.99) * 1e3, 1),
+        "steps":        {k: {"n": len(v), "p50_ms": round(_pct(v, 0.50) * 1e3, 1),
+                             "p95_ms": round(_pct(v, 0.95) * 1e3, 1)} for k, v in sorted(by_step.items())},
+    }
+
+
+def saturation(curve: list[dict], factor: float) -> int | None:
+    """スループットが伸びなくなる、レイテンシが劣化する、または失敗が出る直前の同時ユーザー数。"""
+    if not curve:
+        return None
+    if curve[0]["errors"]:
+        return 0
+    base_p95 = curve[0]["p95_ms"] or 1.0
+    for prev, cur in zip(curve, curve[1:]):
+        if cur["flows_per_s"] < prev["flows_per_s"] * 1.10 or cur["p95_ms"] > base_p95 * factor \
+                or cur["errors"]:
+            return prev["users"]
+    return curve[-1]["users"]
+
+
+# ─────────────────────────────────────────────
+#  サーバーの起動（構成ごとに secrets.toml を作って cwd に置く）
+# ─────────────────────────────────────────────
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=5) as r:
+            return r.status
+    except OSError:
+        return 0
+
+
+def _toml(secrets: dict) -> str:
+    return "".join(f"{k} = {json.dumps(str(v), ensure_ascii=False)}\n" for k, v in secrets.items())
+
+
+def start_server(secrets: dict) -> tuple[subprocess.Popen, str, Path]:
+    work = Path(tempfile.mkdtemp(prefix="sanmei-load-"))
+    (work / ".streamlit").mkdir()
+    shutil.copy(ROOT / ".streamlit" / "config.toml", work / ".streamlit" / "config.toml")
+    secrets = {"ANALYTICS_DB": str(work / "analytics.db"),   # 利用状況イベントは一時ディレクトリへ
+               "RATE_LIMIT_STORE": "off",                     # 仮想ユーザーは全員同じ接続元なので制限しない
+               **secrets}
+    (work / ".streamlit" / "secrets.toml").write_text(_toml(secrets), encoding="utf-8")
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP, "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        cwd=work, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        if _get(url + "/_stcore/health") == 200:
+            break
+        if proc.poll() is not None:
+            raise RuntimeError("streamlit の起動に失敗しました")
+        time.sleep(0.1)
+    return proc, url, work
+
+
+async def _wait_ready(url: str, timeout: float = 120.0):
+    """最初のセッションでウォームアップを始めさせ、準備完了（static/health/ready.json）を待つ。"""
+    async with Session(url) as s:
+        await s.run()
+    t_end = time.monotonic() + timeout
+    while time.monotonic() < t_end and await asyncio.to_thread(_get, url + "/app/static/health/ready.json") != 200:
+        await asyncio.sleep(0.5)
+
+
+async def run_config(url: str | None, levels: list[int], duration: float, mix: dict, overrides: dict,
+                     stripe_host: str, stripe_latency: float) -> list[dict]:
+    stub = _stripe_stub(stripe_host, stripe_latency)
+    secrets = {"STRIPE_SECRET_KEY": "sk_test_loadtest",
+               "STRIPE_API_BASE": f"http://{stripe_host}:{stub.server_address[1]}", **overrides}
+    proc = work = None
+    if url is None:
+        proc, url, work = start_server(secrets)
+    try:
+        await _wait_ready(url)
+        curve = []
+        for i, n in enumerate(levels):
+            row = await run_level(url, n, duration, mix, seed=i)
+            row.update(_rss_mb(proc.pid if proc else None))
+            curve.append(row)
+            print(f"    同時 {n}: {row['flows_per_s']:.2f} フロー/秒, p95 {row['p95_ms']:.0f} ms,"
+                  f" 失敗 {row['errors']}", flush=True)
+        return curve
+    finally:
+        stub.shutdown()
+        if proc is not None:
+            proc.terminate()
+            proc.wait(10)
+            shutil.rmtree(work, ignore_errors=True)
+
+
+def _parse_config(text: str) -> tuple[str, dict]:
+    name, _, kv = text.partition(":")
+    return name, dict(item.split("=", 1) for item in kv.split(",") if item)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--users", default="1,2,4,8,16", help="同時ユーザー数（カンマ区切り）")
+    ap.add_argument("--duration", type=float, default=30.0, help="各段階の秒数")
+    ap.add_argument("--mix", default="personal=4,compat=3,purchase=2,callback=1", help="フローの比率")
+    ap.add_argument("--config", action="append", default=[], help="名前:キー=値,...（secrets の上書き）")
+    ap.add_argument("--url", help="起動済みのサーバー（指定時は --config の上書きは効かない）")
+    ap.add_argument("--stripe-host", default="127.0.0.1", help="サーバーから見た Stripe 代替サーバーのアドレス")
+    ap.add_argument("--stripe-latency-ms", type=float, default=250.0)
+    ap.add_argument("--saturation-factor", type=float, default=2.0)
+    ap.add_argument("--out", help="結果 JSON の保存先")
+    args = ap.parse_args()
+
+    levels = [int(x) for x in args.users.split(",")]
+    mix = {k: float(v) for k, v in (item.split("=") for item in args.mix.split(","))}
+    unknown = set(mix) - set(FLOWS)
+    if unknown:
+        ap.error(f"未知のフロー: {', '.join(sorted(unknown))}")
+
+    report = {"users": levels, "duration_s": args.duration, "mix": mix, "configs": {}}
+    for cfg in ([f"外部:"] if args.url else args.config or ["既定"]):
+        name, overrides = _parse_config(cfg)
+        print(f"■ {name} {overrides or ''}", flush=True)
+        curve = asyncio.run(run_config(args.url, levels, args.duration, mix, overrides,
+                                       args.stripe_host, args.stripe_latency_ms / 1e3))
+        sat = saturation(curve, args.saturation_factor)
+        report["configs"][name] = {"overrides": overrides, "curve": curve, "saturation_users": sat}
+        print(f"  {'同時':>4}{'フロー/秒':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'失敗':>6}{'RSS MB':>9}")
+        for r in curve:
+            print(f"  {r['users']:>4}{r['flows_per_s']:>10.2f}{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}"
+                  f"{r['p99_ms']:>9.0f}{r['errors']:>6}{r.get('rss_mb', 0):>9.0f}")
+        slow = max(curve[-1]["steps"].items(), key=lambda kv: kv[1]["p95_ms"], default=None)
+        if slow:
+            print(f"  最も遅いステップ（同時 {curve[-1]['users']}）: {slow[0]} p95 {slow[1]['p95_ms']:.0f} ms")
+        for r in curve:
+            for e in r["error_sample"]:
+                print(f"  失敗例（同時 {r['users']}）: {e}")
+        print(f"  飽和点: 同時 {sat} セッション", flush=True)
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
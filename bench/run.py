@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+ベンチマーク一式（ベースライン比較つき）
+
+エンジン（スカラー / 一括）・ヘッダー画像・PDF（キャッシュなし / キャッシュ済み）・HTML レポート・
+AppTest によるアプリ全体の再実行（ティザー / 個人 / ペイウォール / 組織相性 / 名簿）を測る。
+ケースごとに新しいプロセスで実行するため、peak RSS はそのケースだけの値になる。
+
+  ops_per_s   … 1 秒あたりの実行回数
+  min_ms / p50_ms / p99_ms … 1 回あたりの所要時間（最小値・分位点）
+  ref_ms      … 各サンプルの直後に測る参照処理（純 Python の固定ループ）の中央値
+  norm        … p50_ms / ref_ms（そのときのマシンの速さで割った値。比較はこれで行う）
+  peak_rss_mb … そのプロセスの最大常駐メモリ（準備処理を含む）
+  out_bytes   … 出力の大きさ（画像・PDF のみ）
+
+結果は bench/baseline.json の norm と比べ、ケースごとの許容幅（CASES の最後の値。計算は 30%、
+AppTest による再実行は Streamlit 側の揺れが大きいため 45%。その分サンプル数を多めに取る）を超えて
+遅くなったケースがあれば終了コード 1 を返す。共用マシンでは CPU の割り当てが数分単位で揺れ、同じコードの p50 が 50〜90%
+変わることがあるため、生の時間ではなく同じプロセスで交互に測った参照処理との比で比べる。
+それでも許容幅を超えたケースは新しいプロセスで --retries 回まで測り直し、最も速い回で判定する
+（負荷による揺れは遅くする方向にしか働かない）。ベースラインも --runs 回測って最も速い回を残す。
+ベースラインは同じマシンで取ったものとだけ比べること。
+
+    python bench/run.py                      # 全ケース
+    python bench/run.py -k pdf -k image      # 名前に pdf / image を含むケースだけ
+    python bench/run.py --out result.json    # 結果を JSON で保存
+    python bench/run.py --update-baseline    # 各ケース 3 回測り、最も速い回でベースラインを更新
+
+起動時間は bench/import_budget.py、ウォームアップの効果は bench/warmup_latency.py を参照。
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+sys.path.insert(0, str(ROOT))
+
+_BIRTH_A, _BIRTH_B = date(1988, 3, 14), date(1979, 11, 2)
+
+
+# ─────────────────────────────────────────────
+#  準備処理（子プロセス内で呼ぶ）
+# ─────────────────────────────────────────────
+def _app():
+    """app.py を bare モード（streamlit run なし）で読み込み、関数を直接呼べるようにする。"""
+    import app
+    return app
+
+
+def _births(n: int, seed: int = 0) -> list[date]:
+    rng = random.Random(seed)
+    lo, span = date(1960, 1, 1), (date(2004, 12, 31) - date(1960, 1, 1)).days
+    return [lo + timedelta(days=rng.randrange(span)) for _ in range(n)]
+
+
+def _roster(n: int):
+    """部署 8・上司あり・区分ありの合成名簿。"""
+    from sanmei.roster import parse_roster_csv
+    rng = random.Random(1)
+    depts = ["営業部", "開発部", "管理部", "人事部", "企画部", "マーケ部", "経理部", "総務部"]
+    lines = ["社員ID,氏名,生年月日,部署,上司ID,区分"]
+    for i, b in enumerate(_births(n)):
+        mgr = f"E{rng.randrange(i):06d}" if i else ""
+        lines.append(f"E{i:06d},社員{i},{b.isoformat()},{rng.choice(depts)},{mgr},"
+                     f"{rng.choice(['メンター', '新人', ''])}")
+    roster, errors = parse_roster_csv("\n".join(lines).encode("utf-8"))
+    assert roster is not None, errors
+    return roster
+
+
+def _apptest(state: dict | None = None):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=300).run()
+    for k, v in (state or {}).items():
+        at.session_state[k] = v
+    at.run()
+    assert not at.exception, at.exception
+    return lambda: at.run()
+
+
+def _pdf_args(app, kind: str):
+    from sanmei.engine import calc_gototoku
+    font = app.find_japanese_font()
+    if kind == "personal":
+        return app.generate_personal_pdf, ("計測 太郎", calc_gototoku(_BIRTH_A), font)
+    return app.generate_business_pdf, ("計測 太郎", calc_gototoku(_BIRTH_A),
+                                       "計測 花子", calc_gototoku(_BIRTH_B), font)
+
+
+# ─────────────────────────────────────────────
+#  ケース定義： 名前 → (準備処理 → 1 回分の処理, 1 サンプルの回数, サンプル数, norm の悪化の許容幅)
+# ─────────────────────────────────────────────
+def _case_calc_gototoku():
+    from sanmei.engine import calc_gototoku
+    births = _births(1000)
+    it = iter(births * 10_000)
+    return lambda: calc_gototoku(next(it))
+
+
+def _case_compute_codes():
+    import numpy as np
+    from sanmei.batch import compute_codes
+    births = np.array(_births(100_000), dtype="datetime64[D]")
+    return lambda: compute_codes(births)
+
+
+def _case_calindex():
+    from sanmei import calindex
+    calindex.count()          # 索引の構築は計測に含めない
+    pats = [{"center": "牽牛星", "head": "車騎星"}, {"day_pillar": "丁未"},
+            {"year_pillar": "庚申", "tenchu": "午未"}, {"feet": "龍高星", "right": "玉堂星", "center": "調舒星"}]
+    it = iter(pats * 10_000)
+    return lambda: calindex.ranges(date(1980, 1, 1), date(1990, 12, 31), **next(it))
+
+
+def _case_incremental():
+    from sanmei import incremental
+    roster = _roster(10_000)
+
+    def run():
+        state = incremental.new_state(False)
+        incremental.update(state, roster)
+        return state
+    return run
+
+
+def _case_header(kind: str):
+    def setup():
+        from sanmei.engine import calc_gototoku, get_tenchusatsu
+        app = _app()
+        font = app.find_japanese_font()
+        ga, gb = calc_gototoku(_BIRTH_A), calc_gototoku(_BIRTH_B)
+        ta, tb = get_tenchusatsu(ga["day_pillar"]), get_tenchusatsu(gb["day_pillar"])
+        if kind == "personal":
+            return lambda: app._header_img_personal("計測 太郎", ga, ta, font).getvalue()
+        return lambda: app._header_img_business("計測 太郎", ga, ta, "計測 花子", gb, tb, font).getvalue()
+    return setup
+
+
+def _case_pdf(kind: str, cached: bool):
+    def setup():
+        fn, args = _pdf_args(_app(), kind)
+        if cached:
+            fn(*args)
+            return lambda: fn(*args)
+
+        def cold():
+            fn.clear()
+            return fn(*args)
+        return cold
+    return setup
+
+
+def _case_html(kind: str):
+    def setup():
+        from sanmei import report_html
+        from sanmei.engine import calc_gototoku
+        ga, gb = calc_gototoku(_BIRTH_A), calc_gototoku(_BIRTH_B)
+        if kind == "personal":
+            return lambda: report_html.personal("計測 太郎", ga).encode("utf-8")
+        return lambda: report_html.business("計測 太郎", ga, "計測 花子", gb).encode("utf-8")
+    return setup
+
+
+def _case_app(view: str):
+    def setup():
+        from sanmei.engine import calc_gototoku
+        if view == "teaser":
+            return _apptest()
+        if view == "personal":
+            return _apptest({"p1_result": calc_gototoku(_BIRTH_A), "p1_name": "計測 太郎",
+                             "paid_p1": True})
+        if view == "paywall":     # 個人・組織相性とも未購入（サンプル画像とペイウォールを表示）
+            return _apptest({"p1_result": calc_gototoku(_BIRTH_A), "p1_name": "計測 太郎",
+                             "c_result_a": calc_gototoku(_BIRTH_A), "c_result_b": calc_gototoku(_BIRTH_B),
+                             "c_name_a": "計測 太郎", "c_name_b": "計測 花子"})
+        if view == "business":
+            return _apptest({"c_result_a": calc_gototoku(_BIRTH_A), "c_result_b": calc_gototoku(_BIRTH_B),
+                             "c_name_a": "計測 太郎", "c_name_b": "計測 花子", "paid_c": True})
+        from sanmei import incremental
+        from sanmei.roster import roster_hash
+        roster = _roster(10_000)
+        state = incremental.new_state(False)
+        incremental.update(state, roster)
+        return _apptest({"team_roster": roster, "team_roster_hash": roster_hash(roster),
+                         "team_state": state})
+    return setup
+
+
+GATE, GATE_APP = 0.30, 0.45
+
+CASES = {
+    "engine.calc_gototoku":         (_case_calc_gototoku,            1000, 30, GATE),
+    "batch.compute_codes_100k":     (_case_compute_codes,               1, 15, GATE),
+    "batch.incremental_update_10k": (_case_incremental,                 1,  7, GATE),
+    "calindex.ranges_1980s":        (_case_calindex,                  100, 30, GATE),
+    "image.header_personal":        (_case_header("personal"),          1, 30, GATE),
+    "image.header_business":        (_case_header("business"),          1, 30, GATE),
+    "pdf.personal_cold":            (_case_pdf("personal", False),      1, 10, GATE),
+    "pdf.personal_cached":          (_case_pdf("personal", True),     100, 10, GATE),
+    "pdf.business_cold":            (_case_pdf("business", False),      1, 10, GATE),
+    "pdf.business_cached":          (_case_pdf("business", True),     100, 10, GATE),
+    "html.personal":                (_case_html("personal"),         1000, 30, GATE),
+    "html.business":                (_case_html("business"),         1000, 30, GATE),
+    "app.rerun_teaser":             (_case_app("teaser"),               1, 40, GATE_APP),
+    "app.rerun_personal":           (_case_app("personal"),             1, 40, GATE_APP),
+    "app.rerun_paywall":            (_case_app("paywall"),              1, 40, GATE_APP),
+    "app.rerun_business":           (_case_app("business"),             1, 40, GATE_APP),
+    "app.rerun_team_10k":           (_case_app("team"),                 1, 15, GATE_APP),
+}
+
+
+def _pick(sorted_vals: list[float], p: float) -> float:
+    return sorted_vals[min(len(sorted_vals) - 1, int(p * len(sorted_vals)))]
+
+
+def _reference() -> int:
+    """マシンの速さの目安にする固定の処理（約 2 ms）。"""
+    n = 0
+    for i in range(20_000):
+        n += i * i % 7
+    return n
+
+
+def run_case(name: str) -> dict:
+    """子プロセス内で 1 ケースを測る。"""
+    import resource
+    setup, number, repeat, _ = CASES[name]
+    op = setup()
+    out = op()                                        # 1 回目は計測しない（遅延 import 等）
+    _reference()
+    samples, refs = [], []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            out = op()
+        samples.append((time.perf_counter() - t0) / number)
+        t0 = time.perf_counter()
+        _reference()
+        refs.append(time.perf_counter() - t0)
+    s = sorted(samples)
+    ref = _pick(sorted(refs), 0.50)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "ops_per_s":   round(repeat / sum(samples), 2),
+        "min_ms":      round(s[0] * 1e3, 4),
+        "p50_ms":      round(_pick(s, 0.50) * 1e3, 4),
+        "p99_ms":      round(_pick(s, 0.99) * 1e3, 4),
+        "ref_ms":      round(ref * 1e3, 4),
+        "norm":        round(_pick(s, 0.50) / ref, 6),
+        "samples":     number * repeat,
+        "peak_rss_mb": round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1),
+        "out_bytes":   len(out) if isinstance(out, (bytes, bytearray)) else None,
+    }
+
+
+def _spawn(name: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=str(ROOT), SANMEI_WARMUP="0", STREAMLIT_LOGGER_LEVEL="error")
+    p = subprocess.run([sys.executable, __file__, "--child", name], env=env, cwd=ROOT,
+                       capture_output=True, text=True)
+    if p.returncode != 0:
+        return {"error": (p.stderr.strip().splitlines() or ["?"])[-1]}
+    return json.loads(p.stdout.strip().splitlines()[-1])
+
+
+def _faster(a: dict, b: dict) -> dict:
+    if "error" in a:
+        return b
+    return a if "error" in b or a["norm"] <= b["norm"] else b
+
+
+def _ratio(r: dict, ref: dict | None) -> float | None:
+    return r["norm"] / ref["norm"] - 1 if ref and "norm" in ref and "error" not in r else None
+
+
+def _passes(r: dict, ref: dict | None, gate: float) -> bool:
+    ratio = _ratio(r, ref)
+    return "error" not in r and (ratio is None or ratio <= gate)
+
+
+def _machine() -> dict:
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count()}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("-k", action="append", default=[], help="名前にこの文字列を含むケースだけ実行")
+    ap.add_argument("--threshold", type=float, help="全ケースの許容幅をこの比率にする（既定はケースごと）")
+    ap.add_argument("--retries", type=int, default=2, help="許容幅を超えたケースを測り直す回数")
+    ap.add_argument("--runs", type=int, default=3, help="--update-baseline で各ケースを測る回数")
+    ap.add_argument("--out", help="結果 JSON の保存先")
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case(args.child)))
+        sys.exit(0)
+
+    names = [n for n in CASES if not args.k or any(k in n for k in args.k)]
+    base = json.loads(BASELINE.read_text(encoding="utf-8")) if BASELINE.exists() else {}
+    if base and base.get("machine") != _machine():
+        print(f"注意: ベースラインは別の環境で取得されています（{base.get('machine')}）")
+    results, regressions = {}, []
+    print(f"{'ケース':<30}{'ops/s':>12}{'p50 ms':>11}{'p99 ms':>11}{'RSS MB':>9}{'出力 B':>10}  対ベースライン（norm）")
+    for name in names:
+        ref = base.get("results", {}).get(name)
+        gate = CASES[name][3] if args.threshold is None else args.threshold
+        attempts = args.runs if args.update_baseline else 1 + args.retries
+        r, tries = _spawn(name), 1
+        while tries < attempts and (args.update_baseline or not _passes(r, ref, gate)):
+            r, tries = _faster(r, _spawn(name)), tries + 1
+        results[name] = r
+        if "error" in r:
+            print(f"{name:<30}  エラー: {r['error']}")
+            regressions.append(name)
+            continue
+        ratio = _ratio(r, ref)
+        diff = "" if ratio is None else f"{ratio:+.0%}"
+        if not _passes(r, ref, gate):
+            diff += "  NG"
+            regressions.append(name)
+        if tries > 1 and not args.update_baseline:
+            diff += f"（{tries} 回中最速）"
+        print(f"{name:<30}{r['ops_per_s']:>12,.1f}{r['p50_ms']:>11.3f}{r['p99_ms']:>11.3f}"
+              f"{r['peak_rss_mb']:>9.0f}{r['out_bytes'] or '':>10}  {diff}")
+
+    report = {"machine": _machine(), "at": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+    if args.update_baseline:
+        merged = {**base.get("results", {}), **results}
+        BASELINE.write_text(json.dumps({**report, "results": merged}, ensure_ascii=False, indent=1) + "\n",
+                            encoding="utf-8")
+        print(f"ベースラインを更新しました: {BASELINE}")
+    elif regressions:
+        print(f"NG: {len(regressions)} ケースが悪化 / 失敗: {', '.join(regressions)}")
+        sys.exit(1)
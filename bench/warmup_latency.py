@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+初回レポートの所要時間（コールド / ウォーム）ベンチマーク
+
+新しいプロセスでアプリを 1 回実行したあと、購入済み状態で個人分析レポート（PDF）を
+初めて描画する再実行の所要時間を測る。
+  cold … ウォームアップ無効（SANMEI_WARMUP=0）
+  warm … ウォームアップの完了を待ってから描画
+
+    python bench/warmup_latency.py [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_CHILD = r"""
+import json, sys, time
+from datetime import date
+from streamlit.testing.v1 import AppTest
+from sanmei import warmup
+from sanmei.engine import calc_gototoku
+at = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+if sys.argv[2] == "warm":
+    warmup.wait(120)
+at.session_state["p1_result"] = calc_gototoku(date(1988, 3, 14))
+at.session_state["p1_name"] = "計測"
+at.session_state["paid_p1"] = True
+t0 = time.perf_counter()
+at.run()
+print(json.dumps({"first_report_s": time.perf_counter() - t0, "warmup": warmup.status()}))
+"""
+
+
+def measure(mode: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=str(ROOT), SANMEI_WARMUP="0" if mode == "cold" else "1")
+    out = subprocess.run([sys.executable, "-c", _CHILD, str(ROOT / "app.py"), mode],
+                         env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    for mode in ("cold", "warm"):
+        runs = [measure(mode) for _ in range(args.repeat)]
+        times = [r["first_report_s"] for r in runs]
+        print(f"{mode}: 中央値 {statistics.median(times) * 1e3:.0f} ms "
+              f"（{', '.join(f'{t * 1e3:.0f}' for t in times)} ms）")
+        if mode == "warm":
+            print("  ウォームアップ内訳:", runs[-1]["warmup"]["tasks"])
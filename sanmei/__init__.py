@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+算命学 組織診断エンジン（app.py から利用する計算・データ層）
+"""
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+レポート描画のアドミッション制御（同時実行数の上限・セッション間の公平な順番待ち）
+
+PDF 描画（fpdf2 + PIL）は CPU を占有するため、プロセス全体で同時に描画できる数を
+concurrency に制限し、それ以上の要求は順番待ちにする。
+
+  公平性   … 待ち行列はセッションごとに分け、空きが出るたびにセッションを巡回して 1 件ずつ通す
+             （一括作成で 500 件並べたセッションがいても、他のセッションの 1 件は次の巡回で通る）
+  過負荷   … 待ち件数が max_waiting に達していれば即座に QueueFull。待ち時間が timeout を
+             超えた場合も QueueFull（行列から外す）
+  メトリクス … metrics() で待ち件数・描画中の件数・通過 / 拒否件数・待ち時間の分位点を返す
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class QueueFull(RuntimeError):
+    """混雑のため描画を受け付けられない（待ち行列が満杯 / 待ち時間の上限超過）。"""
+
+
+class _Ticket:
+    __slots__ = ("session", "enqueued", "admitted")
+
+    def __init__(self, session: str):
+        self.session = session
+        self.enqueued = time.monotonic()
+        self.admitted = False
+
+
+class RenderQueue:
+    def __init__(self, concurrency: int, max_waiting: int = 32, timeout: float = 120.0):
+        self.concurrency = max(1, int(concurrency))
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._cv = threading.Condition()
+        self._running = 0
+        self._waiting: dict[str, deque] = {}   # セッション → そのセッションの待ち行列
+        self._rotation: deque = deque()         # 次に通すセッションの巡回順
+        self._waits = deque(maxlen=1000)        # 直近の待ち時間（秒）
+        self._counts = {"admitted": 0, "rejected": 0, "timed_out": 0}
+
+    # ── 内部（self._cv を保持した状態で呼ぶ）──
+    def _n_waiting(self) -> int:
+        return sum(len(q) for q in self._waiting.values())
+
+    def _dispatch(self):
+        while self._running < self.concurrency and self._rotation:
+            s = self._rotation.popleft()
+            q = self._waiting[s]
+            t = q.popleft()
+            t.admitted = True
+            self._running += 1
+            self._counts["admitted"] += 1
+            self._waits.append(time.monotonic() - t.enqueued)
+            if q:
+                self._rotation.append(s)
+            else:
+                del self._waiting[s]
+        self._cv.notify_all()
+
+    def _position(self, t: _Ticket) -> int:
+        """巡回順に通した場合に何番目に描画が始まるか（1 始まり）。"""
+        q = self._waiting.get(t.session)
+        if not q or t not in q:
+            return 0
+        j = q.index(t)
+        mine = self._rotation.index(t.session)
+        ahead = j
+        for r, s in enumerate(self._rotation):
+            if s != t.session:
+                ahead += min(len(self._waiting[s]), j + (1 if r < mine else 0))
+        return ahead + 1
+
+    def _withdraw(self, t: _Ticket):
+        q = self._waiting.get(t.session)
+        if q and t in q:
+            q.remove(t)
+            if not q:
+                del self._waiting[t.session]
+                self._rotation.remove(t.session)
+
+    # ── 公開 API ──
+    @contextmanager
+    def slot(self, session: str, on_wait=None):
+        """描画枠を 1 つ確保するコンテキスト。順番待ちの間は約 0.5 秒ごとに on_wait(順番) を呼ぶ。"""
+        with self._cv:
+            if self._n_waiting() >= self.max_waiting:
+                self._counts["rejected"] += 1
+                raise QueueFull("ただいまレポート作成が混み合っています。しばらくしてから再度お試しください。")
+            t = _Ticket(session)
+            if session not in self._waiting:
+                self._waiting[session] = deque()
+                self._rotation.append(session)
+            self._waiting[session].append(t)
+            self._dispatch()
+            deadline = t.enqueued + self.timeout
+            try:
+                while not t.admitted:
+                    if time.monotonic() > deadline:
+                        self._withdraw(t)
+                        self._counts["timed_out"] += 1
+                        raise QueueFull("順番待ちの上限時間を超えました。しばらくしてから再度お試しください。")
+                    if on_wait is not None:
+                        pos = self._position(t)
+                        self._cv.release()
+                        try:
+                            on_wait(pos)
+                        finally:
+                            self._cv.acquire()
+                        if t.admitted:
+                            break
+                    self._cv.wait(0.5)
+            except BaseException:
+                # on_wait からの例外（Streamlit の再実行 / 停止を含む）でも枠を失わない
+                if t.admitted:          # 通過済みなら確保した枠を返す
+                    self._running -= 1
+                    self._dispatch()
+                else:
+                    self._withdraw(t)
+                raise
+        try:
+            yield
+        finally:
+            with self._cv:
+                self._running -= 1
+                self._dispatch()
+
+    def position(self, session: str) -> int:
+        """セッションの先頭の要求の順番（待っていなければ 0）。"""
+        with self._cv:
+            q = self._waiting.get(session)
+            return self._position(q[0]) if q else 0
+
+    def metrics(self) -> dict:
+        with self._cv:
+            waits = sorted(self._waits)
+            pick = lambda p: waits[min(len(waits) - 1, int(p * len(waits)))] if waits else 0.0
+            return {
+                "concurrency":    self.concurrency,
+                "running":        self._running,
+                "waiting":        self._n_waiting(),
+                "sessions":       len(self._waiting),
+                **self._counts,
+                "wait_p50_s":     pick(0.50),
+                "wait_p95_s":     pick(0.95),
+                "wait_max_s":     waits[-1] if waits else 0.0,
+            }
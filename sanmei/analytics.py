@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+利用状況イベントの記録（診断 → ペイウォール → Checkout → 決済 → ダウンロード）
+
+paid は Stripe で支払いを確かめた決済、paid_demo は Stripe 未設定時のデモ購入（売上に数えない）。
+
+スクリプトからは emit() でメモリ上のキューに積むだけ（I/O なし）にして再実行を遅らせない。
+別スレッドの書き込み係がキューを BATCH 件ずつまとめて SQLite に INSERT する。
+
+  Sink(path)               … 書き込み係（プロセスに 1 つ。st.cache_resource で保持する）
+  sink.emit(event, product, session)
+  sink.flush(timeout)      … それまでに積んだ分が書き込まれるまで待つ
+  sink.close(timeout)      … 残りを書き出して止める（プロセス終了時に atexit からも呼ぶ）
+  sink.stats()             … queued / written / dropped / errors / batches
+  daily(path, since)       … 日付 × イベント × 商品の件数
+  totals(path, since)      … 商品 → {イベント: 件数}（ファネル）
+
+テーブル
+  events … 生のイベント（日時・日付・種類・商品・セッション ID の先頭 8 桁）。RETENTION_DAYS 日で削除
+  daily  … (日付, 種類, 商品) → 件数。events への INSERT と同じトランザクションで加算するため、
+           日別の集計は生イベントを走査せずこの表を読むだけで済む（events を削除しても残る）
+
+キューは MAX_QUEUE 件まで。書き込みが追いつかずに溢れた分は捨てて dropped に数える（画面は待たせない）。
+接続は書き込み係のスレッドが 1 本だけ持ち続ける（集計の読み出しは操作ごとに開閉する）。
+"""
+
+import atexit
+import queue
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import closing
+from datetime import date, datetime, timedelta
+
+EVENTS   = ("diagnosis", "paywall", "checkout", "paid", "paid_demo", "download")
+PRODUCTS = ("p1", "c")
+
+MAX_QUEUE      = 10_000
+BATCH          = 500
+INTERVAL       = 1.0        # 秒。キューが空のとき停止要求を確認する間隔
+RETENTION_DAYS = 90
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id      INTEGER PRIMARY KEY,
+    at      TEXT NOT NULL,
+    day     TEXT NOT NULL,
+    event   TEXT NOT NULL,
+    product TEXT NOT NULL,
+    session TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_events_day ON events(day);
+CREATE TABLE IF NOT EXISTS daily (
+    day     TEXT    NOT NULL,
+    event   TEXT    NOT NULL,
+    product TEXT    NOT NULL,
+    n       INTEGER NOT NULL,
+    PRIMARY KEY (day, event, product)
+) WITHOUT ROWID;
+"""
+
+_STOP = object()
+
+
+def _open(path) -> sqlite3.Connection:
+    con = sqlite3.connect(str(path), timeout=10.0, check_same_thread=False)
+    con.execute("PRAGMA journal_mode = WAL")
+    con.execute("PRAGMA synchronous = NORMAL")
+    con.executescript(_SCHEMA)
+    return con
+
+
+class Sink:
+    def __init__(self, path, max_queue: int = MAX_QUEUE, retention_days: int = RETENTION_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        self._q: queue.Queue = queue.Queue(max_queue)
+        self._stats = {"written": 0, "dropped": 0, "errors": 0, "batches": 0}
+        self._lock = threading.Lock()   # dropped はスクリプト側の複数スレッドから数える
+        self._pruned_day = ""
+        self._con = _open(path)         # スキーマの作成はここで済ませる（パスの誤りは起動時に出す）
+        self._thread = threading.Thread(target=self._run, name="sanmei-analytics", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ─── スクリプト側 ───
+    def emit(self, event: str, product: str, session: str = ""):
+        if event not in EVENTS or product not in PRODUCTS:
+            raise ValueError(f"未知のイベントです: {event} / {product}")
+        now = datetime.now().isoformat(timespec="seconds")
+        try:
+            self._q.put_nowait((now, now[:10], event, product, session[:8]))
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        done = threading.Event()
+        try:
+            self._q.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        if not self._thread.is_alive():
+            return
+        try:
+            self._q.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {"queued": self._q.qsize(), **self._stats}
+
+    # ─── 書き込み係 ───
+    def _run(self):
+        stop = False                    # 一度受け取った停止要求は、残りを書き終えるまで覚えておく
+        with closing(self._con):
+            while True:
+                try:
+                    item = self._q.get(timeout=INTERVAL)
+                except queue.Empty:
+                    if stop:
+                        return
+                    continue
+                rows, marks = [], []
+                while True:
+                    if item is _STOP:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        marks.append(item)
+                    else:
+                        rows.append(item)
+                    if len(rows) >= BATCH:
+                        break
+                    try:
+                        item = self._q.get_nowait()
+                    except queue.Empty:
+                        break
+                if rows:
+                    self._write(rows)
+                for m in marks:
+                    m.set()
+                if stop and self._q.empty():
+                    return
+
+    def _write(self, rows: list):
+        agg = Counter((r[1], r[2], r[3]) for r in rows)
+        try:
+            with self._con:
+                self._con.executemany(
+                    "INSERT INTO events (at, day, event, product, session) VALUES (?, ?, ?, ?, ?)", rows)
+                self._con.executemany(
+                    "INSERT INTO daily (day, event, product, n) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(day, event, product) DO UPDATE SET n = n + excluded.n",
+                    [(*k, n) for k, n in agg.items()])
+                today = rows[-1][1]
+                if today != self._pruned_day:   # 生イベントの削除は 1 日 1 回
+                    cutoff = (date.fromisoformat(today) - timedelta(days=self.retention_days)).isoformat()
+                    self._con.execute("DELETE FROM events WHERE day < ?", (cutoff,))
+                    self._pruned_day = today
+        except sqlite3.Error:
+            with self._lock:
+                self._stats["errors"] += 1
+                self._stats["dropped"] += len(rows)
+            return
+        self._stats["written"] += len(rows)
+        self._stats["batches"] += 1
+
+
+# ─────────────────────────────────────────────
+#  集計（daily 表を読むだけ）
+# ─────────────────────────────────────────────
+def daily(path, since: date | None = None) -> list[dict]:
+    with closing(_open(path)) as con:
+        rows = con.execute("SELECT day, event, product, n FROM daily WHERE day >= ? ORDER BY day, product, event",
+                           ((since or date.min).isoformat(),)).fetchall()
+    return [{"day": d, "event": e, "product": p, "n": n} for d, e, p, n in rows]
+
+
+def totals(path, since: date | None = None) -> dict:
+    out = {p: dict.fromkeys(EVENTS, 0) for p in PRODUCTS}
+    for r in daily(path, since):
+        out[r["product"]][r["event"]] += r["n"]
+    return out
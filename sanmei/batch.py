@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+ベクトル化エンジン（名簿単位の一括計算）
+
+calc_gototoku を 1 人ずつ呼ぶ代わりに、カレンダー表（caltable）から
+全員分のレコードを一括で引き、フィールドごとの整数コード配列を返す。
+"""
+
+import numpy as np
+
+from sanmei import caltable
+from sanmei.engine import BRANCHES, STAR_NAMES, STEMS
+
+POSITIONS = ("head", "left", "center", "right", "feet")
+
+# 中心星の五行関係（A から見た B, _power_balance の分岐と同じ 5 分類）。(eb - ea) % 5 で決まる。
+RELATIONS = ["同質", "A→B 相生", "B→A 相生", "A が B を相克", "B が A を相克"]
+_REL_OF_DIFF = [0, 1, 3, 4, 2]   # (eb-ea)%5 → RELATIONS の添字
+
+
+def compute_codes(birth) -> dict:
+    """生年月日配列 → {フィールド名: uint8 配列}（caltable.FIELDS の各列）。"""
+    table = caltable.as_array()
+    recs = table[caltable.offsets(birth)]
+    return {name: recs[name] for name in caltable.FIELDS}
+
+
+def gototoku_from_codes(codes: dict, i: int) -> dict:
+    """整数コードの i 行目を calc_gototoku と同じ形式の辞書に戻す（PDF 等の既存処理向け）。"""
+    r = {name: int(codes[name][i]) for name in caltable.FIELDS}
+    g = {pos: STAR_NAMES[r[pos]] for pos in POSITIONS}
+    g.update({
+        "day_pillar":   STEMS[r["ds"]] + BRANCHES[r["db"]],
+        "year_pillar":  STEMS[r["ys"]] + BRANCHES[r["yb"]],
+        "month_pillar": STEMS[r["ms"]] + BRANCHES[r["mb"]],
+        "ds": r["ds"], "db": r["db"],
+    })
+    return g
+
+
+def relation_codes(ea, eb):
+    """中心星の五行コード配列 → RELATIONS の添字（ブロードキャスト可）。"""
+    diff = np.asarray(eb, dtype=np.intp) - np.asarray(ea, dtype=np.intp)   # uint8 の桁あふれ防止
+    return np.asarray(_REL_OF_DIFF, dtype=np.int8)[diff % 5]
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+レポートの一括作成（ZIP をディスクへ逐次書き出し）と、大きな生成ファイルの配布
+
+PDF を 1 件描画するたびに ZIP へ追記し、メモリ上には常に 1 件分の PDF しか持たない。
+完成した ZIP や BI 向けエクスポート（write_file）は Streamlit の静的ファイル配信
+（.streamlit/config.toml の enableStaticServing）の配下 static/bulk/ に置き、
+/app/static/bulk/<ファイル名> のリンクで配布する。
+ファイル名は推測できないランダムなトークンにし、一定時間後に削除する。
+削除は clean_periodically() のスレッドが CLEAN_EVERY_S 秒ごとに行う（次の作成を待たない）。
+"""
+
+import os
+import re
+import secrets
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+BULK_DIR = Path(__file__).resolve().parent.parent / "static" / "bulk"
+URL_PREFIX = "app/static/bulk"
+
+MAX_AGE_S = 3600       # 作成から 1 時間で削除
+CLEAN_EVERY_S = 300    # 期限切れを探す間隔
+
+_UNSAFE = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+def safe_name(s: str) -> str:
+    """ZIP 内のファイル名に使えない文字を置き換える。"""
+    return _UNSAFE.sub("_", s).strip("_") or "_"
+
+
+def cleanup(max_age: float = MAX_AGE_S, directory: Path = BULK_DIR) -> int:
+    """期限切れの配布ファイル（と書きかけの一時ファイル）を削除し、削除件数を返す。"""
+    if not directory.exists():
+        return 0
+    now, n = time.time(), 0
+    for p in directory.iterdir():
+        try:
+            if p.suffix in (".zip", ".parquet", ".arrow", ".part") and now - p.stat().st_mtime > max_age:
+                p.unlink(missing_ok=True)
+                n += 1
+        except FileNotFoundError:      # 別のスレッド / プロセスが先に消した
+            pass
+    return n
+
+
+def clean_periodically(interval: float = CLEAN_EVERY_S, directory: Path = BULK_DIR) -> threading.Thread:
+    """interval 秒ごとに cleanup() を呼ぶ daemon スレッドを起動する（起動直後にも 1 回）。"""
+    def loop():
+        while True:
+            try:
+                cleanup(directory=directory)
+            except OSError:
+                pass
+            time.sleep(interval)
+
+    t = threading.Thread(target=loop, name="sanmei-bulk-cleanup", daemon=True)
+    t.start()
+    return t
+
+
+def write_zip(items, render, on_progress=None, directory: Path = BULK_DIR) -> Path:
+    """items の各要素 (ZIP 内のファイル名, render の引数) を順に描画して ZIP に追記する。
+
+    render(arg) -> bytes は 1 件ずつ呼ばれ、書き込み後すぐに参照を手放す。
+    on_progress(完了件数, ファイル名) が指定されれば 1 件ごとに呼ぶ。
+    書き込み中は .part に出力し、完成後に .zip へ置き換えるため、配布 URL に半端なファイルは出ない。
+    """
+    def fill(f):
+        # PDF は内部で圧縮済みなので ZIP 側は無圧縮（ZIP_STORED）
+        with zipfile.ZipFile(f, "w", compression=zipfile.ZIP_STORED) as zf:
+            for done, (arcname, arg) in enumerate(items, start=1):
+                zf.writestr(arcname, render(arg))
+                if on_progress is not None:
+                    on_progress(done, arcname)
+
+    return write_file(fill, ".zip", directory)[0]
+
+
+def write_file(write, suffix: str, directory: Path = BULK_DIR) -> tuple[Path, object]:
+    """write(ファイルオブジェクト) で書き出したものを配布用に置き、(パス, write の戻り値) を返す。
+    suffix は cleanup() が消す拡張子のどれか。write_zip と同じく .part に書いてから置き換える。
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    cleanup(directory=directory)
+    final = directory / f"{secrets.token_urlsafe(16)}{suffix}"
+    part = final.with_suffix(".part")
+    try:
+        with open(part, "wb") as f:
+            result = write(f)
+        os.replace(part, final)
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+    return final, result
+
+
+def url_for(path: Path) -> str:
+    return f"{URL_PREFIX}/{path.name}"
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+カレンダー表の逆引き索引（五徳・柱・天中殺の条件 → 該当する生年月日）
+
+「中心が牽牛星で頭が車騎星の生年月日」「1980〜1990 年で日柱が丁未の日」のような問い合わせに、
+calc_gototoku を 1 日ずつ回さずに答える。カレンダー表（sanmei/caltable.py）の列から、
+キーごとに「値 → その値を持つ日のレコード番号（昇順）」の転置リストを初回に 1 回だけ作る。
+
+  find(start, end, **条件)    … 該当日（datetime64[D] の配列、昇順）
+  ranges(start, end, **条件)  … 連続する該当日をまとめた [(最初の日, 最後の日), ...]
+  count(start, end, **条件)   … 該当日数
+
+条件のキー（KEYS）と値:
+  head / left / center / right / feet      … 星名（"牽牛星"）
+  day_pillar / month_pillar / year_pillar  … 干支（"丁未"）
+  tenchu                                   … 天中殺グループ（"午未"）
+値にリスト・タプル・集合を渡すと「そのどれか」、キー同士は「かつ」。start / end（date、両端を含む）を
+省略するとカレンダー表の全範囲。未知のキーや値は ValueError。
+
+最も該当の少ない条件の転置リストを期間で切り出して候補とし、残りの条件は候補の日の列の値を
+直接見て絞り込む（全日を走査しない）。索引の大きさはキーごとに 4 バイト × 日数（全体で約 2.6MB）。
+
+    python -m sanmei.calindex center=牽牛星 head=車騎星 --from 1980-01-01 --to 1990-12-31
+"""
+
+import threading
+from datetime import date
+
+import numpy as np
+
+from sanmei import caltable
+from sanmei.engine import _KANSHI_BASE, _TENCHU_GROUPS, STAR_NAMES
+
+POSITIONS = ("head", "left", "center", "right", "feet")
+PILLARS   = ("day_pillar", "month_pillar", "year_pillar")
+KEYS      = POSITIONS + PILLARS + ("tenchu",)
+
+_VOCAB = {**{k: STAR_NAMES for k in POSITIONS}, **{k: _KANSHI_BASE for k in PILLARS},
+          "tenchu": _TENCHU_GROUPS}
+
+_lock = threading.Lock()
+_index: dict | None = None
+
+
+def _kanshi(stems, branches):
+    return (6 * stems.astype(np.int16) - 5 * branches.astype(np.int16)) % 60   # engine.kanshi_idx と同じ
+
+
+def _build() -> dict:
+    """キー → (各日の値の列, 値ごとの日の並び, 値ごとの区切り)。"""
+    table = caltable.as_array()
+    columns = {k: table[k] for k in POSITIONS}
+    columns["day_pillar"]   = table["kanshi"]
+    columns["month_pillar"] = _kanshi(table["ms"], table["mb"]).astype(np.uint8)
+    columns["year_pillar"]  = _kanshi(table["ys"], table["yb"]).astype(np.uint8)
+    columns["tenchu"]       = table["tenchu"]
+    index = {}
+    for key, col in columns.items():
+        order = np.argsort(col, kind="stable").astype(np.int32)    # 同じ値の中では日付順のまま
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(col, minlength=len(_VOCAB[key])))))
+        index[key] = (col, order, bounds)
+    return index
+
+
+def _get() -> dict:
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = _build()
+    return _index
+
+
+def _codes(key: str, value) -> list[int]:
+    if key not in _VOCAB:
+        raise ValueError(f"未知の条件です: {key}（使えるのは {', '.join(KEYS)}）")
+    values = [value] if isinstance(value, str) else list(value)
+    vocab = _VOCAB[key]
+    bad = [v for v in values if v not in vocab]
+    if bad or not values:
+        raise ValueError(f"{key} の値が不正です: {', '.join(map(str, bad)) or '（空）'}")
+    return sorted({vocab.index(v) for v in values})
+
+
+def _offsets(start: date | None, end: date | None, pattern: dict) -> np.ndarray:
+    index = _get()
+    first, last = caltable.date_range()
+    lo = caltable.day_offset(max(start or first, first))
+    hi = caltable.day_offset(min(end or last, last)) + 1
+    if lo >= hi:
+        return np.empty(0, np.int32)
+    wanted = {k: _codes(k, v) for k, v in pattern.items()}
+    if not wanted:
+        return np.arange(lo, hi, dtype=np.int32)
+
+    def postings(key):
+        _, order, bounds = index[key]
+        out = []
+        for c in wanted[key]:
+            run = order[bounds[c]:bounds[c + 1]]
+            out.append(run[np.searchsorted(run, lo):np.searchsorted(run, hi)])
+        return out
+
+    lists = {k: postings(k) for k in wanted}
+    seed = min(lists, key=lambda k: sum(len(p) for p in lists[k]))
+    cand = lists[seed][0] if len(lists[seed]) == 1 else np.sort(np.concatenate(lists[seed]))
+    for key, codes in wanted.items():
+        if key == seed or not len(cand):
+            continue
+        vals = index[key][0][cand]
+        cand = cand[vals == codes[0] if len(codes) == 1 else np.isin(vals, codes)]
+    return cand
+
+
+def find(start: date | None = None, end: date | None = None, **pattern) -> np.ndarray:
+    first, _ = caltable.date_range()
+    return np.datetime64(first, "D") + _offsets(start, end, pattern)
+
+
+def count(start: date | None = None, end: date | None = None, **pattern) -> int:
+    return len(_offsets(start, end, pattern))
+
+
+def ranges(start: date | None = None, end: date | None = None, **pattern) -> list[tuple[date, date]]:
+    off = _offsets(start, end, pattern)
+    if not len(off):
+        return []
+    breaks = np.flatnonzero(np.diff(off) != 1)
+    starts = np.concatenate(([off[0]], off[breaks + 1]))
+    ends = np.concatenate((off[breaks], [off[-1]]))
+    base = caltable.date_range()[0].toordinal()
+    return [(date.fromordinal(base + int(s)), date.fromordinal(base + int(e))) for s, e in zip(starts, ends)]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    ap = argparse.ArgumentParser(description="五徳・柱・天中殺の条件に合う生年月日を列挙する")
+    ap.add_argument("pattern", nargs="+", help="キー=値（値はカンマ区切りで「どれか」）例: center=牽牛星 head=車騎星")
+    ap.add_argument("--from", dest="start", type=date.fromisoformat)
+    ap.add_argument("--to", dest="end", type=date.fromisoformat)
+    ap.add_argument("--limit", type=int, default=50, help="表示する期間の数（0 で全部）")
+    args = ap.parse_args()
+
+    pattern = {}
+    for item in args.pattern:
+        key, _, value = item.partition("=")
+        pattern[key] = value.split(",")
+    _get()
+    t0 = time.perf_counter()
+    found = ranges(args.start, args.end, **pattern)
+    ms = (time.perf_counter() - t0) * 1000
+    for s, e in found[:args.limit or None]:
+        print(s if s == e else f"{s} 〜 {e}")
+    n_days = sum((e - s).days + 1 for s, e in found)
+    print(f"{n_days} 日（{len(found)} 期間）・{ms:.2f} ms")
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+日単位カレンダー表（固定レイアウトのバイナリ / mmap 共有）
+
+1900-01-01〜2100-12-31 の全日について、柱・五徳の星コード・天中殺グループ・
+節入りフラグを 1 日 16 バイトで格納した sanmei/data/calendar.bin を読み出す。
+ファイルは読み取り専用 mmap で開くため、同一ホスト上の全ワーカープロセスが
+OS のページキャッシュ上の同じ物理ページを共有し、起動時の構築コストはゼロ。
+
+再生成（エンジンの計算ロジックを変更したとき）:
+    python -m sanmei.caltable            # 生成
+    python -m sanmei.caltable --verify   # calc_gototoku と全日照合
+"""
+
+import mmap
+import struct
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+
+from sanmei.engine import (
+    BRANCHES, STAR_NAMES, STEMS, _HIDDEN, _jdn, calc_gototoku, calc_star_code,
+    day_branch_idx, day_stem_idx, kanshi_idx, month_branch_idx, month_stem_idx,
+    year_branch_idx, year_stem_idx,
+)
+
+# ─────────────────────────────────────────────
+#  ファイルレイアウト（リトルエンディアン）
+#
+#  ヘッダー 32 バイト:
+#    magic(8s) version(H) record_size(H) first_jdn(i) n_days(I) 予約(12x)
+#  レコード 16 バイト × n_days（first_jdn から 1 日ずつ連続）:
+#    ys yb ms mb ds db                 … 年干 年支 月干 月支 日干 日支
+#    head left center right feet       … 五徳の星コード（STAR_NAMES の添字）
+#    kanshi tenchu term                … 日柱の干支番号 / 天中殺グループ / 節入りフラグ
+#    予約 2 バイト
+# ─────────────────────────────────────────────
+TABLE_PATH = Path(__file__).parent / "data" / "calendar.bin"
+
+FIRST_DATE = date(1900, 1, 1)
+LAST_DATE  = date(2100, 12, 31)
+
+_MAGIC       = b"SNMCAL\x00\x00"
+_VERSION     = 1
+_HEADER      = struct.Struct("<8sHHiI12x")
+_RECORD      = struct.Struct("<16B")
+_RECORD_SIZE = _RECORD.size
+
+FIELDS = ("ys", "yb", "ms", "mb", "ds", "db",
+          "head", "left", "center", "right", "feet",
+          "kanshi", "tenchu", "term")
+_F = {name: i for i, name in enumerate(FIELDS)}
+
+# term フラグ
+TERM_MONTH = 1   # 節入り日（この日から月支が変わる）
+TERM_YEAR  = 2   # 立春（この日から年柱が変わる）
+
+_JDN_ORDINAL_OFFSET = 1721425   # date.toordinal() + この値 = ユリウス通日
+
+
+# ─────────────────────────────────────────────
+#  生成
+# ─────────────────────────────────────────────
+def _day_record(d: date, prev: tuple | None) -> tuple:
+    ds, db = day_stem_idx(d), day_branch_idx(d)
+    ys, yb = year_stem_idx(d), year_branch_idx(d)
+    ms, mb = month_stem_idx(d), month_branch_idx(d)
+    k = kanshi_idx(ds, db)
+    term = 0
+    if prev is not None:
+        if prev[_F["mb"]] != mb:
+            term |= TERM_MONTH
+        if (prev[_F["ys"]], prev[_F["yb"]]) != (ys, yb):
+            term |= TERM_YEAR
+    return (
+        ys, yb, ms, mb, ds, db,
+        calc_star_code(ys,          ds),
+        calc_star_code(_HIDDEN[mb], ds),
+        calc_star_code(_HIDDEN[db], ds),
+        calc_star_code(_HIDDEN[yb], ds),
+        calc_star_code(ms,          ds),
+        k, k // 10, term,
+    )
+
+
+def build(path: Path = TABLE_PATH, first: date = FIRST_DATE, last: date = LAST_DATE) -> Path:
+    """calc_gototoku と同じ計算で全日のレコードを生成し、path に書き出す。"""
+    n_days = (last - first).days + 1
+    buf = bytearray(_HEADER.size + n_days * _RECORD_SIZE)
+    _HEADER.pack_into(buf, 0, _MAGIC, _VERSION, _RECORD_SIZE, _jdn(first), n_days)
+    prev = None
+    d = first
+    for i in range(n_days):
+        rec = _day_record(d, prev)
+        _RECORD.pack_into(buf, _HEADER.size + i * _RECORD_SIZE, *rec, 0, 0)
+        prev = rec
+        d += timedelta(days=1)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(buf)
+    tmp.replace(path)   # 読み出し中のプロセスがあっても中途半端なファイルを見せない
+    return path
+
+
+# ─────────────────────────────────────────────
+#  読み出し（プロセス内で 1 回だけ mmap）
+# ─────────────────────────────────────────────
+_lock = threading.Lock()
+_mm: mmap.mmap | None = None
+_first_jdn = 0
+_n_days = 0
+_array = None
+
+
+def _table() -> mmap.mmap:
+    global _mm, _first_jdn, _n_days
+    if _mm is not None:
+        return _mm
+    with _lock:
+        if _mm is None:
+            if not TABLE_PATH.exists():
+                raise FileNotFoundError(
+                    f"カレンダー表が見つかりません: {TABLE_PATH}"
+                    "（python -m sanmei.caltable で生成してください）"
+                )
+            with open(TABLE_PATH, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, rsize, first_jdn, n_days = _HEADER.unpack_from(mm, 0)
+            if magic != _MAGIC or version != _VERSION or rsize != _RECORD_SIZE:
+                mm.close()
+                raise ValueError(f"カレンダー表の形式が不正です: {TABLE_PATH}")
+            if len(mm) < _HEADER.size + n_days * _RECORD_SIZE:
+                mm.close()
+                raise ValueError(f"カレンダー表が途中で切れています: {TABLE_PATH}")
+            _first_jdn, _n_days = first_jdn, n_days
+            _mm = mm
+    return _mm
+
+
+def date_range() -> tuple[date, date]:
+    """カレンダー表がカバーする (最初の日, 最後の日)。"""
+    _table()
+    first = date.fromordinal(_first_jdn - _JDN_ORDINAL_OFFSET)
+    return first, first + timedelta(days=_n_days - 1)
+
+
+def day_offset(d: date) -> int:
+    """d のレコード番号。範囲外は ValueError。"""
+    _table()
+    off = _jdn(d) - _first_jdn
+    if not 0 <= off < _n_days:
+        first, last = date_range()
+        raise ValueError(f"{d} はカレンダー表の範囲外です（{first}〜{last}）")
+    return off
+
+
+def record(d: date) -> dict:
+    """d のレコードを {フィールド名: 整数} で返す。"""
+    mm = _table()
+    vals = _RECORD.unpack_from(mm, _HEADER.size + day_offset(d) * _RECORD_SIZE)
+    return dict(zip(FIELDS, vals))
+
+
+def lookup(d: date) -> dict:
+    """calc_gototoku と同じ形式の辞書をカレンダー表から組み立てる。"""
+    r = record(d)
+    return {
+        "head":         STAR_NAMES[r["head"]],
+        "left":         STAR_NAMES[r["left"]],
+        "center":       STAR_NAMES[r["center"]],
+        "right":        STAR_NAMES[r["right"]],
+        "feet":         STAR_NAMES[r["feet"]],
+        "day_pillar":   STEMS[r["ds"]] + BRANCHES[r["db"]],
+        "year_pillar":  STEMS[r["ys"]] + BRANCHES[r["yb"]],
+        "month_pillar": STEMS[r["ms"]] + BRANCHES[r["mb"]],
+        "ds": r["ds"], "db": r["db"],
+    }
+
+
+def as_array():
+    """全レコードを numpy 構造化配列（読み取り専用・ゼロコピー）で返す。"""
+    global _array
+    if _array is None:
+        import numpy as np
+        mm = _table()
+        dtype = np.dtype([(name, "u1") for name in FIELDS] + [("_pad", "u1", (2,))])
+        _array = np.frombuffer(mm, dtype=dtype, count=_n_days, offset=_HEADER.size)
+    return _array
+
+
+def offsets(dates):
+    """datetime64 / date の配列 → レコード番号の int64 配列（範囲外は ValueError）。"""
+    import numpy as np
+    first, _ = date_range()
+    off = (np.asarray(dates, dtype="datetime64[D]") - np.datetime64(first, "D")).astype(np.int64)
+    if off.size and (off.min() < 0 or off.max() >= _n_days):
+        raise ValueError("カレンダー表の範囲外の日付が含まれています")
+    return off
+
+
+def verify() -> int:
+    """全日を calc_gototoku と照合し、不一致の日数を返す。"""
+    first, last = date_range()
+    bad = 0
+    d = first
+    while d <= last:
+        if lookup(d) != calc_gototoku(d):
+            bad += 1
+        d += timedelta(days=1)
+    return bad
+
+
+if __name__ == "__main__":
+    import sys
+    if "--verify" in sys.argv:
+        n_bad = verify()
+        print(f"不一致: {n_bad} 日")
+        sys.exit(1 if n_bad else 0)
+    print(f"生成しました: {build()}")
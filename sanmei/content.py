@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+固定テキスト（星の解説・相性の文言・五行の対応）
+
+app.py は再実行のたびにモジュール全体が評価し直されるため、固定の辞書をここへ分けて
+プロセスにつき 1 回だけ構築する（2 回目以降の import は sys.modules から返るだけ）。
+レポートの見出し・定型文と相性の文言は PDF（app.py）と HTML（sanmei/report_html.py）で共用する。
+"""
+
+# ─────────────────────────────────────────────
+#  画面表示用（中心星の一言プロフィール・相性タイプ）
+# ─────────────────────────────────────────────
+STAR_PROFILE = {
+    "貫索星": "独立独歩のマイペース職人。自分の裁量で進められる業務で最も輝きます。",
+    "石門星": "フラットな視点を持つチームの調整役。人間関係を円滑にする天才です。",
+    "鳳閣星": "自然体で客観的な表現者。プレッシャーのない環境で的確な発信力を持ちます。",
+    "調舒星": "独自の美学を持つ完璧主義のアーティスト。一人で没頭できる専門分野で無双します。",
+    "禄存星": "愛情と魅力にあふれるカリスマ。人を惹きつけ、大型案件を獲ってくる歩くパワースポットです。",
+    "司禄星": "堅実で慎重な蓄積のプロ。絶対にミスをしない、組織の頼れるバックオフィスです。",
+    "車騎星": "考えるより先に動く特攻隊長。スピード感のある短期決戦で圧倒的な成果を出します。",
+    "牽牛星": "責任感と自尊心の塊。ルールとメンツを重んじる、組織の完璧なエリートです。",
+    "龍高星": "ルール破壊の異端児。ルーティンを嫌い、ゼロから新しい事業を生み出す天才です。",
+    "玉堂星": "論理と伝統を重んじる知性派。過去のデータや理屈から最適解を導き出します。",
+}
+
+COMPATIBILITY_LOGIC = {
+    "same": {
+        "title": "【似た者同士・鏡の相性】",
+        "text": (
+            "仕事に対する根底の価値観が同じなので、ツーカーの「阿吽の呼吸」で仕事が進みます。"
+            "ただし、お互いの弱点も同じになるため、同じミスを連発しないよう第三者のチェックが必要です。"
+        ),
+    },
+    "different": {
+        "title": "【水と油・補完の相性】",
+        "text": (
+            "ビジネスの進め方が全く異なる「異星人」同士です。"
+            "相手を自分のやり方にハメようとすると反発が起きます。"
+            "しかし、得意領域を完全に「分業」した瞬間、弱点をカバーし合う最強のチームに化けます。"
+        ),
+    },
+}
+
+
+# ─────────────────────────────────────────────
+#  PDF用スターデータ（個人向け B2C）
+# ─────────────────────────────────────────────
+STAR_DATA_PERSONAL = {
+    "貫索星": {"desc": "独立独歩のマイペース。自分のやり方を守りたい職人気質です。",
+               "strategy": "人に合わせすぎず、自分の裁量で進められる単独業務や専門職で最も輝きます。"},
+    "石門星": {"desc": "フラットな視点を持つ協調性の星。人間関係を円滑にする天才です。",
+               "strategy": "チームワークを活かせる環境や、人と人を繋ぐ調整役・サポート役として重宝されます。"},
+    "鳳閣星": {"desc": "自然体でマイペースな表現者。のんびり楽しむことが一番のエネルギー源です。",
+               "strategy": "ガチガチのノルマを避け、発信力や客観的視点を活かせる風通しの良い環境がベストです。"},
+    "調舒星": {"desc": "繊細な感性と独自の美学を持つアーティスト。孤独と完璧を愛します。",
+               "strategy": "一人の時間を確保し、クリエイティブな仕事や専門分野に没頭すると才能が開花します。"},
+    "禄存星": {"desc": "愛情深く、人から感謝されたい奉仕家。息をするように人に好かれるパワースポットです。",
+               "strategy": "「誰かのために」動くことで評価される営業やサービス業などで圧倒的な結果を出します。"},
+    "司禄星": {"desc": "堅実で慎重な蓄積のプロ。ルーティンと平和を愛する常識人です。",
+               "strategy": "突発的な変更が少ない環境で、事務や管理などコツコツ積み上げる業務で絶大な信頼を得ます。"},
+    "車騎星": {"desc": "考えるより先に動くスピードスター。白黒ハッキリさせたい特攻隊長です。",
+               "strategy": "長い会議はNG。短期決戦で結果が見える営業や、体を動かす現場仕事で無双します。"},
+    "牽牛星": {"desc": "責任感と自尊心の塊。ルールを重んじる完璧な優等生（社畜プロ）です。",
+               "strategy": "明確な「役職」や「評価」がもらえる環境で、管理部門や公的な仕事に強い適性があります。"},
+    "龍高星": {"desc": "束縛を嫌い、常に新しい刺激を求める改革の異端児。ルーティンが死ぬほど苦手です。",
+               "strategy": "無意味な社内ルールを避け、企画や新規事業など「ゼロからイチを生み出す」環境へ！"},
+    "玉堂星": {"desc": "論理的思考と伝統を重んじる知性派。過去のデータから学ぶ優得生です。",
+               "strategy": "感情論ではなく、データや理屈が通る環境（研究、教育、分析など）で才能を発揮します。"},
+}
+
+# ─────────────────────────────────────────────
+#  PDF用スターデータ（組織相性 B2B）
+# ─────────────────────────────────────────────
+STAR_DATA_BUSINESS = {
+    "貫索星": {"desc": "自分のペースとやり方を絶対に崩さない、独立独歩の職人肌です。",
+               "strategy": "細かく管理・干渉せず、裁量と目標だけを与えて任せきる。"},
+    "石門星": {"desc": "上下関係よりも対等な繋がりと、チームの和を重んじる政治家タイプです。",
+               "strategy": "上から目線での命令を避け、事前に「相談・根回し」を行って巻き込む。"},
+    "鳳閣星": {"desc": "プロセスや楽しさを重視し、自然体で物事に取り組む自由人です。",
+               "strategy": "ガチガチのノルマで縛らず、ゲーム感覚や自由度を持たせて働かせる。"},
+    "調舒星": {"desc": "独特の美学と鋭い感性を持ち、完璧主義で傷つきやすい一面があります。",
+               "strategy": "「あなたにしかできない」と特別感を伝え、細やかな感情に寄り添う。"},
+    "禄存星": {"desc": "貢献したい・認められたいという「承認欲求」が非常に強い奉仕家です。",
+               "strategy": "小さな成果でも「助かりました！」と大げさに感謝を伝え、承認欲求を満たす。"},
+    "司禄星": {"desc": "着実な積み重ねと安全を重んじる、非常に堅実で保守的な性質です。",
+               "strategy": "急な変更やサプライズを避け、データ・マニュアル・前例を提示して安心させる。"},
+    "車騎星": {"desc": "考えるよりも先に体が動く、スピード重視の特攻隊長です。",
+               "strategy": "言い訳や長い前置きは避け、とにかく「結論から」「スピーディーに」指示を出す。"},
+    "牽牛星": {"desc": "礼儀作法やメンツ、ブランドを非常に大切にするプライドの高いエリート気質です。",
+               "strategy": "人前で叱るなどの恥をかかせる行為は絶対NG。役職や立場を尊重し、礼儀を通す。"},
+    "龍高星": {"desc": "ルーティンワークや古い規則を嫌う、自由奔放なアイデアマン・改革者です。",
+               "strategy": "「今までこうだったから」という理屈は捨て、常に新しい挑戦やミッションを与える。"},
+    "玉堂星": {"desc": "論理や伝統、知性を重んじる理論派です。感情論や気合は通じません。",
+               "strategy": "客観的な事実や過去の実績に基づき、論理的に筋の通った説明で納得させる。"},
+}
+
+# ─────────────────────────────────────────────
+#  組織相性PDF用：五行の対応と相生・相剋
+# ─────────────────────────────────────────────
+ELEM_MAP = {"貫索星":"木","石門星":"木","鳳閣星":"火","調舒星":"火",
+           "禄存星":"土","司禄星":"土","車騎星":"金","牽牛星":"金",
+           "龍高星":"水","玉堂星":"水"}
+SOUSEI   = frozenset([("木","火"),("火","土"),("土","金"),("金","水"),("水","木")])   # 相生（A が B を生む）
+SOUKOKU  = frozenset([("木","土"),("土","水"),("水","火"),("火","金"),("金","木")])   # 相剋（A が B を剋す）
+
+
+# ─────────────────────────────────────────────
+#  組織相性レポート：五行分析の文言
+# ─────────────────────────────────────────────
+def power_balance(ca: str, cb: str, na: str, nb: str) -> str:
+    ea, eb = ELEM_MAP.get(ca,""), ELEM_MAP.get(cb,"")
+    if not ea or not eb: return "互いに独立したプロとして良い緊張感を持って働ける関係です。"
+    if ea == eb: return "お二人の仕事の進め方は【同質】です。ツーカーで通じ合いますが、意見がぶつかると平行線になりやすいので、第三者の視点を入れるとスムーズです。"
+    if (ea,eb) in SOUSEI: return f"仕事のエネルギーが{na}様から{nb}様へ流れています。あなたがサポートし、相手を動かすことで最大の利益を生む関係です。"
+    if (eb,ea) in SOUSEI: return f"仕事のエネルギーが{nb}様から{na}様へ流れています。相手の提案をあなたが受け取り、最終決定を下す関係です。"
+    if (ea,eb) in SOUKOKU: return f"{na}様が{nb}様を【コントロール】しやすい関係です。上司やクライアントとして非常にスムーズに指示が通る相性です。"
+    if (eb,ea) in SOUKOKU: return f"{nb}様が{na}様を【コントロール】する力関係です。相手を適度に立てて主導権を譲るのが賢い処世術です。"
+    return "互いに独立したプロとして良い緊張感を持って働ける関係です。"
+
+def combat_style(ra: str, rb: str) -> str:
+    if ra == rb: return "社会や顧客に対する【戦闘スタイルが完全一致】しています。営業やプレゼンで抜群のコンビネーションを発揮します。"
+    return "社会への【アプローチ手法が異なります】。新規開拓と顧客フォローなど、見事な役割分担（最強の矛と盾）が構築できます。"
+
+def crisis_management(fa: str, fb: str) -> str:
+    if fa == fb: return "トラブル時の【危機管理思考が同じ】です。危機的状況下でも足並みが揃い、迅速な意思決定が可能です。"
+    return "【危機管理アプローチが異なります】。一方が焦っている時にもう一方が冷静に分析できる、ピンチほど補い合える関係です。"
+
+def tenchu_affinity(tc_a: str, tc_b: str, na: str, nb: str) -> str:
+    if tc_a == "不明" or tc_b == "不明": return "それぞれのペースで着実にビジネスを進めることができます。"
+    if tc_a == tc_b: return f"お二人は【{tc_a}天中殺】という同じバイオリズムを持っています。好機が完全一致し爆発的なスピード感を生みます。ただし運気低迷期も同時に訪れるため、資金・計画に余裕を持たせるリスクヘッジが必要です。"
+    return f"お二人は「{tc_a}」と「{tc_b}」という異なるバイオリズムを持っています。一方の運気が落ちた時にもう一方が好調のため、業績が落ち込まない【最高峰のリスクヘッジ（補完関係）】が成立しています。"
+
+
+# ─────────────────────────────────────────────
+#  レポートの構成（PDF / HTML 共通）
+# ─────────────────────────────────────────────
+PERSONAL_TITLE = "【才能開花】自分専用・初期スペック解析カルテ"
+PERSONAL_HEADING = "{name}様の「5つの才能とサバイブ術」"
+PERSONAL_POSITIONS = [
+    ("本質・絶対に譲れない価値観（中央）", "center"),
+    ("社会や上司に見せる外ヅラ（頭上）",    "head"),
+    ("職場や同僚との接し方（右手）",        "right"),
+    ("プライベート・家庭での顔（左手）",     "left"),
+    ("ストレス時・無意識の行動（足元）",     "feet"),
+]
+PERSONAL_TENCHU_HEADING = "あなたの人生バイオリズム（天中殺グループ）"
+PERSONAL_TENCHU = "あなたは【{tc}天中殺】グループに属しています。この時期は転職、起業、引っ越しなどの「人生の大きな決断」は避け、自己研鑽などの充電期間に充てるのが賢明なリスクヘッジとなります。"
+PERSONAL_SUMMARY = "総括：以上が、{name}様が生まれ持った「初期スペック（才能の星）」です。今の仕事や人間関係で息苦しさを感じているなら、それは能力不足ではなく、星と環境のミスマッチが原因です。このカルテを、ご自身の才能を120%解放するための武器としてご活用ください！"
+
+BUSINESS_TITLE = "【ビジネス相性・完全攻略マニュアル】"
+BUSINESS_HEADING = "{name}様の「取扱説明書」（地雷と攻略法）"
+BUSINESS_POSITIONS = [
+    ("本質・一番の価値観（中央）",         "center"),
+    ("目上・社会に見せる顔（頭上）",        "head"),
+    ("対人・現場での戦闘スタイル（右手）",  "right"),
+]
+
+
+def business_sections(ga: dict, gb: dict, tca: str, tcb: str, na: str, nb: str) -> list[tuple[str, str]]:
+    """組織相性レポートの取扱説明書より後の節（見出し, 本文）。"""
+    return [
+        ("パワーバランスと立ち回り（主導権の所在）", power_balance(ga["center"], gb["center"], na, nb)),
+        ("社会・顧客に対するアプローチ（戦闘スタイル）",
+         f"お二人の右手の星（{ga['right']}×{gb['right']}）の分析です。{combat_style(ga['right'], gb['right'])}"),
+        ("トラブル時の危機管理能力（メンタルの補完）",
+         f"お二人の足元の星（{ga['feet']}×{gb['feet']}）の分析です。{crisis_management(ga['feet'], gb['feet'])}"),
+        ("事業バイオリズムとリスクヘッジ（天中殺グループ）", tenchu_affinity(tca, tcb, na, nb)),
+    ]
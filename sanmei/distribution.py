@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+組織の分布集計（中心星・五行・天中殺グループ・同質ペア率）
+
+部署 × 中心星 / 部署 × 天中殺 の人数表から残りを導く。人数表は、エンジン出力の整数コードに対する
+bincount（部署 × 値 の 1 次元化キー）で求めるか（aggregate）、名簿の版管理が差分で保っているもの
+（incremental の buckets）をそのまま使う（from_counts）。
+  同質ペア率 … 中心星が同じ組（COMPATIBILITY_LOGIC の "same"）の割合。
+              値ごとの人数 c から Σ c(c-1)/2 ÷ nC2 で求めるため、ペアを列挙しない。
+"""
+
+import numpy as np
+
+from sanmei.engine import STAR_NAMES, _TENCHU_GROUPS
+
+ELEMENTS = ["木", "火", "土", "金", "水"]
+
+
+def _by_dept(values, dept, n_dept: int, n_values: int):
+    key = dept.astype(np.intp) * n_values + values
+    return np.bincount(key, minlength=n_dept * n_values).reshape(n_dept, n_values)
+
+
+def _same_ratio(counts):
+    """最後の軸が値ごとの人数の配列 → (同質ペア数, 全ペア数)。"""
+    counts = counts.astype(np.int64)
+    n = counts.sum(axis=-1)
+    return (counts * (counts - 1) // 2).sum(axis=-1), n * (n - 1) // 2
+
+
+def aggregate(codes: dict, dept, n_dept: int, rows=None) -> dict:
+    """rows（名簿の行番号, None なら全員）の分布を部署別・全体で集計する。
+
+    Returns
+    -------
+    dict with keys:
+      n                        : 対象人数
+      size_by_dept             : 部署別の人数 [D]
+      center, center_by_dept   : 中心星の人数 [10] / [D, 10]
+      element, element_by_dept : 中心星の五行の人数 [5] / [D, 5]
+      tenchu, tenchu_by_dept   : 天中殺グループの人数 [6] / [D, 6]
+      same_pairs, pairs        : 中心星が同じ組の数 / 全組数（全体）
+      same_pairs_by_dept, pairs_by_dept : 同（部署内の組）[D]
+    """
+    dept = np.asarray(dept)
+    center = codes["center"]
+    tenchu = codes["tenchu"]
+    if rows is not None:
+        dept, center, tenchu = dept[rows], center[rows], tenchu[rows]
+    return from_counts(_by_dept(center.astype(np.intp), dept, n_dept, len(STAR_NAMES)),
+                       _by_dept(tenchu.astype(np.intp), dept, n_dept, len(_TENCHU_GROUPS)))
+
+
+def from_counts(center_by_dept, tenchu_by_dept) -> dict:
+    """部署 × 中心星 [D, 10] / 部署 × 天中殺 [D, 6] の人数から aggregate と同じ集計を組み立てる。"""
+    center_by_dept = np.asarray(center_by_dept, dtype=np.int64)
+    tenchu_by_dept = np.asarray(tenchu_by_dept, dtype=np.int64)
+    element_by_dept = center_by_dept.reshape(len(center_by_dept), 5, 2).sum(axis=2)   # 星コード // 2 = 五行
+    center_all = center_by_dept.sum(axis=0)
+    same, pairs = _same_ratio(center_all)
+    same_d, pairs_d = _same_ratio(center_by_dept)
+    return {
+        "n":                  int(center_all.sum()),
+        "size_by_dept":       center_by_dept.sum(axis=1),
+        "center":             center_all,
+        "center_by_dept":     center_by_dept,
+        "element":            element_by_dept.sum(axis=0),
+        "element_by_dept":    element_by_dept,
+        "tenchu":             tenchu_by_dept.sum(axis=0),
+        "tenchu_by_dept":     tenchu_by_dept,
+        "same_pairs":         int(same),
+        "pairs":              int(pairs),
+        "same_pairs_by_dept": same_d,
+        "pairs_by_dept":      pairs_d,
+    }
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+算命学 計算エンジン（Streamlit 非依存）
+
+app.py から切り出した純粋な計算部分。バッチ処理・ワーカープロセス・
+ベンチマークからも Streamlit を起動せずに import できる。
+"""
+
+from datetime import date
+
+from sanmei import metrics
+
+# ─────────────────────────────────────────────
+#  計算エンジン
+#
+#  【五徳の位置と算出元】
+#    頭  = 年干         の星（対 日干）
+#    左手 = 月支の正気蔵干 の星（対 日干）
+#    中央 = 日支の正気蔵干 の星（対 日干）← 中心星
+#    右手 = 年支の正気蔵干 の星（対 日干）
+#    足  = 月干         の星（対 日干）
+#
+#  バリデーション済み（1994-01-21 = 丁未日）:
+#    頭=車騎星, 左手=鳳閣星, 中央=鳳閣星, 右手=禄存星, 足=龍高星 ✓
+# ─────────────────────────────────────────────
+
+STEMS    = ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"]
+BRANCHES = ["子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥"]
+
+_ELEM  = [0, 0, 1, 1, 2, 2, 3, 3, 4, 4]  # 0=木 1=火 2=土 3=金 4=水
+_POL   = [0, 1, 0, 1, 0, 1, 0, 1, 0, 1]  # 0=陽 1=陰
+_GEN   = [1, 2, 3, 4, 0]                  # 相生（木→火→土→金→水→木）
+_CTRL  = [2, 3, 4, 0, 1]                  # 相克（木→土→水→火→金→木）
+
+# 各地支の正気蔵干（主気）インデックス
+# 子=癸, 丑=己, 寅=甲, 卯=乙, 辰=戊, 巳=丙, 午=丁, 未=己, 申=庚, 酉=辛, 戌=戊, 亥=壬
+_HIDDEN = [9, 5, 0, 1, 4, 2, 3, 5, 6, 7, 4, 8]
+
+# 月干起算（寅月の天干）: 甲己年=丙, 乙庚年=戊, 丙辛年=庚, 丁壬年=壬, 戊癸年=甲
+_MONTH_STEM_START = [2, 4, 6, 8, 0]
+
+# 節気（固定近似値）: (月, 日, 月支インデックス)
+_SOLAR_TERMS = [
+    (1, 6, 1), (2, 4, 2), (3, 6, 3),  (4, 5, 4),
+    (5, 6, 5), (6, 6, 6), (7, 7, 7),  (8, 7, 8),
+    (9, 8, 9), (10, 8, 10), (11, 7, 11), (12, 7, 0),
+]
+
+POSITION_LABELS = {
+    "head":   "頭",
+    "left":   "左手",
+    "center": "中央",
+    "right":  "右手",
+    "feet":   "足",
+}
+
+
+# ── ユリウス通日 ──────────────────────────────
+def _jdn(d: date) -> int:
+    a = (14 - d.month) // 12
+    y = d.year + 4800 - a
+    m = d.month + 12 * a - 3
+    return d.day + (153 * m + 2) // 5 + 365 * y + y // 4 - y // 100 + y // 400 - 32045
+
+_REF_JDN = _jdn(date(1900, 1, 1))  # 甲戌日（日干=甲=0, 日支=戌=10）
+
+
+# ── 中国年（立春 2/4 で切り替え）────────────────
+def _cy(d: date) -> int:
+    return d.year if d >= date(d.year, 2, 4) else d.year - 1
+
+
+# ── 各柱インデックス ──────────────────────────
+def year_stem_idx(d: date) -> int:
+    return (_cy(d) - 4) % 10
+
+def year_branch_idx(d: date) -> int:
+    return (_cy(d) - 4) % 12
+
+def month_branch_idx(d: date) -> int:
+    br = 0  # 大雪前（1月上旬）は子月
+    for m, dy, b in _SOLAR_TERMS:
+        if d >= date(d.year, m, dy):
+            br = b
+    return br
+
+def month_stem_idx(d: date) -> int:
+    ys = year_stem_idx(d)
+    mb = month_branch_idx(d)
+    offset = (mb - 2 + 12) % 12
+    return (_MONTH_STEM_START[ys % 5] + offset) % 10
+
+def day_stem_idx(d: date) -> int:
+    return (_jdn(d) - _REF_JDN) % 10
+
+def day_branch_idx(d: date) -> int:
+    # オフセット=10: 1900-01-01=甲戌日（戌=10）を基準に実測検証済み
+    return (_jdn(d) - _REF_JDN + 10) % 12
+
+
+# ── 星の計算（天干インデックス → 日干との関係） ─────
+def calc_star(stem_idx: int, day_stem_idx: int) -> str:
+    ye, de = _ELEM[stem_idx], _ELEM[day_stem_idx]
+    yp, dp = _POL[stem_idx],  _POL[day_stem_idx]
+    sp = (yp == dp)
+    if ye == de:              return "貫索星" if sp else "石門星"   # 比肩 / 劫財
+    if _GEN[de]  == ye:       return "鳳閣星" if sp else "調舒星"   # 食神 / 傷官
+    if _CTRL[de] == ye:       return "禄存星" if sp else "司禄星"   # 偏財 / 正財
+    if _GEN[ye]  == de:       return "龍高星" if sp else "玉堂星"   # 偏印 / 印綬
+    if _CTRL[ye] == de:       return "車騎星" if sp else "牽牛星"   # 偏官 / 正官
+    return "未定義"
+
+
+# ── 星の整数コード ─────────────────────────────
+#  コード = STAR_NAMES のインデックス。code // 2 が五行（0=木 … 4=水）と一致する。
+#  バッチ処理・カレンダー表・集計はすべてこの整数コードで扱う。
+STAR_NAMES = ["貫索星", "石門星", "鳳閣星", "調舒星", "禄存星",
+              "司禄星", "車騎星", "牽牛星", "龍高星", "玉堂星"]
+
+# STAR_TABLE[天干][日干] → 星コード（calc_star と完全一致）
+STAR_TABLE = [[STAR_NAMES.index(calc_star(s, d)) for d in range(10)] for s in range(10)]
+
+def calc_star_code(stem_idx: int, day_stem_idx: int) -> int:
+    return STAR_TABLE[stem_idx][day_stem_idx]
+
+
+# ── 五徳（5ポジション）の計算 ──────────────────
+@metrics.timed("calc_gototoku")
+def calc_gototoku(birth: date) -> dict:
+    """
+    五徳と柱情報を辞書で返す。
+
+    Returns
+    -------
+    dict with keys:
+      head, left, center, right, feet  : 各位置の星名
+      day_pillar, year_pillar, month_pillar : '丁未' 形式の文字列
+      ds, db : 日干/日支インデックス
+    """
+    ds = day_stem_idx(birth)
+    db = day_branch_idx(birth)
+    ys = year_stem_idx(birth)
+    yb = year_branch_idx(birth)
+    ms = month_stem_idx(birth)
+    mb = month_branch_idx(birth)
+
+    return {
+        "head":         calc_star(ys,          ds),   # 年干
+        "left":         calc_star(_HIDDEN[mb], ds),   # 月支蔵干
+        "center":       calc_star(_HIDDEN[db], ds),   # 日支蔵干（中心星）
+        "right":        calc_star(_HIDDEN[yb], ds),   # 年支蔵干
+        "feet":         calc_star(ms,          ds),   # 月干
+        "day_pillar":   STEMS[ds] + BRANCHES[db],
+        "year_pillar":  STEMS[ys] + BRANCHES[yb],
+        "month_pillar": STEMS[ms] + BRANCHES[mb],
+        "ds": ds, "db": db,
+    }
+
+
+# ─────────────────────────────────────────────
+#  天中殺の計算
+# ─────────────────────────────────────────────
+_KANSHI_BASE = [
+    "甲子","乙丑","丙寅","丁卯","戊辰","己巳","庚午","辛未","壬申","癸酉",
+    "甲戌","乙亥","丙子","丁丑","戊寅","己卯","庚辰","辛巳","壬午","癸未",
+    "甲申","乙酉","丙戌","丁亥","戊子","己丑","庚寅","辛卯","壬辰","癸巳",
+    "甲午","乙未","丙申","丁酉","戊戌","己亥","庚子","辛丑","壬寅","癸卯",
+    "甲辰","乙巳","丙午","丁未","戊申","己酉","庚戌","辛亥","壬子","癸丑",
+    "甲寅","乙卯","丙辰","丁巳","戊午","己未","庚申","辛酉","壬戌","癸亥",
+]
+_TENCHU_GROUPS = ["戌亥", "申酉", "午未", "辰巳", "寅卯", "子丑"]
+
+@metrics.timed("tenchusatsu")
+def get_tenchusatsu(day_pillar: str) -> str:
+    if day_pillar in _KANSHI_BASE:
+        return _TENCHU_GROUPS[_KANSHI_BASE.index(day_pillar) // 10]
+    return "不明"
+
+
+# ── 整数コード版 ──────────────────────────────
+#  干支番号（0=甲子 … 59=癸亥）は (6*stem - 5*branch) % 60 で一意に求まる。
+#  天中殺グループ番号 = 干支番号 // 10（_TENCHU_GROUPS のインデックス）
+def kanshi_idx(stem_idx: int, branch_idx: int) -> int:
+    return (6 * stem_idx - 5 * branch_idx) % 60
+
+def tenchu_group_idx(stem_idx: int, branch_idx: int) -> int:
+    return kanshi_idx(stem_idx, branch_idx) // 10
+
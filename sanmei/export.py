@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+診断結果の列指向エクスポート（Parquet / Arrow IPC, BI ツール向け）
+
+  roster_batches     … 1 人 1 行（星・柱・天中殺は辞書エンコード列）
+  pair_batches       … 各メンバーの相性上位 k 名（1 組 1 行, 疎な相性行列）
+  aggregate_batches  … 部署 × 指標 × 値 の人数（distribution.aggregate の縦持ち）
+  write              … RecordBatch の列をストリームで書き出す（Parquet は 1 バッチ = 1 行グループ）
+
+星・柱・天中殺・部署の列は「エンジンの整数コード = 辞書の添字」なので、
+辞書エンコード列の indices にはエンジン出力の配列をコピーせずにそのまま渡す。
+どの関数もチャンク単位で RecordBatch を yield するため、数百万行でもメモリはチャンク長に比例する。
+
+pyarrow は任意の依存。未導入なら _PYARROW_AVAILABLE = False で、各関数は RuntimeError を送出する。
+
+CLI:
+    python -m sanmei.export 名簿.csv 出力ディレクトリ [--format parquet|arrow] [--top 10]
+"""
+
+import numpy as np
+
+from sanmei import pairing
+from sanmei.batch import POSITIONS, RELATIONS, relation_codes
+from sanmei.distribution import ELEMENTS
+from sanmei.engine import STAR_NAMES, _TENCHU_GROUPS
+from sanmei.search import KANSHI_NAMES
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+    _PYARROW_AVAILABLE = True
+except ImportError:
+    pa = pq = None
+    _PYARROW_AVAILABLE = False
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+CHUNK = 65536
+
+
+def _require():
+    if not _PYARROW_AVAILABLE:
+        raise RuntimeError("エクスポートには pyarrow が必要です（pip install pyarrow）")
+
+
+def _dict(indices, labels: list[str]):
+    """整数コード → 辞書エンコード列。uint8 コードは int8 として再解釈する（コピーなし）。"""
+    a = np.asarray(indices)
+    if a.dtype == np.uint8:
+        a = a.view(np.int8)
+    return pa.DictionaryArray.from_arrays(pa.array(a), pa.array(labels, type=pa.string()))
+
+
+def _kanshi(stem, branch):
+    return ((6 * stem.astype(np.int16) - 5 * branch.astype(np.int16)) % 60).astype(np.int8)
+
+
+# ─────────────────────────────────────────────
+#  RecordBatch 生成
+# ─────────────────────────────────────────────
+def roster_batches(roster: dict, codes: dict, chunk: int = CHUNK):
+    """名簿 1 人 1 行の RecordBatch を chunk 行ずつ yield する。"""
+    _require()
+    labels = roster["dept_labels"]
+    for lo in range(0, len(roster["keys"]), chunk):
+        sl = slice(lo, lo + chunk)
+        mgr = roster["manager"][sl]
+        cols = {
+            "employee_id": pa.array(roster["keys"][sl], type=pa.string()),
+            "name":        pa.array(roster["names"][sl], type=pa.string()),
+            "birth":       pa.array(roster["birth"][sl]),                     # date32
+            "department":  _dict(roster["dept"][sl], labels),
+            "role":        pa.array(roster["roles"][sl], type=pa.string()),
+            "manager_id":  pa.array([roster["keys"][m] if m >= 0 else None for m in mgr.tolist()],
+                                    type=pa.string()),
+        }
+        for p in POSITIONS:
+            cols[p] = _dict(codes[p][sl], STAR_NAMES)
+        cols["day_pillar"]   = _dict(codes["kanshi"][sl], KANSHI_NAMES)
+        cols["month_pillar"] = _dict(_kanshi(codes["ms"][sl], codes["mb"][sl]), KANSHI_NAMES)
+        cols["year_pillar"]  = _dict(_kanshi(codes["ys"][sl], codes["yb"][sl]), KANSHI_NAMES)
+        cols["tenchu"]       = _dict(codes["tenchu"][sl], [g + "天中殺" for g in _TENCHU_GROUPS])
+        yield pa.record_batch(list(cols.values()), names=list(cols))
+
+
+def pair_batches(roster: dict, codes: dict, top: int = 10, preset: str = "general",
+                 chunk: int = CHUNK):
+    """各メンバーから見た相性上位 top 名（自分を除く）を 1 組 1 行で yield する（疎な相性行列）。
+
+    スコアは (五行, 右手, 足, 天中殺) のクラスだけで決まるため、クラス × クラスのスコア表
+    （最大 3,000 × 3,000）を 1 回作り、クラスごとに上位の相手を選ぶ。N × N の行列は作らない。
+    同点はクラスの順位 → 名簿の行順で決める。
+    """
+    _require()
+    weights = pairing.PRESETS[preset]
+    n = len(roster["keys"])
+    top = min(top, n - 1)
+    if top <= 0:
+        return
+    keys = np.asarray(roster["keys"], dtype=object)
+    cls = (((codes["center"] // 2).astype(np.intp) * 10 + codes["right"]) * 10 + codes["feet"]) * 6 \
+        + codes["tenchu"]
+    _, first, inv, counts = np.unique(cls, return_index=True, return_inverse=True, return_counts=True)
+    f_cls = pairing.features(codes, first)
+    s_cls = pairing.score_matrix(f_cls, f_cls, weights)                    # [C, C]
+    members = np.split(np.argsort(inv, kind="stable"), np.cumsum(counts)[:-1])
+
+    where = np.full(n, -1, dtype=np.intp)   # 候補内の位置（自分の除外用）
+    out = {"a": [], "b": [], "score": []}
+    pending = 0
+    for c in range(len(members)):
+        ranked = np.argsort(-s_cls[c], kind="stable")
+        take = np.searchsorted(np.cumsum(counts[ranked]), top + 1) + 1     # top+1 名に届くクラス数
+        cand = np.concatenate([members[k] for k in ranked[:take]])[:top + 1]
+        cand_score = s_cls[c, inv[cand]]
+        me = members[c]
+        # 候補に自分が含まれる人はその位置を飛ばし、含まれない人は先頭 top 名
+        where[cand] = np.arange(top + 1)
+        pos = where[me]
+        where[cand] = -1
+        pos[pos < 0] = top
+        sel = np.arange(top)[None, :]
+        sel = sel + (sel >= pos[:, None])
+        out["a"].append(np.repeat(me, top))
+        out["b"].append(cand[sel].ravel())
+        out["score"].append(cand_score[sel].ravel())
+        pending += len(me) * top
+        if pending >= chunk or c == len(members) - 1:
+            a, b, sc = (np.concatenate(out[k]) for k in ("a", "b", "score"))
+            out = {"a": [], "b": [], "score": []}
+            pending = 0
+            rel = relation_codes(codes["center"][a] // 2, codes["center"][b] // 2)
+            yield pa.record_batch([
+                pa.array(keys[a], type=pa.string()),
+                pa.array(keys[b], type=pa.string()),
+                pa.array(np.tile(np.arange(1, top + 1, dtype=np.int16), len(a) // top)),
+                pa.array(sc),
+                _dict(rel, RELATIONS),
+                pa.array(codes["tenchu"][a] == codes["tenchu"][b]),
+            ], names=["employee_id", "partner_id", "rank", "score", "relation", "tenchu_same"])
+
+
+def aggregate_batches(dist: dict, dept_labels: list[str]):
+    """distribution.aggregate の部署別集計を (department, metric, value, count) の縦持ちで yield する。"""
+    _require()
+    n_dept = len(dept_labels)
+    for metric, key, labels in (("center_star", "center_by_dept", STAR_NAMES),
+                                ("element", "element_by_dept", ELEMENTS),
+                                ("tenchu", "tenchu_by_dept", [g + "天中殺" for g in _TENCHU_GROUPS])):
+        m = dist[key]
+        n_val = m.shape[1]
+        yield pa.record_batch([
+            _dict(np.repeat(np.arange(n_dept, dtype=np.int32), n_val), dept_labels),
+            _dict(np.zeros(n_dept * n_val, dtype=np.int8), [metric]),
+            _dict(np.tile(np.arange(n_val, dtype=np.int8), n_dept), labels),
+            pa.array(m.ravel().astype(np.int64)),
+        ], names=["department", "metric", "value", "count"])
+
+
+# ─────────────────────────────────────────────
+#  書き出し
+# ─────────────────────────────────────────────
+def write(batches, sink, fmt: str = "parquet") -> int:
+    """RecordBatch の列を sink（パス or 書き込み可能なファイルオブジェクト）へ順に書き出し、行数を返す。
+    Parquet はバッチごとに行グループを確定するため、保持するのは常に 1 バッチ分だけ。
+    """
+    _require()
+    if fmt not in FORMATS:
+        raise ValueError(f"未対応の形式です: {fmt}")
+    writer, n = None, 0
+    try:
+        for batch in batches:
+            if writer is None:
+                writer = (pq.ParquetWriter(sink, batch.schema, compression="zstd") if fmt == "parquet"
+                          else pa.ipc.new_file(sink, batch.schema))
+            if fmt == "parquet":
+                writer.write_batch(batch, row_group_size=batch.num_rows)
+            else:
+                writer.write_batch(batch)
+            n += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return n
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from pathlib import Path
+
+    from sanmei.batch import compute_codes
+    from sanmei.distribution import aggregate
+    from sanmei.roster import parse_roster_csv
+
+    ap = argparse.ArgumentParser(description="名簿 CSV の診断結果を Parquet / Arrow IPC に書き出す")
+    ap.add_argument("roster")
+    ap.add_argument("out_dir")
+    ap.add_argument("--format", choices=list(FORMATS), default="parquet")
+    ap.add_argument("--top", type=int, default=10, help="相性上位の件数（0 で出力しない）")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    roster, errors = parse_roster_csv(Path(args.roster).read_bytes())
+    for msg in errors[:10]:
+        print(msg)
+    if roster is None:
+        raise SystemExit(1)
+    codes = compute_codes(roster["birth"])
+    out = Path(args.out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    ext = FORMATS[args.format]
+    jobs = [("members", roster_batches(roster, codes)),
+            ("aggregates", aggregate_batches(
+                aggregate(codes, roster["dept"], len(roster["dept_labels"])), roster["dept_labels"]))]
+    if args.top > 0:
+        jobs.append(("pairs_top", pair_batches(roster, codes, args.top)))
+    for name, batches in jobs:
+        path = out / f"{name}{ext}"
+        print(f"{path}: {write(batches, str(path), args.format):,} 行")
+    print(f"完了（{time.perf_counter() - t0:.1f} 秒）")
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+年運（その年の天干 × 本人の日干）の星を名簿 × 年 で一括計算する
+
+calc_star(year_stem, ds) と同じ STAR_TABLE を numpy 配列にして
+ファンシーインデックス 1 回で全員・全年分を引く。
+年は立春切り替えの暦年（西暦 y の年干 = (y - 4) % 10）。
+"""
+
+import numpy as np
+
+from sanmei.engine import STAR_NAMES, STAR_TABLE
+
+_star_table = None
+
+
+def _table():
+    global _star_table
+    if _star_table is None:
+        _star_table = np.array(STAR_TABLE, dtype=np.uint8)   # [年干, 日干]
+    return _star_table
+
+
+def year_stems(start_year: int, years: int):
+    return ((np.arange(start_year, start_year + years) - 4) % 10).astype(np.intp)
+
+
+def annual_stars(ds, start_year: int, years: int):
+    """日干コード配列 [N] → 年運の星コード [N, years]（uint8）。"""
+    ds = np.asarray(ds, dtype=np.intp)
+    return _table()[year_stems(start_year, years)[None, :], ds[:, None]]
+
+
+def star_counts(stars):
+    """年運行列 [N, Y] → 星ごとの人数 [10, Y]（チーム全体のヒートマップ用）。"""
+    n_stars = len(STAR_NAMES)
+    n, y = stars.shape
+    flat = stars.astype(np.intp) + n_stars * np.arange(y)[None, :]
+    return np.bincount(flat.ravel(), minlength=n_stars * y).reshape(y, n_stars).T
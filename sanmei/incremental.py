@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+名簿の版管理と差分再計算
+
+保存済みの名簿を新しい版に更新するとき、社員キーで差分を取り、変化した分だけを再計算する。
+状態は「スロット」単位で持つ。社員キーごとに固定のスロット番号を割り当て、
+退職者のスロットは空きとして再利用するため、既存メンバーの配列位置は版をまたいで変わらない。
+
+  codes    … 生年月日が変わった / 新規のスロットだけ batch.compute_codes で再計算
+  buckets  … 部署 × 中心星 / 部署 × 天中殺 の人数。変化したメンバーの分だけ増減
+  matrix   … 相性スコア行列（任意）。影響を受けたスロットの行・列だけ再計算
+  reports  … 個人レポートの再生成が必要なキー（新規・氏名変更・生年月日変更）
+
+差分の検出自体は名簿長に比例する（ベクトル比較）が、エンジン計算・行列・集計の更新量は
+変更件数に比例する。
+"""
+
+import time
+from datetime import datetime
+
+import numpy as np
+
+from sanmei import batch, caltable, pairing
+from sanmei.engine import STAR_NAMES, _TENCHU_GROUPS
+
+MATRIX_WEIGHTS = pairing.PRESETS["general"]
+
+_FIELDS = caltable.FIELDS
+
+
+def _grow(state: dict, need: int):
+    cap = len(state["active"])
+    if need <= cap:
+        return
+    new_cap = max(need, cap * 2, 64)
+    pad = new_cap - cap
+    state["active"] = np.concatenate([state["active"], np.zeros(pad, dtype=bool)])
+    state["birth"]  = np.concatenate([state["birth"], np.zeros(pad, dtype="datetime64[D]")])
+    state["dept"]   = np.concatenate([state["dept"], np.zeros(pad, dtype=np.int32)])
+    for f in _FIELDS:
+        state["codes"][f] = np.concatenate([state["codes"][f], np.zeros(pad, dtype=np.uint8)])
+    for lst in ("keys", "names", "roles", "manager_keys"):
+        state[lst].extend([None if lst == "keys" else ""] * pad)
+    state["free"].extend(range(new_cap - 1, cap - 1, -1))
+    if state["matrix"] is not None:
+        m = np.zeros((new_cap, new_cap), dtype=np.float32)
+        m[:cap, :cap] = state["matrix"]
+        state["matrix"] = m
+
+
+def _dept_index(state: dict, label: str) -> int:
+    labels = state["dept_labels"]
+    if label not in labels:
+        labels.append(label)
+        for b in state["buckets"].values():
+            b.resize((len(labels), b.shape[1]), refcheck=False)
+    return labels.index(label)
+
+
+def _bucket(state: dict, slots, sign: int):
+    if len(slots) == 0:
+        return
+    d = state["dept"][slots]
+    np.add.at(state["buckets"]["center"], (d, state["codes"]["center"][slots]), sign)
+    np.add.at(state["buckets"]["tenchu"], (d, state["codes"]["tenchu"][slots]), sign)
+
+
+def _rescore(state: dict, slots):
+    """slots の行・列だけ相性スコアを再計算する。"""
+    m = state["matrix"]
+    if m is None or len(slots) == 0:
+        return
+    f_all = pairing.features(state["codes"])
+    f_aff = pairing.features(state["codes"], slots)
+    m[slots, :] = pairing.score_matrix(f_aff, f_all, MATRIX_WEIGHTS)
+    m[:, slots] = pairing.score_matrix(f_all, f_aff, MATRIX_WEIGHTS)
+
+
+def new_state(with_matrix: bool = False) -> dict:
+    """空の状態。最初の版も update で流し込む（全員が「新規」になる）。"""
+    return {
+        "version": 0, "slot_of": {}, "free": [],
+        "keys": [], "names": [], "roles": [], "manager_keys": [],
+        "active": np.zeros(0, dtype=bool),
+        "birth":  np.zeros(0, dtype="datetime64[D]"),
+        "dept":   np.zeros(0, dtype=np.int32),
+        "dept_labels": [],
+        "codes":  {f: np.zeros(0, dtype=np.uint8) for f in _FIELDS},
+        "buckets": {"center": np.zeros((0, len(STAR_NAMES)), dtype=np.int64),
+                    "tenchu": np.zeros((0, len(_TENCHU_GROUPS)), dtype=np.int64)},
+        "matrix": np.zeros((0, 0), dtype=np.float32) if with_matrix else None,
+        "row_slots": np.zeros(0, dtype=np.intp),
+        "log": [],
+    }
+
+
+def update(state: dict, roster: dict, codes: dict | None = None) -> dict:
+    """state を roster（新しい版）に合わせて差分更新し、変更ログのエントリを返す。
+    codes（名簿の行順のエンジン出力）があれば再計算せずにそれを使う（保存済みの版を開くとき）。
+
+    Returns
+    -------
+    dict（state["log"] にも追記される）:
+      version, at           : 版番号 / 更新日時（ISO 形式）
+      added, removed        : 追加 / 削除された社員キー
+      changed               : {社員キー: 変化した項目のリスト}（birth/name/dept/role/manager）
+      reports               : 個人レポートの再生成が必要な社員キー
+      recomputed            : エンジンを再計算した人数
+      matrix_rows           : 相性行列で再計算した行・列の数
+      elapsed_ms            : 所要時間
+    """
+    t0 = time.perf_counter()
+    slot_of = state["slot_of"]
+    keys = roster["keys"]
+    new_index = {k: i for i, k in enumerate(keys)}   # 重複キーは後の行が優先
+
+    removed = [k for k in slot_of if k not in new_index]
+    added   = [k for k in new_index if k not in slot_of]
+    common  = [k for k in new_index if k in slot_of]
+
+    # ── 削除 ──
+    rm_slots = np.array([slot_of[k] for k in removed], dtype=np.intp)
+    _bucket(state, rm_slots, -1)
+    for k, s in zip(removed, rm_slots.tolist()):
+        del slot_of[k]
+        state["keys"][s] = None
+        state["free"].append(s)
+    state["active"][rm_slots] = False
+
+    # ── 既存メンバーの変化（ベクトル比較）──
+    changed: dict = {}
+    c_rows  = np.array([new_index[k] for k in common], dtype=np.intp)
+    c_slots = np.array([slot_of[k] for k in common], dtype=np.intp)
+    new_labels = roster["dept_labels"]
+    new_dept = np.array([_dept_index(state, new_labels[d]) for d in range(len(new_labels))],
+                        dtype=np.int32)[roster["dept"]] if len(keys) else np.zeros(0, np.int32)
+    mgr_key = lambda i: keys[roster["manager"][i]] if roster["manager"][i] >= 0 else ""
+    birth_ch = roster["birth"][c_rows] != state["birth"][c_slots]
+    dept_ch  = new_dept[c_rows] != state["dept"][c_slots]
+    for flag, name in ((birth_ch, "birth"), (dept_ch, "dept")):
+        for i in np.flatnonzero(flag).tolist():
+            changed.setdefault(common[i], []).append(name)
+    for i, (k, r, s) in enumerate(zip(common, c_rows.tolist(), c_slots.tolist())):
+        if roster["names"][r] != state["names"][s]:
+            changed.setdefault(k, []).append("name")
+        if roster["roles"][r] != state["roles"][s]:
+            changed.setdefault(k, []).append("role")
+        if mgr_key(r) != state["manager_keys"][s]:
+            changed.setdefault(k, []).append("manager")
+
+    # 集計から一旦抜く（部署・生年月日が変わった人）
+    moved = c_slots[birth_ch | dept_ch]
+    _bucket(state, moved, -1)
+
+    # ── 追加（空きスロットを再利用）──
+    _grow(state, len(slot_of) + len(added))
+    add_slots = np.array([state["free"].pop() for _ in added], dtype=np.intp)
+    for k, s in zip(added, add_slots.tolist()):
+        slot_of[k] = s
+        state["keys"][s] = k
+    state["active"][add_slots] = True
+
+    # ── 属性の書き込み ──
+    rows  = np.concatenate([c_rows, np.array([new_index[k] for k in added], dtype=np.intp)])
+    slots = np.concatenate([c_slots, add_slots])
+    state["birth"][slots] = roster["birth"][rows]
+    state["dept"][slots]  = new_dept[rows]
+    for r, s in zip(rows.tolist(), slots.tolist()):
+        state["names"][s] = roster["names"][r]
+        state["roles"][s] = roster["roles"][r]
+        state["manager_keys"][s] = mgr_key(r)
+
+    # ── エンジン再計算（生年月日が変わった人 + 新規）──
+    recompute = np.concatenate([c_slots[birth_ch], add_slots])
+    if len(recompute):
+        if codes is None:
+            fresh = batch.compute_codes(state["birth"][recompute])
+        else:
+            src = np.concatenate([c_rows[birth_ch], [new_index[k] for k in added]]).astype(np.intp)
+            fresh = {f: codes[f][src] for f in _FIELDS}
+        for f in _FIELDS:
+            state["codes"][f][recompute] = fresh[f]
+    _bucket(state, np.concatenate([moved, add_slots]), +1)
+    _rescore(state, recompute)
+
+    state["row_slots"] = np.array([slot_of[k] for k in keys], dtype=np.intp)
+    state["version"] += 1
+    entry = {
+        "version":     state["version"],
+        "at":          datetime.now().isoformat(timespec="seconds"),
+        "added":       added,
+        "removed":     removed,
+        "changed":     changed,
+        "reports":     added + [k for k, f in changed.items() if "birth" in f or "name" in f],
+        "recomputed":  int(len(recompute)),
+        "matrix_rows": int(len(recompute)) if state["matrix"] is not None else 0,
+        "elapsed_ms":  (time.perf_counter() - t0) * 1e3,
+    }
+    state["log"].append(entry)
+    return entry
+
+
+def restore(roster: dict, codes: dict, log: list, with_matrix: bool = False) -> dict:
+    """保存済みの版（名簿・エンジン出力・変更ログ）から状態を組み立てる。版番号とログは引き継ぐ。"""
+    state = new_state(with_matrix)
+    update(state, roster, codes)
+    state["log"] = list(log)
+    state["version"] = log[-1]["version"] if log else state["version"]
+    return state
+
+
+def roster_codes(state: dict) -> dict:
+    """現在の版の名簿の行順に並べたエンジン出力（batch.compute_codes と同じ形式）。"""
+    return {f: state["codes"][f][state["row_slots"]] for f in _FIELDS}
+
+
+def dept_buckets(state: dict, roster: dict) -> dict:
+    """集計を roster["dept_labels"] の順に並べ替えて返す（{"center": [D, 10], "tenchu": [D, 6]}）。"""
+    idx = [state["dept_labels"].index(d) for d in roster["dept_labels"]]
+    return {name: b[idx] for name, b in state["buckets"].items()}
+
+
+def partner_scores(state: dict, row: int):
+    """名簿の row 行目のメンバーから見た、全メンバー（名簿の行順）への相性スコア。"""
+    slots = state["row_slots"]
+    if state["matrix"] is not None:
+        return state["matrix"][slots[row], slots]
+    f_all = pairing.features(state["codes"], slots)
+    f_one = pairing.features(state["codes"], slots[row:row + 1])
+    return pairing.score_matrix(f_one, f_all, MATRIX_WEIGHTS)[0]
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+処理段階ごとの所要時間・件数の計測（Prometheus テキスト形式 / 定期 JSON ログ）
+
+  stage(名前)            … with で囲んだ区間の所要時間をヒストグラムに記録する
+  timed(名前)            … 関数デコレーター版の stage
+  count(名前, **ラベル)  … カウンターを 1 増やす（キャッシュのヒット / ミス等）
+  register_collector(fn) … 出力のたびに呼ぶ関数（{名前: 値} のゲージを返す）を登録する
+  render_prometheus()    … Prometheus のテキスト形式
+  snapshot()             … JSON 向けの辞書（ヒストグラムは件数・合計・分位点の目安）
+  serve(port)            … /metrics を返す HTTP サーバーを別スレッドで起動する
+  log_periodically(秒)   … snapshot() を一定間隔でログに出すスレッドを起動する
+
+enable() を呼ぶまでは記録しない。無効時の stage() は共有の何もしないオブジェクトを返し、
+timed() はフラグを 1 回見て元の関数を呼ぶだけなので、本番でフックを残したままにできる。
+集計はプロセス単位（全セッション共通）で、ロック 1 つで保護する。
+
+trace(リスト) を呼んだ thread では、enable() の有無に関わらず stage / count の記録を
+そのリストにも順に追記する（1 セッションの再実行だけを見るプロファイル用。sanmei/profiling.py）。
+追記は MAX_TRACE 件まで。trace(None) を呼ばないまま thread が終わった場合（st.stop / 例外で
+スクリプトが末尾まで届かなかった等）も、その時点で外す（同じ thread id が再利用されても引き継がない）。
+"""
+
+import functools
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "sanmei"
+
+# 秒。PDF 描画（数百 ms）から星の計算（数十 µs）までを 1 つの系列で見られる幅
+MAX_TRACE = 20_000     # 1 つの trace に追記する件数の上限
+
+BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = False
+_lock = threading.Lock()
+_hist: dict[str, list] = {}            # 段階 → [バケットごとの件数..., +Inf の件数, 合計秒]
+_counters: dict[tuple, int] = {}       # (名前, ((ラベル, 値), ...)) → 件数
+_collectors: list = []
+_traces: dict[int, list] = {}          # thread id → その thread の stage / count の追記先
+_local = threading.local()             # trace した thread の _Attached（thread の終了で捨てられる）
+
+log = logging.getLogger("sanmei.metrics")
+
+
+def enable(on: bool = True):
+    global _enabled
+    _enabled = on
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+class _Attached:
+    """thread-local に置く目印。thread が終わって捨てられたら、その thread の追記先を外す。"""
+    __slots__ = ("ident", "entries")
+
+    def __init__(self, ident: int, entries: list):
+        self.ident, self.entries = ident, entries
+
+    def __del__(self):
+        if self.entries is not None:
+            _detach(self.ident, self.entries)
+
+
+def _detach(ident: int, entries: list | None = None):
+    with _lock:
+        if entries is None or _traces.get(ident) is entries:
+            _traces.pop(ident, None)
+
+
+def trace(entries: list | None, ident: int | None = None):
+    """thread（既定は呼び出し元）の stage / count を entries にも追記する。None で解除。"""
+    own = ident is None or ident == threading.get_ident()
+    ident = threading.get_ident() if ident is None else ident
+    if own:
+        prev = getattr(_local, "attached", None)
+        if prev is not None:
+            prev.entries = None            # 付け替え・解除は目印の後始末に任せない
+            del _local.attached
+    if entries is None:
+        _detach(ident)
+        return
+    with _lock:
+        _traces[ident] = entries
+    if own:
+        _local.attached = _Attached(ident, entries)
+
+
+def reset():
+    with _lock:
+        _hist.clear()
+        _counters.clear()
+
+
+# ─────────────────────────────────────────────
+#  記録
+# ─────────────────────────────────────────────
+def _record(name: str, seconds: float):
+    if _enabled:
+        observe(name, seconds)
+    if _traces:
+        _append(("stage", name, seconds))
+
+
+def _append(entry: tuple):
+    t = _traces.get(threading.get_ident())
+    if t is not None and len(t) < MAX_TRACE:
+        t.append(entry)
+
+
+def observe(name: str, seconds: float):
+    with _lock:
+        h = _hist.get(name)
+        if h is None:
+            h = _hist[name] = [0] * (len(BUCKETS) + 1) + [0.0]
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        h[i] += 1
+        h[-1] += seconds
+
+
+class _Stage:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullStage()
+
+
+def stage(name: str):
+    return _Stage(name) if _enabled or _traces else _NULL
+
+
+def timed(name: str):
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not (_enabled or _traces):
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(name, time.perf_counter() - t0)
+        return wrapper
+    return deco
+
+
+def count(name: str, n: int = 1, **labels):
+    if _traces:
+        _append(("count", name, n, labels))
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+def register_collector(fn):
+    """fn() -> {名前: 数値} を出力のたびに呼び、ゲージとして出す（描画キューの状態等）。"""
+    _collectors.append(fn)
+
+
+def _collect() -> dict:
+    out = {}
+    for fn in _collectors:
+        try:
+            out.update(fn())
+        except Exception:
+            log.exception("collector の呼び出しに失敗しました")
+    return out
+
+
+# ─────────────────────────────────────────────
+#  出力
+# ─────────────────────────────────────────────
+def _labels(pairs) -> str:
+    return ",".join(f'{k}="{str(v)}"' for k, v in pairs)
+
+
+def render_prometheus() -> str:
+    with _lock:
+        hist = {k: list(v) for k, v in _hist.items()}
+        counters = dict(_counters)
+    lines = [f"# HELP {PREFIX}_stage_seconds 処理段階ごとの所要時間",
+             f"# TYPE {PREFIX}_stage_seconds histogram"]
+    for name, h in sorted(hist.items()):
+        cum = 0
+        for le, c in zip(BUCKETS + ("+Inf",), h[:-1]):
+            cum += c
+            lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cum}')
+        lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{name}"}} {h[-1]:.6f}')
+        lines.append(f'{PREFIX}_stage_seconds_count{{stage="{name}"}} {cum}')
+    for cname in sorted({k[0] for k in counters}):
+        lines.append(f"# TYPE {PREFIX}_{cname}_total counter")
+        for (n, labels), v in sorted(counters.items()):
+            if n == cname:
+                lines.append(f"{PREFIX}_{cname}_total{{{_labels(labels)}}} {v}")
+    for gname, v in sorted(_collect().items()):
+        lines.append(f"# TYPE {PREFIX}_{gname} gauge")
+        lines.append(f"{PREFIX}_{gname} {float(v)}")
+    return "\n".join(lines) + "\n"
+
+
+def _quantile(h: list, q: float) -> float | None:
+    """バケットの上端で近似した分位点（+Inf に入った場合は None）。"""
+    total = sum(h[:-1])
+    if not total:
+        return None
+    cum = 0
+    for le, c in zip(BUCKETS, h):
+        cum += c
+        if cum >= q * total:
+            return le
+    return None
+
+
+def snapshot() -> dict:
+    with _lock:
+        hist = {k: list(v) for k, v in _hist.items()}
+        counters = dict(_counters)
+    return {
+        "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "stages": {k: {"count": sum(h[:-1]), "sum_s": round(h[-1], 6),
+                       "p50_le_s": _quantile(h, 0.50), "p95_le_s": _quantile(h, 0.95)}
+                   for k, h in sorted(hist.items())},
+        "counters": {f"{n}{{{_labels(l)}}}" if l else n: v for (n, l), v in sorted(counters.items())},
+        "gauges": _collect(),
+    }
+
+
+def serve(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """GET /metrics に Prometheus テキストを返すサーバーを daemon スレッドで起動する。"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="sanmei-metrics", daemon=True).start()
+    return server
+
+
+def log_periodically(interval: float, logger: logging.Logger = log) -> threading.Thread:
+    """interval 秒ごとに snapshot() を 1 行の JSON でログに出す daemon スレッドを起動する。"""
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            logger.info("%s", json.dumps(snapshot(), ensure_ascii=False))
+
+    t = threading.Thread(target=loop, name="sanmei-metrics-log", daemon=True)
+    t.start()
+    return t
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+組織図（上司 → 部下）の全エッジ分析
+
+組織相性 PDF と同じ観点（A = 上司, B = 部下）で全エッジを評価する:
+  relation     … 中心星の五行関係（batch.RELATIONS の添字, _power_balance の方向）
+  right_same   … 右手の星が同じか（_combat_style）
+  feet_same    … 足の星が同じか（_crisis_management）
+  tenchu_same  … 天中殺グループが同じか（_tenchu_affinity）
+  adverse      … 部下が上司を相克する（指示が通りにくい）エッジ
+
+名簿の manager 列を部下の行番号順にチャンク単位で 1 回だけ走査する。
+各チャンクは整数配列のみで処理し、集計は上司・部署ごとの固定長配列に足し込むため、
+メモリはチャンク長 + 名簿長に比例し、エッジ数には依存しない。
+"""
+
+import numpy as np
+
+from sanmei.batch import RELATIONS, relation_codes
+
+REL_ADVERSE = RELATIONS.index("B が A を相克")   # 部下（B）が上司（A）を相克
+
+CHUNK = 65536
+
+_COUNTERS = ("edges", "adverse", "right_same", "feet_same", "tenchu_same")
+
+
+def iter_edges(manager, codes: dict, chunk: int = CHUNK):
+    """上司→部下エッジをチャンクごとに評価して yield する。
+
+    yield する dict:
+      manager, report : 上司 / 部下の行番号（int32）
+      relation        : 五行関係（uint8）
+      right_same, feet_same, tenchu_same, adverse : bool
+    """
+    manager = np.asarray(manager)
+    elem = codes["center"]
+    for lo in range(0, len(manager), chunk):
+        mgr = manager[lo:lo + chunk]
+        rep = np.flatnonzero(mgr >= 0).astype(np.int32)
+        mgr = mgr[rep]
+        rep += lo
+        rel = relation_codes(elem[mgr] // 2, elem[rep] // 2).astype(np.uint8)
+        yield {
+            "manager":     mgr,
+            "report":      rep,
+            "relation":    rel,
+            "right_same":  codes["right"][mgr] == codes["right"][rep],
+            "feet_same":   codes["feet"][mgr] == codes["feet"][rep],
+            "tenchu_same": codes["tenchu"][mgr] == codes["tenchu"][rep],
+            "adverse":     rel == REL_ADVERSE,
+        }
+
+
+def analyze(manager, dept, n_dept: int, codes: dict, chunk: int = CHUNK, on_chunk=None) -> dict:
+    """全エッジを 1 パスで評価し、上司別・部署別（部下の所属）に集計する。
+    on_chunk が指定されれば各チャンクの評価結果をそのまま渡す（逐次出力用）。
+
+    Returns
+    -------
+    dict with keys:
+      by_manager : {edges, adverse, right_same, feet_same, tenchu_same: int64 [N],
+                    relation: int64 [N, 5]}
+      by_dept    : 同じ構成で長さ n_dept
+      total      : 全体の件数 dict（relation は長さ 5 のリスト）
+    """
+    n = len(manager)
+    n_rel = len(RELATIONS)
+    dept = np.asarray(dept)
+    by_mgr  = {c: np.zeros(n, dtype=np.int64) for c in _COUNTERS}
+    by_dept = {c: np.zeros(n_dept, dtype=np.int64) for c in _COUNTERS}
+    rel_mgr  = np.zeros(n * n_rel, dtype=np.int64)
+    rel_dept = np.zeros(n_dept * n_rel, dtype=np.int64)
+
+    for e in iter_edges(manager, codes, chunk):
+        if on_chunk is not None:
+            on_chunk(e)
+        m, d = e["manager"], dept[e["report"]]
+        for c in _COUNTERS:
+            w = None if c == "edges" else e[c]
+            by_mgr[c]  += np.bincount(m, weights=w, minlength=n).astype(np.int64)
+            by_dept[c] += np.bincount(d, weights=w, minlength=n_dept).astype(np.int64)
+        rel_mgr  += np.bincount(m.astype(np.int64) * n_rel + e["relation"], minlength=n * n_rel)
+        rel_dept += np.bincount(d.astype(np.int64) * n_rel + e["relation"], minlength=n_dept * n_rel)
+
+    by_mgr["relation"]  = rel_mgr.reshape(n, n_rel)
+    by_dept["relation"] = rel_dept.reshape(n_dept, n_rel)
+    total = {c: int(by_dept[c].sum()) for c in _COUNTERS}
+    total["relation"] = by_dept["relation"].sum(axis=0).tolist()
+    return {"by_manager": by_mgr, "by_dept": by_dept, "total": total}
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+最適ペアリング（メンター×新人・営業ペア・オンコール相棒）
+
+組織相性 PDF の 4 要素を整数コードで表し、重み付きスコアを最大化する組み合わせを求める。
+  パワーバランス（_power_balance） … 中心星の五行関係 5 分類（batch.RELATIONS）
+  戦闘スタイル（_combat_style）    … 右手の星が同じ / 異なる
+  危機管理（_crisis_management）   … 足の星が同じ / 異なる
+  バイオリズム（_tenchu_affinity）  … 天中殺グループが同じ / 異なる
+
+  solve_bipartite … 2 グループ間の割り当て。scipy があればハンガリアン法
+                    （linear_sum_assignment）、なければ貪欲法 + 局所探索。
+  solve_general   … 1 グループ内のペア作り。貪欲法 + 2-swap 局所探索（時間予算付き）。
+"""
+
+import time
+
+import numpy as np
+
+from sanmei.batch import relation_codes
+
+try:
+    from scipy.optimize import linear_sum_assignment as _lsa
+    _SCIPY_AVAILABLE = True
+except ImportError:
+    _lsa = None
+    _SCIPY_AVAILABLE = False
+
+# 重み: relation は RELATIONS と同じ順の 5 要素
+PRESETS = {
+    "mentor": {
+        "label": "メンター × 新人",
+        "relation": [1.0, 3.0, 0.5, 1.5, -2.0],
+        "right_same": 0.5, "right_diff": 0.5,
+        "feet_same": 0.0,  "feet_diff": 1.0,
+        "tenchu_same": -1.0, "tenchu_diff": 2.0,
+    },
+    "sales": {
+        "label": "営業ペア",
+        "relation": [1.5, 1.0, 1.0, 0.5, 0.5],
+        "right_same": 2.0, "right_diff": 1.0,
+        "feet_same": 0.5,  "feet_diff": 1.0,
+        "tenchu_same": 0.0, "tenchu_diff": 1.0,
+    },
+    "oncall": {
+        "label": "オンコール相棒",
+        "relation": [1.0, 1.0, 1.0, 0.0, 0.0],
+        "right_same": 0.0, "right_diff": 0.5,
+        "feet_same": 0.0,  "feet_diff": 2.0,
+        "tenchu_same": -2.0, "tenchu_diff": 2.0,
+    },
+    "general": {
+        "label": "総合相性",
+        "relation": [1.5, 2.0, 1.5, 0.5, 0.0],
+        "right_same": 1.0, "right_diff": 1.0,
+        "feet_same": 0.5,  "feet_diff": 1.0,
+        "tenchu_same": 0.0, "tenchu_diff": 1.0,
+    },
+}
+
+FORBIDDEN = -1e9   # 制約違反の組み合わせのスコア
+
+
+def features(codes: dict, rows=None) -> dict:
+    """エンジン出力（batch.compute_codes）からスコア計算用の特徴量を取り出す。"""
+    sel = slice(None) if rows is None else np.asarray(rows)
+    return {
+        "elem":   (codes["center"][sel] // 2).astype(np.int8),
+        "right":  codes["right"][sel],
+        "feet":   codes["feet"][sel],
+        "tenchu": codes["tenchu"][sel],
+    }
+
+
+def score_matrix(fa: dict, fb: dict, weights: dict):
+    """A 側 × B 側のスコア行列（float32 [len(A), len(B)]）。"""
+    rel_w = np.asarray(weights["relation"], dtype=np.float32)
+    s = rel_w[relation_codes(fa["elem"][:, None], fb["elem"][None, :])]
+    for key in ("right", "feet", "tenchu"):
+        same = fa[key][:, None] == fb[key][None, :]
+        s += np.where(same, np.float32(weights[f"{key}_same"]), np.float32(weights[f"{key}_diff"]))
+    return s
+
+
+def _apply_constraints(s, dept_a, dept_b, dept_rule: str, ids_a, ids_b):
+    if ids_a is not None and ids_b is not None:
+        s[np.asarray(ids_a)[:, None] == np.asarray(ids_b)[None, :]] = FORBIDDEN   # 同一人物
+    if dept_a is None or dept_b is None:
+        return s
+    dept_a, dept_b = np.asarray(dept_a), np.asarray(dept_b)
+    if dept_rule == "same":
+        s[dept_a[:, None] != dept_b[None, :]] = FORBIDDEN
+    elif dept_rule == "different":
+        s[dept_a[:, None] == dept_b[None, :]] = FORBIDDEN
+    return s
+
+
+# ─────────────────────────────────────────────
+#  局所探索（2-swap）
+#  ペア (a,b), (c,d) を (a,d), (c,b) に組み替えて合計が増えるなら採用する。
+# ─────────────────────────────────────────────
+def _improve_bipartite(s, rows, cols, deadline: float) -> int:
+    n_swaps = 0
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for p in range(len(rows)):
+            a, b = rows[p], cols[p]
+            gain = s[a, cols] + s[rows, b] - s[a, b] - s[rows, cols]
+            q = int(np.argmax(gain))
+            if gain[q] > 1e-6:
+                cols[p], cols[q] = cols[q], cols[p]
+                n_swaps += 1
+                improved = True
+            if time.perf_counter() >= deadline:
+                break
+    return n_swaps
+
+
+def _improve_general(s, pa, pb, deadline: float) -> int:
+    n_swaps = 0
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for p in range(len(pa)):
+            a, b = pa[p], pb[p]
+            cur = s[a, b] + s[pa, pb]
+            alt1 = s[a, pa] + s[b, pb]          # (a,c)(b,d)
+            alt2 = s[a, pb] + s[b, pa]          # (a,d)(b,c)
+            g1, g2 = alt1 - cur, alt2 - cur
+            g1[p] = g2[p] = 0
+            q1, q2 = int(np.argmax(g1)), int(np.argmax(g2))
+            if max(g1[q1], g2[q2]) <= 1e-6:
+                continue
+            if g1[q1] >= g2[q2]:
+                c, d = pa[q1], pb[q1]
+                pa[p], pb[p], pa[q1], pb[q1] = a, c, b, d
+            else:
+                c, d = pa[q2], pb[q2]
+                pa[p], pb[p], pa[q2], pb[q2] = a, d, b, c
+            n_swaps += 1
+            improved = True
+            if time.perf_counter() >= deadline:
+                break
+    return n_swaps
+
+
+def _greedy(s, symmetric: bool):
+    """スコアの高い辺から順に、両端が未使用なら採用する。"""
+    n_a, n_b = s.shape
+    if symmetric:
+        iu, ju = np.triu_indices(n_a, k=1)
+        vals = s[iu, ju]
+    else:
+        iu, ju = np.divmod(np.arange(n_a * n_b), n_b)
+        vals = s.ravel()
+    ok = vals > FORBIDDEN / 2
+    iu, ju, vals = iu[ok], ju[ok], vals[ok]
+    order = np.argsort(-vals, kind="stable")
+    used_a = np.zeros(n_a, dtype=bool)
+    used_b = used_a if symmetric else np.zeros(n_b, dtype=bool)
+    n_max = n_a // 2 if symmetric else min(n_a, n_b)
+    rows, cols = [], []
+    for k in order.tolist():
+        if len(rows) == n_max:
+            break
+        i, j = int(iu[k]), int(ju[k])
+        if used_a[i] or used_b[j]:
+            continue
+        used_a[i] = True; used_b[j] = True
+        rows.append(i); cols.append(j)
+    return np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)
+
+
+def _result(pairs_a, pairs_b, scores, method: str, t0: float, **extra) -> dict:
+    keep = scores > FORBIDDEN / 2
+    pairs_a, pairs_b, scores = pairs_a[keep], pairs_b[keep], scores[keep]
+    order = np.argsort(-scores, kind="stable")
+    out = {
+        "a":         pairs_a[order],
+        "b":         pairs_b[order],
+        "scores":    scores[order],
+        "objective": float(scores.sum()),
+        "runtime_s": time.perf_counter() - t0,
+        "method":    method,
+    }
+    out.update(extra)
+    return out
+
+
+def solve_bipartite(fa: dict, fb: dict, weights: dict, capacity: int = 1,
+                    dept_a=None, dept_b=None, dept_rule: str = "",
+                    ids_a=None, ids_b=None, time_budget: float = 5.0) -> dict:
+    """A 側（メンター等）× B 側（新人等）の割り当て。A 側 1 人あたり最大 capacity 人まで。
+
+    dept_rule    : "" = 制約なし / "same" = 同じ部署のみ / "different" = 別部署のみ
+    ids_a, ids_b : 名簿の行番号。両側に同じ人がいる場合に自分自身との組を禁止する
+
+    Returns
+    -------
+    dict with keys:
+      a, b       : 採用ペアの A 側 / B 側インデックス（スコア降順）
+      scores     : 各ペアのスコア
+      objective  : スコア合計
+      runtime_s  : 所要時間（秒）
+      method     : "hungarian" / "greedy+local"
+    """
+    t0 = time.perf_counter()
+    s = _apply_constraints(score_matrix(fa, fb, weights), dept_a, dept_b, dept_rule, ids_a, ids_b)
+    capacity = max(int(capacity), 1)
+    if capacity > 1:
+        s = np.repeat(s, capacity, axis=0)   # A 側を定員分だけ複製
+    if _SCIPY_AVAILABLE:
+        rows, cols = _lsa(s, maximize=True)
+        method, n_swaps = "hungarian", 0
+    else:
+        rows, cols = _greedy(s, symmetric=False)
+        n_swaps = _improve_bipartite(s, rows, cols, t0 + time_budget)
+        method = "greedy+local"
+    return _result(rows // capacity, cols, s[rows, cols], method, t0, swaps=n_swaps)
+
+
+def solve_general(f: dict, weights: dict, dept=None, dept_rule: str = "",
+                  time_budget: float = 5.0) -> dict:
+    """1 グループ内で 2 人ずつのペアを作る（奇数なら 1 人余る）。
+    方向性のある要素（パワーバランス）は A→B / B→A の平均で対称化する。
+    戻り値は solve_bipartite と同じ形式（method = "greedy+local", swaps = 改善回数）。
+    """
+    t0 = time.perf_counter()
+    s = score_matrix(f, f, weights)
+    s = (s + s.T) / 2
+    s = _apply_constraints(s, dept, dept, dept_rule, None, None)
+    np.fill_diagonal(s, FORBIDDEN)
+    pa, pb = _greedy(s, symmetric=True)
+    n_swaps = _improve_general(s, pa, pb, t0 + time_budget)
+    return _result(pa, pb, s[pa, pb], "greedy+local", t0, swaps=n_swaps)
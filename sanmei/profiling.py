@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+運用者向け：1 セッションの再実行だけを cProfile で記録する
+
+本番で特定の操作だけが遅いとき（ある組織相性レポートの作成など）、サーバー全体を
+プロファイルせず、再デプロイもせずに、そのセッションの次の再実行 1 回分を記録する。
+
+  arm(state)                        … 次の再実行の記録を予約する（state は st.session_state）
+  begin(state, out_dir, session)    … スクリプトの先頭で呼ぶ。予約があれば記録を始める
+  end(state, context)               … スクリプトの末尾で呼ぶ。記録を止めて保存し、.json のパスを返す
+  recent(out_dir)                   … 保存済みの記録の要約（新しい順）
+
+st.rerun() / st.stop() / 例外でスクリプトが末尾まで届かなかった場合は、次の再実行の begin() で
+同じ記録を続ける（ボタン → st.rerun() → 描画、の一連を 1 件として残すため）。続けるのは
+MAX_SEGMENTS 回までで、超えたら途中までの内容を保存する。再実行の thread が終わると stage / count の
+追記は外れる（sanmei.metrics.trace）ので、セッションが戻ってこなくても他の再実行を遅くしない。
+
+保存するもの（out_dir/<日時>_<セッション ID 先頭 8 桁>.*）:
+  .prof … pstats 形式（python -m pstats / snakeviz で開ける）
+  .json … 記録した時間の合計、sanmei.metrics の stage / count（発生順と段階ごとの合計）、
+          累積時間の上位関数、context（どの画面だったか等。氏名・生年月日は入れないこと）
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import pstats
+import threading
+import time
+from pathlib import Path
+
+from sanmei import metrics
+
+STATE_KEY = "_profile"
+MAX_SEGMENTS = 5
+KEEP = 50           # out_dir に残す記録の件数（古いものから消す）
+TOP_N = 40
+
+
+def token_ok(given: str, token: str) -> bool:
+    return bool(token) and hmac.compare_digest(str(given).encode(), token.encode())
+
+
+class _Capture:
+    def __init__(self, out_dir: Path, session: str):
+        self.out_dir, self.session = Path(out_dir), session
+        self.started_at = time.time()
+        self.prof = cProfile.Profile()
+        self.trace: list = []
+        self.segments = 0
+        self.ident = None
+        self.running = False
+
+    def resume(self):
+        self.segments += 1
+        self.ident = threading.get_ident()
+        self.running = True
+        metrics.trace(self.trace)
+        self.prof.enable()
+
+    def pause(self):
+        if not self.running:
+            return
+        self.prof.disable()
+        metrics.trace(None, self.ident)
+        self.running = False
+
+    def save(self, complete: bool, context: dict | None) -> Path:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stem = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at)) + "_" + "".join(c for c in self.session if c.isalnum())[:8]
+        self.prof.dump_stats(self.out_dir / f"{stem}.prof")
+        stats = pstats.Stats(self.prof, stream=io.StringIO())
+        totals: dict = {}
+        for kind, name, v, *_ in self.trace:
+            if kind == "stage":
+                t = totals.setdefault(name, {"count": 0, "sum_s": 0.0})
+                t["count"] += 1
+                t["sum_s"] = round(t["sum_s"] + v, 6)
+        report = {
+            "captured_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "session":     stem.split("_", 1)[1],
+            "complete":    complete,
+            "segments":    self.segments,
+            "truncated":   len(self.trace) >= metrics.MAX_TRACE,
+            "profiled_s":  round(stats.total_tt, 4),
+            "context":     context or {},
+            "stage_totals": dict(sorted(totals.items(), key=lambda kv: -kv[1]["sum_s"])),
+            "events":      [{"stage": e[1], "s": round(e[2], 6)} if e[0] == "stage"
+                            else {"count": e[1], "n": e[2], **e[3]} for e in self.trace],
+            "top":         _top(stats),
+        }
+        path = self.out_dir / f"{stem}.json"
+        path.write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+        _prune(self.out_dir)
+        return path
+
+
+def _top(stats: pstats.Stats, n: int = TOP_N) -> list[dict]:
+    rows = sorted(stats.stats.items(), key=lambda kv: -kv[1][3])[:n]
+    return [{"func": f"{Path(f).name}:{line}({fn})", "ncalls": nc, "tottime_s": round(tt, 6),
+             "cumtime_s": round(ct, 6)} for (f, line, fn), (_, nc, tt, ct, _) in rows]
+
+
+def _prune(out_dir: Path):
+    for old in sorted(out_dir.glob("*.json"))[:-KEEP]:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".prof").unlink(missing_ok=True)
+
+
+# ─────────────────────────────────────────────
+#  スクリプトから呼ぶもの
+# ─────────────────────────────────────────────
+def arm(state):
+    if not isinstance(state.get(STATE_KEY), _Capture):
+        state[STATE_KEY] = "armed"
+
+
+def armed(state) -> bool:
+    return state.get(STATE_KEY) == "armed"
+
+
+def begin(state, out_dir: Path, session: str):
+    cap = state.get(STATE_KEY)
+    if cap == "armed":
+        cap = state[STATE_KEY] = _Capture(out_dir, session)
+    elif not isinstance(cap, _Capture):
+        return
+    cap.pause()                       # 前回が末尾まで届かなかった場合（st.rerun 等）
+    if cap.segments >= MAX_SEGMENTS:
+        del state[STATE_KEY]
+        cap.save(False, None)
+        return
+    cap.resume()
+
+
+def end(state, context: dict | None = None) -> Path | None:
+    cap = state.get(STATE_KEY)
+    if not isinstance(cap, _Capture):
+        return None
+    cap.pause()
+    del state[STATE_KEY]
+    return cap.save(True, context)
+
+
+def recent(out_dir: Path, n: int = 5) -> list[dict]:
+    out = []
+    for path in sorted(Path(out_dir).glob("*.json"), reverse=True)[:n]:
+        try:
+            r = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        out.append({"file": path.name, "profiled_s": r.get("profiled_s"), "complete": r.get("complete"),
+                    "stages": list(r.get("stage_totals", {}).items())[:3]})
+    return out
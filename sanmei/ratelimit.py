@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+操作ごとの回数制限（トークンバケット。セッション単位とクライアント単位）
+
+診断の実行・PDF の作成・個人レポートの一括作成・Stripe Checkout の作成は 1 回ごとにスレッドの時間や
+外部 API を使うため、同じセッション / 同じ接続元から短時間に繰り返されたら、しばらく待ってもらう。
+
+  Limiter(store, rules)
+  limiter.check(action, session, client) … (待ち秒数, 制限に掛かった単位)。0.0 なら実行してよい
+  limiter.stats()                        … checks / limited / errors
+  parse_rules(spec)                      … "diagnosis.session=5/10, pdf.client=0" → rules
+  load_rules(spec)                       … parse_rules と同じ。指定が不正なら既定値に戻してログに出す
+  is_public(ip)                          … クライアント単位の制限に使ってよい（グローバルな）アドレスか
+  open_store(spec)                       … "" / "memory" / SQLite のパス / redis://…
+
+バケットは「最大 burst 回まで続けて使え、1 分あたり per_minute 回分ずつ回復する」。1 回の操作で
+セッションとクライアントの両方のバケットから 1 つずつ使い、どちらかが足りなければどちらも減らさない。
+クライアントは呼び出し側が決めた識別子（接続元 IP のハッシュ等）。空文字ならクライアント単位は見ない。
+ロードバランサーやプロキシの後ろでは直接の接続元が全員同じアドレスになるため、信頼できる転送元の
+段数が分からない限り、プライベート / ループバックのアドレスをクライアントとして使ってはいけない。
+
+状態の置き場所（store）
+  MemoryStore  … プロセス内だけ（テスト・単独プロセス向け）
+  SqliteStore  … 同じホストの複数プロセス・同じボリュームを見るレプリカで共有（BEGIN IMMEDIATE で排他）
+  RedisStore   … ホストをまたぐレプリカで共有（redis パッケージがある場合。Lua で 1 往復）
+置き場所に障害があっても操作は止めない（許可して errors に数える）。時刻は time.time() なので、
+共有する各ホストの時計は NTP 等で揃えておくこと。
+"""
+
+import ipaddress
+import logging
+import math
+import sqlite3
+import threading
+import time
+
+# 操作 → 単位 → (burst, per_minute)
+DEFAULT_RULES = {
+    "diagnosis": {"session": (5, 10), "client": (30, 60)},
+    "pdf":       {"session": (4, 6),  "client": (20, 30)},
+    "checkout":  {"session": (3, 2),  "client": (10, 10)},
+    "bulk":      {"session": (2, 0.2), "client": (5, 0.5)},   # 個人レポートの一括作成（1 回で最大 1,000 件を描く）
+}
+
+SCOPES = ("session", "client")
+
+log = logging.getLogger("sanmei.ratelimit")
+
+
+class Throttled(RuntimeError):
+    """回数制限に掛かった（retry_after 秒待てば通る）。"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_rules(spec: str, base: dict = DEFAULT_RULES) -> dict:
+    """"操作.単位=burst/per_minute" をカンマ区切りで並べたもの（0 でその単位を制限しない）。"""
+    rules = {a: dict(r) for a, r in base.items()}
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        name, _, value = item.partition("=")
+        action, _, scope = name.strip().partition(".")
+        if action not in rules or scope not in SCOPES:
+            raise ValueError(f"回数制限の指定が不正です: {item}")
+        burst, _, per_min = value.strip().partition("/")
+        try:
+            b, r = float(burst), float(per_min or burst)
+        except ValueError:
+            raise ValueError(f"回数制限の指定が不正です: {item}") from None
+        rules[action][scope] = (b, r) if b > 0 and r > 0 else None
+    return rules
+
+
+def load_rules(spec: str) -> dict:
+    try:
+        return parse_rules(spec)
+    except ValueError:
+        log.exception("RATE_LIMITS を読めないため既定の回数制限を使います")
+        return parse_rules("")
+
+
+def is_public(ip) -> bool:
+    try:
+        return ipaddress.ip_address(ip).is_global
+    except (TypeError, ValueError):
+        return False
+
+
+def _refill(tokens, at, burst, rate, now):
+    return burst if tokens is None else min(burst, tokens + max(0.0, now - at) * rate)
+
+
+def _decide(current: list, buckets: list, now: float) -> tuple[list, list]:
+    """current[i] = (tokens, at) または None → (各バケットの待ち秒数, 書き戻す tokens)。"""
+    tokens = [_refill(*(c or (None, None)), burst, rate, now) for c, (_, burst, rate) in zip(current, buckets)]
+    waits = [0.0 if t >= 1 else (1 - t) / rate for t, (_, _, rate) in zip(tokens, buckets)]
+    if not any(waits):
+        tokens = [t - 1 for t in tokens]
+    return waits, tokens
+
+
+# ─────────────────────────────────────────────
+#  置き場所
+# ─────────────────────────────────────────────
+class MemoryStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._b: dict = {}
+
+    def take(self, buckets: list, now: float) -> list:
+        with self._lock:
+            waits, tokens = _decide([self._b.get(k) for k, _, _ in buckets], buckets, now)
+            for (k, _, _), t in zip(buckets, tokens):
+                self._b[k] = (t, now)
+            if len(self._b) > 100_000:      # 満タンに戻ったバケットは持たなくてよい
+                self._b = {k: v for k, v in self._b.items() if now - v[1] < 3600}
+        return waits
+
+
+class SqliteStore:
+    PRUNE_EVERY_S = 3600.0
+
+    def __init__(self, path):
+        self._lock = threading.Lock()       # 接続は 1 本（押下時だけ使うので十分）
+        self._con = sqlite3.connect(str(path), timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._con.execute("PRAGMA journal_mode = WAL")
+        self._con.execute("PRAGMA synchronous = NORMAL")
+        self._con.execute("CREATE TABLE IF NOT EXISTS buckets "
+                          "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, at REAL NOT NULL) WITHOUT ROWID")
+        self._pruned = 0.0
+
+    def take(self, buckets: list, now: float) -> list:
+        keys = [k for k, _, _ in buckets]
+        with self._lock:
+            con = self._con
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                rows = dict((k, (t, a)) for k, t, a in con.execute(
+                    f"SELECT key, tokens, at FROM buckets WHERE key IN ({','.join('?' * len(keys))})", keys))
+                waits, tokens = _decide([rows.get(k) for k in keys], buckets, now)
+                con.executemany("INSERT OR REPLACE INTO buckets (key, tokens, at) VALUES (?, ?, ?)",
+                                [(k, t, now) for k, t in zip(keys, tokens)])
+                if now - self._pruned > self.PRUNE_EVERY_S:
+                    con.execute("DELETE FROM buckets WHERE at < ?", (now - 86400,))
+                    self._pruned = now
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+        return waits
+
+
+_REDIS_TAKE = """
+local now, n = tonumber(ARGV[1]), #KEYS
+local tokens, waits, blocked = {}, {}, false
+for i = 1, n do
+  local burst, rate = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+  local v = redis.call('HMGET', KEYS[i], 't', 'at')
+  local t = burst
+  if v[1] then t = math.min(burst, tonumber(v[1]) + math.max(0, now - tonumber(v[2])) * rate) end
+  tokens[i], waits[i] = t, '0'
+  if t < 1 then waits[i], blocked = tostring((1 - t) / rate), true end
+end
+for i = 1, n do
+  local burst, rate = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+  local t = tokens[i]
+  if not blocked then t = t - 1 end
+  redis.call('HSET', KEYS[i], 't', tostring(t), 'at', ARGV[1])
+  redis.call('EXPIRE', KEYS[i], math.ceil(burst / rate) + 1)
+end
+return waits
+"""
+
+
+class RedisStore:
+    def __init__(self, url: str, prefix: str = "sanmei:rl:"):
+        import redis
+        self._r = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._take = self._r.register_script(_REDIS_TAKE)
+        self.prefix = prefix
+
+    def take(self, buckets: list, now: float) -> list:
+        args = [repr(now)]
+        for _, burst, rate in buckets:
+            args += [repr(float(burst)), repr(rate)]
+        waits = self._take(keys=[self.prefix + k for k, _, _ in buckets], args=args)
+        return [float(w) for w in waits]
+
+
+def open_store(spec: str):
+    if spec in ("", "memory"):
+        return MemoryStore()
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(spec)
+    return SqliteStore(spec)
+
+
+# ─────────────────────────────────────────────
+#  制限
+# ─────────────────────────────────────────────
+class Limiter:
+    def __init__(self, store, rules: dict = DEFAULT_RULES):
+        self.store, self.rules = store, rules
+        self._lock = threading.Lock()
+        self._stats = {"checks": 0, "limited": 0, "errors": 0}
+
+    def check(self, action: str, session: str, client: str = "") -> tuple[float, str]:
+        rule = self.rules[action]
+        scopes = [(s, ident) for s, ident in zip(SCOPES, (session, client)) if ident and rule.get(s)]
+        if not scopes:
+            return 0.0, ""
+        buckets = [(f"{action}:{s}:{ident}", rule[s][0], rule[s][1] / 60) for s, ident in scopes]
+        try:
+            waits = self.store.take(buckets, time.time())
+        except Exception:
+            self._bump("errors")
+            return 0.0, ""
+        self._bump("checks")
+        wait = max(waits)
+        if not wait:
+            return 0.0, ""
+        self._bump("limited")
+        return wait, scopes[waits.index(wait)][0]
+
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+    def _bump(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+
+def retry_message(wait: float) -> str:
+    return (f"⏳ 短時間に操作が続いたため、少しお待ちいただいています。"
+            f"{max(1, math.ceil(wait))} 秒ほどしてから、もう一度お試しください。")
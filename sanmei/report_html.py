@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+レポートの HTML 版（印刷向け・1 ファイルで完結）
+
+generate_personal_pdf / generate_business_pdf と同じ節立て・文言（sanmei/content.py）を、
+外部のファイルやフォントを参照しない 1 枚の HTML として返す。ブラウザでそのまま表示でき、
+印刷（「PDF として保存」を含む）では A4 1 枚に収まるよう @page と改ページ指定を入れてある。
+
+  personal(name, gototoku)          … 個人分析レポート
+  business(name_a, ga, name_b, gb)  … 組織相性診断レポート
+
+fpdf2 / PIL を使わず文字列をつなぐだけなので、PDF の数百分の一の時間で作れる
+（bench/run.py の html.* と pdf.*_cold を参照）。CSS・星ごとの解説・見出しは import 時に
+エスケープ済みの断片にしておき、呼び出しごとに組み立てるのは氏名・星の並び・相性の文言だけ。
+"""
+
+from html import escape
+
+from sanmei import content, metrics
+from sanmei.engine import get_tenchusatsu
+
+_CSS = """
+@page { size: A4; margin: 10mm; }
+* { box-sizing: border-box; }
+body { margin: 0; background: #F7FAFC; color: #2D3748;
+       font: 10.5pt/1.7 "IPAGothic", "IPAexGothic", "Hiragino Kaku Gothic ProN", "Noto Sans JP",
+             "Yu Gothic", Meiryo, sans-serif;
+       -webkit-print-color-adjust: exact; print-color-adjust: exact; }
+.page { max-width: 190mm; margin: 0 auto; padding: 6mm 0; }
+h1 { font-size: 19pt; text-align: center; color: #1A202C; margin: 0 0 3mm; }
+.people { display: flex; justify-content: center; gap: 12mm; padding: 3mm 0;
+          border-top: 1px solid #E2E8F0; border-bottom: 1px solid #E2E8F0; margin-bottom: 4mm; }
+.person { display: grid; grid-template-columns: auto auto; column-gap: 5mm; align-items: center; }
+.person .name { grid-column: 1 / 3; text-align: center; font-size: 14pt; margin-bottom: 1mm; }
+.person .tc { grid-column: 1 / 3; font-size: 9pt; color: #718096; }
+.pillar { border: 2px solid #2B6CB0; width: 15mm; text-align: center; font-size: 9pt; }
+.pillar b { display: block; border-top: 2px solid #2B6CB0; font-size: 17pt; font-weight: normal; line-height: 1.6; }
+.cross { display: grid; grid-template-columns: repeat(3, 19mm); grid-auto-rows: 10mm; }
+.cross div { display: flex; align-items: center; justify-content: center; font-size: 10.5pt; }
+.cross .s { border: 2px solid #2B6CB0; margin: -1px 0 0 -1px; }
+.body { background: #FFFFFF; border: 4px double #2B6CB0; padding: 3mm 5mm; }
+h2 { font-size: 12.5pt; color: #2B6CB0; margin: 3mm 0 1mm; }
+h2::before { content: "■ "; }
+.star { margin: 0 0 2.5mm; break-inside: avoid; }
+.star .label { margin: 0; }
+.star .label b { color: #DC3232; font-size: 11pt; font-weight: normal; margin-left: 0.5em; }
+.star p { margin: 0; }
+.star .how { color: #1A202C; text-decoration: underline; }
+.body > p { margin: 0 0 1.5mm; }
+.summary { margin-top: 3mm; }
+@media print { body { background: #FFFFFF; } .page { padding: 0; } }
+"""
+
+_HEAD = ('<!DOCTYPE html><html lang="ja"><head><meta charset="utf-8">'
+         '<meta name="viewport" content="width=device-width, initial-scale=1">'
+         '<title>{title}</title><style>' + " ".join(_CSS.split()) + '</style></head>'
+         '<body><div class="page"><h1>{title}</h1>')
+_TAIL = '</div></body></html>'
+
+# 五徳の十字（上段: 頭上、中段: 左手・中央・右手、下段: 足元）
+_CROSS = (None, "head", None, "left", "center", "right", None, "feet", None)
+
+
+def _star_blocks(data: dict, how: str) -> dict:
+    """星 → 「性質」「活かし方 / 攻略法」の HTML 断片（エスケープ済み）。"""
+    return {star: (f'<b>{escape(star)}</b></p><p>性質：{escape(d["desc"])}</p>'
+                   f'<p class="how">{how}：{escape(d["strategy"])}</p></div>')
+            for star, d in data.items()}
+
+
+_PERSONAL_STARS = _star_blocks(content.STAR_DATA_PERSONAL, "活かし方")
+_BUSINESS_STARS = _star_blocks(content.STAR_DATA_BUSINESS, "攻略法")
+_PERSONAL_LABELS = [(f'<div class="star"><p class="label">【{escape(label)}】', pos)
+                    for label, pos in content.PERSONAL_POSITIONS]
+_BUSINESS_LABELS = [(f'<div class="star"><p class="label">【{escape(label)}】', pos)
+                    for label, pos in content.BUSINESS_POSITIONS]
+
+_PERSONAL_HEAD = _HEAD.replace("{title}", escape(content.PERSONAL_TITLE))   # CSS の {} があるので format は使わない
+_BUSINESS_HEAD = _HEAD.replace("{title}", escape(content.BUSINESS_TITLE))
+_PERSONAL_TENCHU_H2 = f"<h2>{escape(content.PERSONAL_TENCHU_HEADING)}</h2>"
+
+
+def _star(blocks: dict, star: str) -> str:
+    return blocks.get(star) or f'<b>{escape(star)}</b></p><p>性質：</p></div>'   # 解説のない星
+
+
+def _person(name: str, g: dict, tc: str) -> str:
+    d1, d2 = (escape(c) for c in g["day_pillar"][:2])
+    cells = "".join(f'<div class="s">{escape(g[pos])}</div>' if pos else "<div></div>" for pos in _CROSS)
+    return (f'<div class="person"><div class="name">{name} 様</div>'
+            f'<div class="pillar">日柱<b>{d1}</b><b>{d2}</b></div>'
+            f'<div class="cross">{cells}</div><div class="tc">天中殺: {escape(tc)}</div></div>')
+
+
+@metrics.timed("html_personal")
+def personal(name: str, gototoku: dict) -> str:
+    tc = get_tenchusatsu(gototoku["day_pillar"])
+    n = escape(name)
+    parts = [_PERSONAL_HEAD, '<div class="people">', _person(n, gototoku, tc), '</div><div class="body">',
+             f"<h2>{escape(content.PERSONAL_HEADING.format(name=name))}</h2>"]
+    for label, pos in _PERSONAL_LABELS:
+        parts += (label, _star(_PERSONAL_STARS, gototoku[pos]))
+    parts += (_PERSONAL_TENCHU_H2, f"<p>{escape(content.PERSONAL_TENCHU.format(tc=tc))}</p>", "</div>",
+              f'<p class="summary">{escape(content.PERSONAL_SUMMARY.format(name=name))}</p>', _TAIL)
+    return "".join(parts)
+
+
+@metrics.timed("html_business")
+def business(name_a: str, ga: dict, name_b: str, gb: dict) -> str:
+    tca, tcb = get_tenchusatsu(ga["day_pillar"]), get_tenchusatsu(gb["day_pillar"])
+    parts = [_BUSINESS_HEAD, '<div class="people">', _person(escape(name_a), ga, tca),
+             _person(escape(name_b), gb, tcb), '</div><div class="body">',
+             f"<h2>{escape(content.BUSINESS_HEADING.format(name=name_b))}</h2>"]
+    for label, pos in _BUSINESS_LABELS:
+        parts += (label, _star(_BUSINESS_STARS, gb[pos]))
+    for title, text in content.business_sections(ga, gb, tca, tcb, name_a, name_b):
+        parts += (f"<h2>{escape(title)}</h2>", f"<p>{escape(text)}</p>")
+    parts += ("</div>", _TAIL)
+    return "".join(parts)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+組織名簿（ロスター）の読み込みと内容ハッシュ
+
+名簿は列指向の dict で扱う:
+  keys        : list[str]            社員キー（未指定なら行番号）
+  names       : list[str]            氏名
+  birth       : ndarray[datetime64]  生年月日
+  dept        : ndarray[int32]       部署コード（dept_labels の添字）
+  dept_labels : list[str]            部署名
+  manager     : ndarray[int32]       上司の行番号（なし = -1）
+  roles       : list[str]            区分（メンター / 新人 など。任意列）
+"""
+
+import csv
+import hashlib
+import io
+from datetime import date
+
+from sanmei import caltable
+
+# CSV の見出し（日本語 / 英語どちらでも可）
+_COLUMNS = {
+    "key":     ("社員ID", "社員番号", "employee_id", "id"),
+    "name":    ("氏名", "名前", "name"),
+    "birth":   ("生年月日", "birth", "birthday", "birth_date"),
+    "dept":    ("部署", "所属", "department", "dept"),
+    "manager": ("上司ID", "上司", "manager_id", "manager"),
+    "role":    ("区分", "役割", "role"),
+}
+
+NO_DEPT = "（未設定）"
+
+TEMPLATE_CSV = (
+    "社員ID,氏名,生年月日,部署,上司ID,区分\n"
+    "E001,田中 太郎,1985-06-15,営業部,,メンター\n"
+    "E002,鈴木 花子,1993-11-25,営業部,E001,新人\n"
+)
+
+
+def _parse_date(s: str) -> date:
+    return date.fromisoformat(s.strip().replace("/", "-"))
+
+
+def _find_columns(header: list[str]) -> dict:
+    norm = [h.strip().lower() for h in header]
+    found = {}
+    for col, aliases in _COLUMNS.items():
+        for a in aliases:
+            if a.lower() in norm:
+                found[col] = norm.index(a.lower())
+                break
+    return found
+
+
+def parse_roster_csv(data: bytes | str) -> tuple[dict | None, list[str]]:
+    """CSV を名簿 dict に変換する。戻り値は (名簿, エラーメッセージのリスト)。
+    生年月日列は必須。日付が読めない行・カレンダー表の範囲外の行はスキップしてエラーに記録する。
+    """
+    import numpy as np
+
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    rows = list(csv.reader(io.StringIO(data)))
+    if not rows:
+        return None, ["CSV が空です。"]
+    cols = _find_columns(rows[0])
+    if "birth" not in cols:
+        return None, ["「生年月日」列が見つかりません。"]
+
+    lo, hi = caltable.date_range()
+    keys, names, births, depts, mgr_keys, roles, errors = [], [], [], [], [], [], []
+    for line_no, row in enumerate(rows[1:], start=2):
+        if not any(c.strip() for c in row):
+            continue
+        get = lambda c: row[cols[c]].strip() if c in cols and cols[c] < len(row) else ""
+        try:
+            b = _parse_date(get("birth"))
+        except ValueError:
+            errors.append(f"{line_no}行目: 生年月日「{get('birth')}」を読み取れません。")
+            continue
+        if not lo <= b <= hi:
+            errors.append(f"{line_no}行目: 生年月日 {b} は対応範囲（{lo}〜{hi}）外です。")
+            continue
+        keys.append(get("key") or str(line_no - 1))
+        names.append(get("name"))
+        births.append(b)
+        depts.append(get("dept") or NO_DEPT)
+        mgr_keys.append(get("manager"))
+        roles.append(get("role"))
+
+    if not keys:
+        return None, errors or ["有効な行がありません。"]
+
+    dept_labels = sorted(set(depts))
+    dept_idx = {d: i for i, d in enumerate(dept_labels)}
+    row_of = {k: i for i, k in enumerate(keys)}
+    if len(row_of) != len(keys):
+        errors.append("社員IDが重複しています（後の行を優先して上司を解決します）。")
+
+    roster = {
+        "keys":        keys,
+        "names":       names,
+        "birth":       np.array(births, dtype="datetime64[D]"),
+        "dept":        np.array([dept_idx[d] for d in depts], dtype=np.int32),
+        "dept_labels": dept_labels,
+        "manager":     np.array([row_of.get(m, -1) if m else -1 for m in mgr_keys], dtype=np.int32),
+        "roles":       roles,
+    }
+    return roster, errors
+
+
+def roster_hash(roster: dict) -> str:
+    """名簿の内容ハッシュ。キャッシュキーとして使う（行順も含めて一致したときのみ同一）。"""
+    h = hashlib.blake2b(digest_size=16)
+    for field in ("keys", "names", "dept_labels", "roles"):
+        h.update("\x1f".join(roster[field]).encode("utf-8"))
+        h.update(b"\x1e")
+    for field in ("birth", "dept", "manager"):
+        h.update(roster[field].tobytes())
+    return h.hexdigest()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+ペイウォールのサンプルレポート画像（sample_980.png / sample_1480.png）の配信用派生画像
+
+PNG をそのまま st.image に渡すと、再実行のたびにファイルを読み、ハッシュを取り、
+モバイルにも 85KB 前後の PNG を送ることになる。そこで起動時（ウォームアップ）に 1 回だけ
+
+  ・幅 WIDTHS ごとの WebP と AVIF（Pillow が AVIF に対応していれば）
+  ・ぼかし表示用の極小プレースホルダー（LQIP。data URI で HTML に埋め込む）
+
+を作り、static/samples/ に内容ハッシュ付きの名前で書き出す。ページには srcset つきの
+<picture> を出すので、ブラウザが画面幅と対応形式に合う 1 枚だけを取りに来る。
+
+  build(src)      … 派生画像を用意して情報を返す（作成済みなら変換しない）
+  picture_html()  … <picture> の HTML（静的配信が有効な場合）
+
+Streamlit の /app/static は Cache-Control を付けないため、ファイル名を内容ハッシュにして
+（内容が変われば URL も変わる）更新日時を元の PNG に揃え、Last-Modified からのヒューリスティック
+キャッシュで長く再利用させる。前段に CDN / リバースプロキシがあれば /app/static/samples/ に
+immutable を付けてよい。
+"""
+
+import base64
+import hashlib
+import os
+from io import BytesIO
+from pathlib import Path
+
+SAMPLES_DIR = Path(__file__).resolve().parent.parent / "static" / "samples"
+URL_PREFIX  = "app/static/samples"
+
+WIDTHS    = (320,)              # 縮小版の幅。これとは別に元の幅のものも必ず作る（拡大はしない）
+QUALITY   = {"webp": 80, "avif": 55}
+LQIP_W    = 16
+
+
+def _encode(im, fmt: str, quality: int) -> bytes:
+    buf = BytesIO()
+    extra = {"method": 6} if fmt == "webp" else {}
+    im.save(buf, format=fmt.upper(), quality=quality, **extra)
+    return buf.getvalue()
+
+
+def _variant(raw: bytes, src: Path, label: str, fmt: str, quality: int, make, mtime: float) -> Path:
+    """派生画像のパス。名前は元画像と変換条件のハッシュなので、同じものがあれば変換しない
+    （2 つ目以降のプロセスや再起動後は PIL で変換せず、既存のファイルを使うだけになる）。"""
+    key = hashlib.blake2b(raw + f"{label}/{fmt}/{quality}".encode(), digest_size=6).hexdigest()
+    path = SAMPLES_DIR / f"{src.stem}-{label}.{key}.{fmt}"
+    if not path.exists():
+        SAMPLES_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(_encode(make(), fmt, quality))
+        os.utime(tmp, (mtime, mtime))
+        os.replace(tmp, path)
+    return path
+
+
+def build(src: Path) -> dict:
+    """派生画像を用意し、{"width", "height", "sources", "lqip", "fallback"} を返す。
+
+    sources  : [(MIME, [(URL, 幅), ...]), ...]（AVIF → WebP の順。ブラウザは先に対応したものを使う）
+    fallback : 静的配信が使えない環境で st.image に渡す WebP のパス（元の幅）
+    """
+    from PIL import Image, features
+    src = Path(src)
+    raw, mtime = src.read_bytes(), src.stat().st_mtime
+    decoded = []
+
+    def image():
+        if not decoded:
+            im = Image.open(BytesIO(raw))
+            im.load()
+            decoded.append(im)
+        return decoded[0]
+
+    with Image.open(BytesIO(raw)) as head:   # 大きさはヘッダーだけ読む
+        w0, h0 = head.size
+
+    def scaled(w):
+        return lambda: image() if w == w0 else image().resize((w, round(h0 * w / w0)), Image.LANCZOS)
+
+    widths = sorted({min(w, w0) for w in WIDTHS} | {w0})
+    sources, fallback = [], None
+    for fmt in (f for f in ("avif", "webp") if features.check(f)):
+        urls = []
+        for w in widths:
+            path = _variant(raw, src, f"{w}w", fmt, QUALITY[fmt], scaled(w), mtime)
+            urls.append((f"{URL_PREFIX}/{path.name}", w))
+            if fmt == "webp" and w == w0:
+                fallback = str(path)
+        sources.append((f"image/{fmt}", urls))
+    lqip_h = max(1, round(h0 * LQIP_W / w0))
+    lqip = _variant(raw, src, "lqip", "webp", 30,
+                    lambda: image().resize((LQIP_W, lqip_h), Image.BILINEAR), mtime)
+    return {"width": w0, "height": h0, "sources": sources, "fallback": fallback,
+            "lqip": "data:image/webp;base64," + base64.b64encode(lqip.read_bytes()).decode()}
+
+
+def picture_html(info: dict, alt: str, caption: str = "") -> str:
+    srcsets = "".join(
+        f'<source type="{mime}" srcset="{", ".join(f"{u} {w}w" for u, w in urls)}" '
+        f'sizes="(max-width: {info["width"]}px) 100vw, {info["width"]}px">'
+        for mime, urls in info["sources"])
+    largest = info["sources"][-1][1][-1][0]
+    cap = (f'<figcaption style="font-size:0.8rem;color:#6b7280;text-align:center;margin-top:4px;">'
+           f'{caption}</figcaption>') if caption else ""
+    return (
+        f'<figure style="margin:0 0 12px;">'
+        f'<picture>{srcsets}'
+        f'<img src="{largest}" alt="{alt}" width="{info["width"]}" height="{info["height"]}" '
+        f'loading="lazy" decoding="async" '
+        f'style="max-width:100%;height:auto;background:url({info["lqip"]}) center/cover no-repeat;">'
+        f'</picture>{cap}</figure>'
+    )
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+名簿の転置インデックス（ビットマップ）と条件検索
+
+エンジン出力の各値ごとに「該当メンバーのビット列」（np.packbits, 1 人 1 ビット）を作っておき、
+検索条件は AND / OR / NOT のビット演算で合成する。10 万人でも 1 本 12.5KB なので、
+条件の評価は名簿を走査せずにマイクロ秒〜ミリ秒で終わる。
+
+索引の語（field, value）:
+  head / left / center / right / feet … 各位置の星コード（STAR_NAMES の添字）
+  kanshi  … 日柱の干支番号（0〜59）
+  tenchu  … 天中殺グループ（_TENCHU_GROUPS の添字）
+  dept    … 部署コード（dept_labels の添字）
+
+検索式（parse）:
+  中央:龍高星 AND 足:車騎星
+  天中殺:午未 部署:営業部            … 空白区切りは AND
+  日柱:丁未 OR (星:玉堂 NOT 部署:開発部)
+  「星:」はいずれかの位置にその星を持つメンバー。星名の「星」、天中殺名の「天中殺」は省略可。
+"""
+
+import re
+
+import numpy as np
+
+from sanmei.batch import POSITIONS
+from sanmei.engine import BRANCHES, POSITION_LABELS, STAR_NAMES, STEMS, _TENCHU_GROUPS
+
+KANSHI_NAMES = [STEMS[k % 10] + BRANCHES[k % 12] for k in range(60)]
+
+# 検索式の項目名 → 索引の field
+FIELD_ALIASES = {
+    **{POSITION_LABELS[p]: p for p in POSITIONS}, **{p: p for p in POSITIONS},
+    "中心星": "center", "星": "star", "star": "star",
+    "日柱": "kanshi", "day": "kanshi",
+    "天中殺": "tenchu", "tenchu": "tenchu",
+    "部署": "dept", "dept": "dept",
+}
+
+_FIELD_JA = {**POSITION_LABELS, "star": "星", "kanshi": "日柱", "tenchu": "天中殺", "dept": "部署"}
+
+_POP = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+_TOKEN = re.compile(r"\s*(\(|\)|（|）|[^\s()（）]+)")
+
+
+# ─────────────────────────────────────────────
+#  インデックス構築
+# ─────────────────────────────────────────────
+def build_index(codes: dict, dept, dept_labels: list[str]) -> dict:
+    """エンジン出力と部署コードからビットマップ索引を作る。
+
+    Returns
+    -------
+    dict with keys:
+      n            : メンバー数
+      all          : 全員のビットマップ（NOT の補集合用）
+      bitmaps      : {(field, value): packbits 済み uint8 配列}（該当者のいない値は持たない）
+      dept_labels  : 部署名
+    """
+    dept = np.asarray(dept)
+    n = len(dept)
+    columns = {p: codes[p] for p in POSITIONS}
+    columns.update(kanshi=codes["kanshi"], tenchu=codes["tenchu"], dept=dept)
+    bitmaps = {}
+    for field, col in columns.items():
+        for v in np.unique(col).tolist():
+            bitmaps[(field, v)] = np.packbits(col == v)
+    return {"n": n, "all": np.packbits(np.ones(n, dtype=bool)), "bitmaps": bitmaps,
+            "dept_labels": list(dept_labels)}
+
+
+def _resolve(field: str, raw: str, dept_labels: list[str]) -> int:
+    if field in POSITIONS or field == "star":
+        name = raw if raw.endswith("星") else raw + "星"
+        if name in STAR_NAMES:
+            return STAR_NAMES.index(name)
+    elif field == "kanshi":
+        if raw in KANSHI_NAMES:
+            return KANSHI_NAMES.index(raw)
+    elif field == "tenchu":
+        name = raw.removesuffix("天中殺")
+        if name in _TENCHU_GROUPS:
+            return _TENCHU_GROUPS.index(name)
+    elif field == "dept":
+        if raw in dept_labels:
+            return dept_labels.index(raw)
+    raise ValueError(f"「{raw}」は{_FIELD_JA[field]}の値として認識できません")
+
+
+# ─────────────────────────────────────────────
+#  検索式
+# ─────────────────────────────────────────────
+def parse(text: str) -> tuple:
+    """検索式を木（("and"|"or", 左, 右) / ("not", 子) / ("term", field, 値の文字列)）に変換する。"""
+    tokens = [t.replace("（", "(").replace("）", ")") for t in _TOKEN.findall(text)]
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def expr_or():
+        node = expr_and()
+        while peek() is not None and peek().upper() == "OR":
+            take()
+            node = ("or", node, expr_and())
+        return node
+
+    def expr_and():
+        node = expr_not()
+        while peek() is not None and peek() != ")" and peek().upper() != "OR":
+            if peek().upper() == "AND":
+                take()
+            node = ("and", node, expr_not())
+        return node
+
+    def expr_not():
+        if peek() is not None and peek().upper() == "NOT":
+            take()
+            return ("not", expr_not())
+        return atom()
+
+    def atom():
+        tok = peek()
+        if tok is None:
+            raise ValueError("検索式が途中で終わっています")
+        take()
+        if tok == "(":
+            node = expr_or()
+            if peek() != ")":
+                raise ValueError("括弧が閉じていません")
+            take()
+            return node
+        m = re.fullmatch(r"([^:：=＝]+)[:：=＝](.+)", tok)
+        if m is None or m.group(1) not in FIELD_ALIASES:
+            raise ValueError(f"「{tok}」は「項目:値」の形式で指定してください（例: 中央:龍高星）")
+        return ("term", FIELD_ALIASES[m.group(1)], m.group(2))
+
+    if not tokens:
+        raise ValueError("検索式が空です")
+    tree = expr_or()
+    if pos != len(tokens):
+        raise ValueError(f"「{tokens[pos]}」の位置で検索式を解釈できません")
+    return tree
+
+
+def evaluate(index: dict, tree: tuple):
+    """検索木をビット演算で評価し、該当メンバーのビットマップを返す。"""
+    op = tree[0]
+    if op == "and":
+        return evaluate(index, tree[1]) & evaluate(index, tree[2])
+    if op == "or":
+        return evaluate(index, tree[1]) | evaluate(index, tree[2])
+    if op == "not":
+        return index["all"] & ~evaluate(index, tree[1])
+    _, field, raw = tree
+    v = _resolve(field, raw, index["dept_labels"])
+    empty = np.zeros_like(index["all"])
+    if field == "star":
+        out = empty
+        for p in POSITIONS:
+            out = out | index["bitmaps"].get((p, v), empty)
+        return out
+    return index["bitmaps"].get((field, v), empty)
+
+
+def query(index: dict, text: str):
+    return evaluate(index, parse(text))
+
+
+def count(bitmap) -> int:
+    return int(_POP[bitmap].sum())
+
+
+def rows(bitmap, n: int, limit: int | None = None):
+    """ビットマップ → 該当メンバーの行番号（昇順, 先頭 limit 件）。"""
+    idx = np.flatnonzero(np.unpackbits(bitmap, count=n))
+    return idx if limit is None else idx[:limit]
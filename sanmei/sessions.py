@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+セッションごとのメモリ使用量の集計と、操作のないセッションの重いデータの退避
+
+  Registry(budget_bytes, idle_s, spill_dir, alive)
+  reg.track(sid, state, keys, heavy) … 再実行の冒頭で呼ぶ。退避済みなら読み戻し、最終操作時刻と使用量を更新する
+  reg.stats()                        … active / bytes_total / bytes_avg / bytes_max / spilled / evictions など
+  size_of(obj)                       … おおよその常駐バイト数（ndarray は nbytes、DataFrame は memory_usage）
+
+使用量は keys の値ごとに数え、前回と同じオブジェクトなら数え直さない（再実行ごとの負担は数 µs）。
+全セッションの合計が budget_bytes を超えたら、idle_s 秒以上操作のないセッションを古い順に選び、
+heavy の値を spill_dir/<pid>-<セッション ID>.pkl へ書き出して None に置き換える（合計が予算の 8 割に
+下がるまで）。書き出しは別スレッドで行い、操作中のセッションの再実行は待たせない。
+戻ってきたセッションは次の track() で読み戻す。alive(sid) が偽になったセッション（Streamlit が破棄した
+もの）は SWEEP_S 秒ごとの見回りで集計から外し、退避ファイルも消す。
+
+state には st.session_state の実体（get_script_run_ctx().session_state）を渡す。Streamlit はこれを
+再実行ごとに作り直すため、集計の対象はその中の SessionState（_state。セッションの間ずっと同じもの）にする。
+SessionState への書き込みはスクリプトの外からでも次の再実行に反映される。退避は操作のないセッション
+だけが対象で、track() と同じロックの下で行うので、スクリプトの実行と重ならない。
+"""
+
+import os
+import pickle
+import sys
+import threading
+import time
+from pathlib import Path
+
+SWEEP_S = 60.0          # 終了したセッションを集計から外す間隔
+EVICT_EVERY_S = 5.0     # 予算超過が続いても退避を試みるのはこの間隔まで（退避できるものが無い場合）
+
+
+def size_of(obj, _seen: set | None = None) -> int:
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return sys.getsizeof(obj)
+    if hasattr(obj, "memory_usage") and hasattr(obj, "columns"):       # pandas.DataFrame
+        return int(obj.memory_usage(deep=True).sum())
+    nbytes = getattr(obj, "nbytes", None)                               # numpy.ndarray
+    if isinstance(nbytes, int):
+        return nbytes + 112
+    n = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        n += sum(size_of(k, seen) + size_of(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        n += sum(size_of(x, seen) for x in obj)
+    elif hasattr(obj, "__dict__"):
+        n += size_of(vars(obj), seen)
+    return n
+
+
+class _Entry:
+    __slots__ = ("state", "lock", "last_seen", "sizes", "bytes", "spilled")
+
+    def __init__(self, state):
+        self.state = state
+        self.lock = threading.Lock()
+        self.last_seen = time.monotonic()
+        self.sizes: dict = {}          # キー → (id(値), バイト数)
+        self.bytes = 0
+        self.spilled: Path | None = None
+
+
+class Registry:
+    def __init__(self, budget_bytes: int, idle_s: float, spill_dir, alive=lambda sid: True):
+        self.budget, self.idle_s = budget_bytes, idle_s
+        self.spill_dir = Path(spill_dir)
+        self.alive = alive
+        self._lock = threading.Lock()
+        self._entries: dict[str, _Entry] = {}
+        self._evicting = False
+        self._evict_at = 0.0
+        self._swept = time.monotonic()
+        self._counts = {"evictions": 0, "rehydrations": 0, "spill_errors": 0}
+        self._clean_stale_spills()
+
+    # ─── 再実行の冒頭 ───
+    def track(self, sid: str, state, keys, heavy):
+        state = getattr(state, "_state", state)      # SafeSessionState → SessionState
+        with self._lock:
+            e = self._entries.get(sid)
+            if e is None or e.state is not state:
+                e = self._entries[sid] = _Entry(state)
+        with e.lock:
+            e.last_seen = time.monotonic()
+            if e.spilled is not None:
+                self._rehydrate(e, state)
+            total = 0
+            for k in keys:
+                v = state[k] if k in state else None
+                prev = e.sizes.get(k)
+                if prev is None or prev[0] != id(v):
+                    prev = e.sizes[k] = (id(v), size_of(v))
+                total += prev[1]
+            e.bytes = total
+        now = time.monotonic()
+        if now - self._swept > SWEEP_S:
+            self._sweep()
+        if self.budget and not self._evicting and now >= self._evict_at and self._total() > self.budget:
+            self._evicting, self._evict_at = True, now + EVICT_EVERY_S
+            threading.Thread(target=self._evict, args=(tuple(heavy),),
+                             name="sanmei-session-evict", daemon=True).start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            live = list(self._entries.values())
+        sizes = [e.bytes for e in live]
+        return {
+            "active":       len(live),
+            "bytes_total":  sum(sizes),
+            "bytes_avg":    sum(sizes) / len(sizes) if sizes else 0,
+            "bytes_max":    max(sizes, default=0),
+            "spilled":      sum(e.spilled is not None for e in live),
+            "budget_bytes": self.budget,
+            **self._counts,
+        }
+
+    # ─── 内部 ───
+    def _total(self) -> int:
+        with self._lock:
+            return sum(e.bytes for e in self._entries.values())
+
+    def _sweep(self):
+        self._swept = time.monotonic()
+        with self._lock:
+            gone = [sid for sid in self._entries if not self.alive(sid)]
+            dropped = [self._entries.pop(sid) for sid in gone]
+        for e in dropped:
+            if e.spilled is not None:
+                e.spilled.unlink(missing_ok=True)
+
+    def _rehydrate(self, e: _Entry, state):
+        try:
+            with open(e.spilled, "rb") as f:
+                values = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self._counts["spill_errors"] += 1    # 読めなければ空のまま（名簿の読み込みからやり直し）
+            values = {}
+        for k, v in values.items():
+            state[k] = v
+        e.spilled.unlink(missing_ok=True)
+        e.spilled = None
+        self._counts["rehydrations"] += 1
+
+    def _evict(self, heavy: tuple):
+        try:
+            self._sweep()
+            now = time.monotonic()
+            with self._lock:
+                idle = sorted((e for e in self._entries.values()
+                               if e.spilled is None and e.bytes and now - e.last_seen >= self.idle_s),
+                              key=lambda e: e.last_seen)
+                sids = {id(e): sid for sid, e in self._entries.items()}
+            target = self.budget * 0.8
+            for e in idle:
+                if self._total() <= target:
+                    break
+                self._spill(e, sids[id(e)], heavy)
+        finally:
+            self._evicting = False
+
+    def _spill(self, e: _Entry, sid: str, heavy: tuple):
+        state = e.state
+        with e.lock:
+            if time.monotonic() - e.last_seen < self.idle_s:    # 書き出し前に戻ってきた
+                return
+            values = {k: state[k] for k in heavy if k in state and state[k] is not None}
+            if not values:
+                return
+            path = self.spill_dir / f"{os.getpid()}-{''.join(c for c in sid if c.isalnum())}.pkl"
+            try:
+                self.spill_dir.mkdir(parents=True, exist_ok=True)
+                with open(path, "wb") as f:
+                    pickle.dump(values, f, protocol=pickle.HIGHEST_PROTOCOL)
+            except (OSError, pickle.PicklingError):
+                path.unlink(missing_ok=True)
+                self._counts["spill_errors"] += 1
+                return
+            for k in values:
+                state[k] = None
+            e.spilled = path
+            for k in values:
+                e.sizes.pop(k, None)
+            e.bytes -= sum(size_of(v) for v in values.values())
+            e.bytes = max(e.bytes, 0)
+            self._counts["evictions"] += 1
+
+    def _clean_stale_spills(self, max_age_s: float = 86400):
+        """前のプロセスが残した退避ファイル（セッションはもう無い）を消す。"""
+        if not self.spill_dir.is_dir():
+            return
+        cutoff = time.time() - max_age_s
+        for p in self.spill_dir.glob("*.pkl"):
+            try:
+                if p.name.startswith(f"{os.getpid()}-") or p.stat().st_mtime < cutoff:
+                    p.unlink()
+            except OSError:
+                pass
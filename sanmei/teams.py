@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+k 名チームの相性スコアと、候補者プールからの上位チーム探索
+
+チームスコア（各要素は 0〜1 に正規化し、重みを掛けて合計）:
+  coverage … 中心星の五行の網羅度（異なる五行の数 / min(5, k)）
+  right    … 右手の星の多様性（異なる星の数 / k）
+  feet     … 足の星の多様性（異なる星の数 / k）
+  tenchu   … 天中殺グループの重なり（同グループの組の数 / kC2）→ 減点
+
+スコアは (五行, 右手, 足, 天中殺) の「クラス」だけで決まるため、同じクラスの候補者は
+入れ替えても同点になる。探索は候補者ではなくクラス（と人数）の組み合わせに対して行い、
+上界（残り枠がすべて新しい五行・新しい星で、天中殺は最小限の重なりで埋まった場合）が
+現在の k 位以下の枝を刈り込む分枝限定法。時間予算に達したらその時点の上位を返す。
+"""
+
+import heapq
+import math
+import time
+
+import numpy as np
+
+DEFAULT_WEIGHTS = {"coverage": 4.0, "right": 2.0, "feet": 2.0, "tenchu": 3.0}
+
+TEAM_SIZE_MIN, TEAM_SIZE_MAX = 3, 8
+
+
+def _components(elems, rights, feets, tenchus) -> dict:
+    k = len(elems)
+    tc = np.bincount(np.asarray(tenchus, dtype=np.intp), minlength=6)
+    return {
+        "coverage": len(set(elems)) / min(5, k),
+        "right":    len(set(rights)) / k,
+        "feet":     len(set(feets)) / k,
+        "tenchu":   float((tc * (tc - 1) // 2).sum()) / math.comb(k, 2),
+    }
+
+
+def _weighted(c: dict, weights: dict) -> float:
+    return (weights["coverage"] * c["coverage"] + weights["right"] * c["right"]
+            + weights["feet"] * c["feet"] - weights["tenchu"] * c["tenchu"])
+
+
+def team_score(codes: dict, rows, weights: dict = DEFAULT_WEIGHTS) -> dict:
+    """指定メンバー（名簿の行番号）のチームスコア。{"score": 合計, 各要素: 0〜1}"""
+    rows = np.asarray(rows, dtype=np.intp)
+    if len(rows) < 2:
+        raise ValueError("チームは 2 名以上で指定してください")
+    c = _components((codes["center"][rows] // 2).tolist(), codes["right"][rows].tolist(),
+                    codes["feet"][rows].tolist(), codes["tenchu"][rows].tolist())
+    return {"score": _weighted(c, weights), **c}
+
+
+def search_teams(codes: dict, pool, k: int, top: int = 5,
+                 weights: dict = DEFAULT_WEIGHTS, time_budget: float = 2.0) -> dict:
+    """pool（名簿の行番号）から k 名チームの上位 top 件を探す。
+
+    Returns
+    -------
+    dict with keys:
+      teams        : 各チームのメンバー行番号（ndarray のリスト、スコア降順）
+      scores       : 各チームのスコア
+      components   : 各チームの要素別スコア（dict のリスト）
+      alternatives : 同じクラス構成で入れ替え可能な別メンバー案の数
+      stats        : nodes / pruned / evaluated / classes / naive（素朴な全列挙数）/
+                     timed_out / runtime_s
+    """
+    if not TEAM_SIZE_MIN <= k <= TEAM_SIZE_MAX:
+        raise ValueError(f"チーム人数は {TEAM_SIZE_MIN}〜{TEAM_SIZE_MAX} 名で指定してください")
+    t0 = time.perf_counter()
+    deadline = t0 + time_budget
+    pool = np.asarray(pool, dtype=np.intp)
+
+    # ── クラス集計（五行, 右手, 足, 天中殺）──
+    e = (codes["center"][pool] // 2).astype(np.intp)
+    r = codes["right"][pool].astype(np.intp)
+    f = codes["feet"][pool].astype(np.intp)
+    t = codes["tenchu"][pool].astype(np.intp)
+    key = ((e * 10 + r) * 10 + f) * 6 + t
+    uniq, inverse, counts = np.unique(key, return_inverse=True, return_counts=True)
+    ce, rem = np.divmod(uniq, 600)
+    cr, rem = np.divmod(rem, 60)
+    cf, ct = np.divmod(rem, 6)
+    # 五行ごとに交互に並べ、序盤から多様なチームを作って閾値を早く上げる
+    rank = np.zeros(len(uniq), dtype=np.intp)
+    for elem in range(5):
+        idx = np.flatnonzero(ce == elem)
+        rank[idx[np.argsort(-counts[idx], kind="stable")]] = np.arange(len(idx))
+    order = np.lexsort((ce, rank))
+    ce, cr, cf, ct, counts = (a[order].tolist() for a in (ce, cr, cf, ct, counts))
+    n_cls = len(counts)
+
+    w_cov, w_r, w_f, w_t = (weights[x] for x in ("coverage", "right", "feet", "tenchu"))
+    cov_den, pairs_den = min(5, k), math.comb(k, 2)
+    cnt_e, cnt_r, cnt_f, cnt_t = [0] * 5, [0] * 10, [0] * 10, [0] * 6
+    used = [0] * n_cls
+    state = {"de": 0, "dr": 0, "df": 0, "same": 0}
+    stats = {"nodes": 0, "pruned": 0, "evaluated": 0, "timed_out": False}
+    heap: list = []   # (score, 連番, クラス列) の最小ヒープ
+    path: list = []
+
+    def bound(m: int) -> float:
+        rest = k - m
+        same = state["same"]
+        if rest:   # 残り枠を人数の少ない天中殺グループから埋めても避けられない重なり
+            fill = sorted(cnt_t)
+            for _ in range(rest):
+                same += fill[0]
+                fill[0] += 1
+                fill.sort()
+        return (w_cov * min(cov_den, state["de"] + rest) / cov_den
+                + w_r * min(k, state["dr"] + rest) / k
+                + w_f * min(k, state["df"] + rest) / k
+                - w_t * same / pairs_den)
+
+    def push(ci: int, sign: int):
+        for cnt, v, name in ((cnt_e, ce[ci], "de"), (cnt_r, cr[ci], "dr"), (cnt_f, cf[ci], "df")):
+            if sign > 0:
+                if cnt[v] == 0:
+                    state[name] += 1
+                cnt[v] += 1
+            else:
+                cnt[v] -= 1
+                if cnt[v] == 0:
+                    state[name] -= 1
+        if sign > 0:
+            state["same"] += cnt_t[ct[ci]]
+            cnt_t[ct[ci]] += 1
+        else:
+            cnt_t[ct[ci]] -= 1
+            state["same"] -= cnt_t[ct[ci]]
+        used[ci] += sign
+
+    def dfs(start: int, m: int):
+        stats["nodes"] += 1
+        if stats["timed_out"]:
+            return
+        if m == k:
+            stats["evaluated"] += 1
+            score = bound(m)   # 残り枠 0 なら上界 = 実スコア
+            item = (score, stats["evaluated"], tuple(path))
+            if len(heap) < top:
+                heapq.heappush(heap, item)
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, item)
+            return
+        threshold = heap[0][0] if len(heap) == top else -math.inf
+        for ci in range(start, n_cls):
+            if used[ci] >= counts[ci]:
+                continue
+            if (stats["nodes"] + stats["pruned"]) % 512 == 0 and time.perf_counter() > deadline:
+                stats["timed_out"] = True
+                return
+            push(ci, +1)
+            if bound(m + 1) <= threshold + 1e-12:
+                stats["pruned"] += 1
+            else:
+                path.append(ci)
+                dfs(ci, m + 1)
+                path.pop()
+                if len(heap) == top:
+                    threshold = heap[0][0]
+            push(ci, -1)
+            if stats["timed_out"]:
+                return
+
+    if len(pool) >= k:
+        dfs(0, 0)
+
+    # ── クラス構成 → 実メンバー ──
+    members_of = lambda ci: pool[np.flatnonzero(inverse == order[ci])]
+    teams, scores, comps, alts = [], [], [], []
+    for score, _, cls_path in sorted(heap, reverse=True):
+        take: dict = {}
+        for ci in cls_path:
+            take[ci] = take.get(ci, 0) + 1
+        teams.append(np.concatenate([members_of(ci)[:n] for ci, n in take.items()]))
+        scores.append(score)
+        comps.append(team_score(codes, teams[-1], weights))
+        alts.append(math.prod(math.comb(counts[ci], n) for ci, n in take.items()) - 1)
+
+    stats.update(classes=n_cls, naive=math.comb(len(pool), k), runtime_s=time.perf_counter() - t0)
+    return {"teams": teams, "scores": scores, "components": comps,
+            "alternatives": alts, "stats": stats}
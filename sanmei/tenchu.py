@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+天中殺カレンダー（名簿 × 月 の一括計算）
+
+天中殺グループ g（_TENCHU_GROUPS の添字）の 2 支は (10-2g, 11-2g)。
+  年の天中殺 … 年支（立春切り替え）がその 2 支の年
+  月の天中殺 … 月支（節入り切り替え）がその 2 支の月
+月の区切りはカレンダー表の節入り日（TERM_MONTH）を使うため、
+年・月の境界は calc_gototoku と完全に一致する。
+"""
+
+from datetime import date
+
+import numpy as np
+
+from sanmei import caltable
+from sanmei.engine import _TENCHU_GROUPS
+
+GROUP_BRANCHES = [(10 - 2 * g, 11 - 2 * g) for g in range(len(_TENCHU_GROUPS))]
+
+_month_starts = None
+
+
+def _term_offsets():
+    """カレンダー表の各「節月」の開始レコード番号（先頭レコードも月の開始とみなす）。"""
+    global _month_starts
+    if _month_starts is None:
+        table = caltable.as_array()
+        idx = np.flatnonzero(table["term"] & caltable.TERM_MONTH)
+        _month_starts = np.concatenate(([0], idx)) if idx[0] != 0 else idx
+    return _month_starts
+
+
+def month_timeline(start: date, years: int) -> dict:
+    """start を含む節月から 12*years か月分のタイムライン。
+    カレンダー表の終端を越える分は切り詰める。
+    """
+    table = caltable.as_array()
+    starts = _term_offsets()
+    p = int(np.searchsorted(starts, caltable.day_offset(start), side="right")) - 1
+    sel = starts[p:p + 12 * years]
+    first, _ = caltable.date_range()
+    return {
+        "start": np.datetime64(first, "D") + sel,
+        "yb":    table["yb"][sel],
+        "mb":    table["mb"][sel],
+    }
+
+
+def group_flags(timeline: dict):
+    """(年天中殺[6, T], 月天中殺[6, T]) の bool 行列。"""
+    pairs = np.array(GROUP_BRANCHES, dtype=np.uint8)          # [6, 2]
+    yb, mb = timeline["yb"], timeline["mb"]
+    year  = (yb[None, :] == pairs[:, :1]) | (yb[None, :] == pairs[:, 1:])
+    month = (mb[None, :] == pairs[:, :1]) | (mb[None, :] == pairs[:, 1:])
+    return year, month
+
+
+def roster_calendar(groups, dept, n_dept: int, start: date, years: int) -> dict:
+    """名簿全員の天中殺カレンダー。
+
+    Returns
+    -------
+    dict with keys:
+      start          : 各節月の開始日（datetime64[D], 長さ T）
+      year, month    : グループ別の年 / 月天中殺フラグ（bool [6, T]）
+      member         : メンバー × 月 の天中殺フラグ（年 or 月, bool [N, T]）
+      team_fraction  : 部署 × 月 の天中殺メンバー比率（float32 [n_dept, T]）
+      total_fraction : 全体の天中殺メンバー比率（float32 [T]）
+    """
+    tl = month_timeline(start, years)
+    year, month = group_flags(tl)
+    either = year | month                                       # [6, T]
+    groups = np.asarray(groups, dtype=np.intp)
+    dept = np.asarray(dept, dtype=np.intp)
+
+    n_groups = len(GROUP_BRANCHES)
+    counts = np.bincount(dept * n_groups + groups, minlength=n_dept * n_groups)
+    counts = counts.reshape(n_dept, n_groups).astype(np.float32)
+    size = counts.sum(axis=1, keepdims=True)
+    team = (counts @ either.astype(np.float32)) / np.maximum(size, 1)
+    total = counts.sum(axis=0) @ either.astype(np.float32) / max(len(groups), 1)
+
+    return {
+        "start":          tl["start"],
+        "year":           year,
+        "month":          month,
+        "member":         either[groups],
+        "team_fraction":  team,
+        "total_fraction": total,
+    }
+
+
+def periods(flags, starts) -> list[tuple]:
+    """bool 列の連続区間を [(開始日, 終了日の翌月開始日 or None), ...] で返す。"""
+    f = np.concatenate(([False], np.asarray(flags, dtype=bool), [False]))
+    edges = np.flatnonzero(f[1:] != f[:-1])
+    out = []
+    for s, e in zip(edges[::2], edges[1::2]):
+        end = starts[e].astype(object) if e < len(starts) else None
+        out.append((starts[s].astype(object), end))
+    return out
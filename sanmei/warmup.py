@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+起動時のウォームアップ（バックグラウンドスレッド）と準備完了シグナル
+
+コールドスタート直後の最初の利用者が、フォント探索・カレンダー表の読み込み・fpdf2 / PIL の
+初回ロードをまとめて負担しないよう、プロセス起動時に別スレッドで先に済ませておく。
+
+  start(tasks, ready_file) … [(名前, 関数), ...] を順に実行する（プロセスで 1 回だけ）
+  is_ready / wait          … すべてのタスクが終わったか
+  status                   … タスクごとの所要時間（秒）とエラー
+
+完了すると ready_file に status を JSON で書き出す。Streamlit の静的配信の配下に置けば
+ロードバランサや死活監視から「/app/static/health/ready.json が 200 になったら準備完了」と判定できる。
+起動時には前回のプロセスが残したファイルを消すため、準備中は 404 になる。
+"""
+
+import json
+import os
+import threading
+import time
+import traceback
+from pathlib import Path
+
+READY_FILE = Path(__file__).resolve().parent.parent / "static" / "health" / "ready.json"
+
+_lock = threading.Lock()
+_ready = threading.Event()
+_state: dict = {"started_at": None, "finished_at": None, "tasks": {}, "errors": {}}
+
+
+def _run(tasks, ready_file):
+    for name, fn in tasks:
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception:
+            _state["errors"][name] = traceback.format_exc(limit=3)
+        _state["tasks"][name] = round(time.perf_counter() - t0, 4)
+    _state["finished_at"] = time.time()
+    if ready_file is not None:
+        ready_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = ready_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps(status(), ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, ready_file)
+    _ready.set()
+
+
+def start(tasks, ready_file: Path | None = READY_FILE) -> bool:
+    """ウォームアップを開始する。2 回目以降の呼び出しは何もせず False を返す。"""
+    with _lock:
+        if _state["started_at"] is not None:
+            return False
+        _state["started_at"] = time.time()
+    if ready_file is not None:
+        ready_file.unlink(missing_ok=True)
+    threading.Thread(target=_run, args=(list(tasks), ready_file),
+                     name="sanmei-warmup", daemon=True).start()
+    return True
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def wait(timeout: float | None = None) -> bool:
+    return _ready.wait(timeout)
+
+
+def status() -> dict:
+    s = _state
+    return {
+        "ready":     _ready.is_set() or s["finished_at"] is not None,
+        "elapsed_s": round((s["finished_at"] or time.time()) - s["started_at"], 4) if s["started_at"] else None,
+        "tasks":     dict(s["tasks"]),
+        "errors":    dict(s["errors"]),
+    }
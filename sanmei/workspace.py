@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+組織ワークスペース（SQLite 永続化）
+
+名簿・エンジン出力（整数コード）・変更ログ・生成済みレポートの参照を組織単位で保存する。
+
+  orgs       … 組織（名前は UNIQUE インデックス）と現在の版
+  members    … 1 人 1 行。部署・中心星・天中殺グループにインデックスを張り、開かずに条件検索する（query_members）
+  columns    … 名簿とエンジン出力の列スナップショット（numpy 配列のバイト列 / JSON）。
+               組織を開くときはこの十数行を読むだけで、再計算も行単位の組み立ても不要
+  changelog  … incremental.update の変更ログ（版ごと）。保存のたびに、まだ無い更新を既存の履歴の続きの
+               版として追記する（同じ名前で別の名簿を保存しても、前の履歴を残したまま新しい版が増える）
+  reports    … 生成済みレポートの参照（一括作成の ZIP のファイル名等）。内容が変わった社員の分は保存時に破棄
+
+WAL モードで開くため、複数のアプリプロセスが同じファイルを同時に読める（書き込みは 1 つずつ）。
+接続は操作ごとに開閉する（Streamlit のスレッドをまたいで共有しない）。
+numpy は列スナップショットの読み書きでだけ関数内で import する（一覧表示だけなら読み込まない）。
+"""
+
+import json
+import sqlite3
+from contextlib import closing, contextmanager
+from datetime import datetime
+
+from sanmei import caltable
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS orgs (
+    id          INTEGER PRIMARY KEY,
+    name        TEXT    NOT NULL UNIQUE,
+    roster_hash TEXT    NOT NULL,
+    version     INTEGER NOT NULL,
+    n_members   INTEGER NOT NULL,
+    updated_at  TEXT    NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    org_id      INTEGER NOT NULL REFERENCES orgs(id) ON DELETE CASCADE,
+    row         INTEGER NOT NULL,
+    key         TEXT    NOT NULL,
+    name        TEXT    NOT NULL,
+    birth       TEXT    NOT NULL,
+    dept        TEXT    NOT NULL,
+    role        TEXT    NOT NULL,
+    manager_row INTEGER NOT NULL,
+    {", ".join(f"{f} INTEGER NOT NULL" for f in caltable.FIELDS)},
+    PRIMARY KEY (org_id, row)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_members_key    ON members(org_id, key);
+CREATE INDEX IF NOT EXISTS ix_members_dept   ON members(org_id, dept);
+CREATE INDEX IF NOT EXISTS ix_members_center ON members(org_id, center);
+CREATE INDEX IF NOT EXISTS ix_members_tenchu ON members(org_id, tenchu);
+CREATE TABLE IF NOT EXISTS columns (
+    org_id INTEGER NOT NULL REFERENCES orgs(id) ON DELETE CASCADE,
+    field  TEXT    NOT NULL,
+    dtype  TEXT    NOT NULL,
+    data   BLOB    NOT NULL,
+    PRIMARY KEY (org_id, field)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS changelog (
+    org_id  INTEGER NOT NULL REFERENCES orgs(id) ON DELETE CASCADE,
+    version INTEGER NOT NULL,
+    at      TEXT    NOT NULL,
+    entry   TEXT    NOT NULL,
+    PRIMARY KEY (org_id, version)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS reports (
+    org_id     INTEGER NOT NULL REFERENCES orgs(id) ON DELETE CASCADE,
+    key        TEXT    NOT NULL,
+    kind       TEXT    NOT NULL,
+    ref        TEXT    NOT NULL,
+    created_at TEXT    NOT NULL,
+    PRIMARY KEY (org_id, key, kind)
+) WITHOUT ROWID;
+"""
+
+_ARRAY_COLUMNS = ("birth", "dept", "manager")          # 名簿の ndarray 列
+_JSON_COLUMNS  = ("keys", "names", "roles", "dept_labels")
+
+_initialized: set = set()
+
+
+@contextmanager
+def _connect(path):
+    """WAL・外部キー有効の接続を開き、ブロックを 1 トランザクションとして実行する。"""
+    with closing(sqlite3.connect(str(path), timeout=10.0)) as con:
+        con.execute("PRAGMA foreign_keys = ON")
+        if str(path) not in _initialized:
+            con.execute("PRAGMA journal_mode = WAL")
+            con.executescript(_SCHEMA)
+            _initialized.add(str(path))
+        con.execute("PRAGMA synchronous = NORMAL")
+        with con:
+            yield con
+
+
+def _blob(a) -> tuple[str, bytes]:
+    import numpy as np
+    a = np.ascontiguousarray(a)
+    return a.dtype.str, a.tobytes()
+
+
+def _entry_key(e: dict) -> str:
+    """版番号を除いた変更ログの内容（保存済みの更新かどうかの判定に使う）。"""
+    return json.dumps({k: v for k, v in e.items() if k != "version"}, ensure_ascii=False, sort_keys=True)
+
+
+def save(path, org: str, roster: dict, codes: dict, roster_hash: str, log: list = ()) -> int:
+    """組織の名簿・エンジン出力を保存（既存なら置き換え）し、組織 ID を返す。
+    log のうち保存済みでない更新は、保存済みの最新版の続きの版番号に振り直して追記する
+    （log の各エントリの version も書き換える）。追記した更新で再生成対象になった社員の
+    レポート参照は破棄する。
+    """
+    n = len(roster["keys"])
+    now = datetime.now().isoformat(timespec="seconds")
+    labels = roster["dept_labels"]
+    birth = roster["birth"].astype(str)
+    with _connect(path) as con:
+        con.execute(
+            "INSERT INTO orgs (name, roster_hash, version, n_members, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET roster_hash = excluded.roster_hash, "
+            "version = excluded.version, n_members = excluded.n_members, updated_at = excluded.updated_at",
+            (org, roster_hash, 0, n, now))
+        org_id = con.execute("SELECT id FROM orgs WHERE name = ?", (org,)).fetchone()[0]
+
+        stored = con.execute("SELECT version, entry FROM changelog WHERE org_id = ?", (org_id,)).fetchall()
+        known = {_entry_key(json.loads(e)) for _, e in stored}
+        version = max((v for v, _ in stored), default=0)
+        added = []
+        for e in log:
+            if _entry_key(e) not in known:
+                version += 1
+                added.append((e, version))
+        con.executemany("INSERT INTO changelog VALUES (?, ?, ?, ?)",
+                        [(org_id, v, e["at"], json.dumps({**e, "version": v}, ensure_ascii=False))
+                         for e, v in added])
+        con.execute("UPDATE orgs SET version = ? WHERE id = ?", (max(version, 1), org_id))
+
+        con.execute("DELETE FROM members WHERE org_id = ?", (org_id,))
+        cols = [codes[f].tolist() for f in caltable.FIELDS]
+        con.executemany(
+            f"INSERT INTO members VALUES ({', '.join('?' * (8 + len(caltable.FIELDS)))})",
+            zip([org_id] * n, range(n), roster["keys"], roster["names"], birth,
+                [labels[d] for d in roster["dept"].tolist()], roster["roles"],
+                roster["manager"].tolist(), *cols))
+
+        snap = [(f, *_blob(roster[f])) for f in _ARRAY_COLUMNS]
+        snap += [(f, *_blob(codes[f])) for f in caltable.FIELDS]
+        snap += [(f, "json", json.dumps(roster[f], ensure_ascii=False).encode("utf-8"))
+                 for f in _JSON_COLUMNS]
+        con.executemany("INSERT OR REPLACE INTO columns VALUES (?, ?, ?, ?)",
+                        [(org_id, f, dt, data) for f, dt, data in snap])
+
+        con.execute("ANALYZE members")   # 条件ごとに部署 / 中心星 / 天中殺のインデックスを選ばせる
+        con.executemany("DELETE FROM reports WHERE org_id = ? AND key = ?",
+                        [(org_id, k) for k in dict.fromkeys(k for e, _ in added for k in e["reports"])])
+    for e, v in added:
+        e["version"] = v
+    return org_id
+
+
+def list_orgs(path) -> list[dict]:
+    """保存済みの組織一覧（更新日時の新しい順）。"""
+    with _connect(path) as con:
+        rows = con.execute(
+            "SELECT name, roster_hash, version, n_members, updated_at FROM orgs ORDER BY updated_at DESC").fetchall()
+    return [dict(zip(("name", "roster_hash", "version", "n_members", "updated_at"), r)) for r in rows]
+
+
+def load(path, org: str) -> tuple[dict, dict, dict] | None:
+    """組織を開く。戻り値は (名簿, エンジン出力, メタ情報)。メタ情報は roster_hash / version / log。
+    存在しなければ None。
+    """
+    with _connect(path) as con:
+        meta = con.execute("SELECT id, roster_hash, version FROM orgs WHERE name = ?", (org,)).fetchone()
+        if meta is None:
+            return None
+        org_id, rhash, version = meta
+        snap = con.execute("SELECT field, dtype, data FROM columns WHERE org_id = ?", (org_id,)).fetchall()
+        log = [json.loads(e) for (e,) in con.execute(
+            "SELECT entry FROM changelog WHERE org_id = ? ORDER BY version", (org_id,))]
+    import numpy as np
+    cols = {f: json.loads(data) if dt == "json" else np.frombuffer(data, dtype=dt).copy()
+            for f, dt, data in snap}
+    roster = {f: cols[f] for f in _ARRAY_COLUMNS + _JSON_COLUMNS}
+    codes = {f: cols[f] for f in caltable.FIELDS}
+    return roster, codes, {"roster_hash": rhash, "version": version, "log": log}
+
+
+def query_members(path, org: str, dept: str | None = None, center: int | None = None,
+                  tenchu: int | None = None, limit: int = 1000) -> list[dict]:
+    """部署名・中心星コード・天中殺グループで絞り込んだメンバー（インデックス検索）。"""
+    where, args = ["m.org_id = o.id", "o.name = ?"], [org]
+    for col, v in (("dept", dept), ("center", center), ("tenchu", tenchu)):
+        if v is not None:
+            where.append(f"m.{col} = ?")
+            args.append(v)
+    with _connect(path) as con:
+        cur = con.execute(
+            f"SELECT m.* FROM members m, orgs o WHERE {' AND '.join(where)} ORDER BY m.row LIMIT ?",
+            (*args, limit))
+        names = [d[0] for d in cur.description]
+        return [dict(zip(names, r)) for r in cur.fetchall()]
+
+
+def add_reports(path, org: str, kind: str, refs: dict):
+    """生成済みレポートの参照 {社員キー: 参照} を記録する（同じ社員・種類は上書き）。組織が無ければ何もしない。"""
+    now = datetime.now().isoformat(timespec="seconds")
+    with _connect(path) as con:
+        row = con.execute("SELECT id FROM orgs WHERE name = ?", (org,)).fetchone()
+        if row is not None:
+            con.executemany("INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?)",
+                            [(row[0], key, kind, ref, now) for key, ref in refs.items()])
+
+
+def list_reports(path, org: str, key: str | None = None) -> list[dict]:
+    """記録済みのレポート参照（key を指定すればその社員の分だけ）。"""
+    with _connect(path) as con:
+        rows = con.execute(
+            "SELECT r.key, r.kind, r.ref, r.created_at FROM reports r JOIN orgs o ON o.id = r.org_id "
+            "WHERE o.name = ? AND (? IS NULL OR r.key = ?) ORDER BY r.key, r.kind",
+            (org, key, key)).fetchall()
+    return [dict(zip(("key", "kind", "ref", "created_at"), r)) for r in rows]
+
+
+def delete_org(path, org: str):
+    """組織を削除する（メンバー・列・変更ログ・レポート参照も外部キーでまとめて消える）。"""
+    with _connect(path) as con:
+        con.execute("DELETE FROM orgs WHERE name = ?", (org,))
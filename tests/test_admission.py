@@ -0,0 +1,59 @@
+import threading
+import time
+
+import pytest
+
+from sanmei.admission import QueueFull, RenderQueue
+
+
+class _Rerun(Exception):
+    """Streamlit の RerunException / StopException の代わり。"""
+
+
+def _hold(q: RenderQueue, session: str, release: threading.Event, entered: threading.Event):
+    with q.slot(session):
+        entered.set()
+        release.wait(5)
+
+
+@pytest.mark.parametrize("admit_first", [False, True])
+def test_on_wait_exception_does_not_leak_slot(admit_first):
+    q = RenderQueue(concurrency=1, max_waiting=4, timeout=5)
+    release, entered = threading.Event(), threading.Event()
+    holder = threading.Thread(target=_hold, args=(q, "a", release, entered))
+    holder.start()
+    assert entered.wait(5)
+
+    def on_wait(pos):
+        if admit_first:              # 待っている間に枠が空き、通過した後で例外になる場合
+            release.set()
+            holder.join(5)
+        raise _Rerun
+
+    with pytest.raises(_Rerun):
+        with q.slot("b", on_wait=on_wait):
+            pytest.fail("例外で抜けたのに描画枠に入った")
+    release.set()
+    holder.join(5)
+
+    m = q.metrics()
+    assert (m["running"], m["waiting"], m["sessions"]) == (0, 0, 0)
+    t0 = time.monotonic()
+    with q.slot("c"):                # 次の要求は待たずに通る
+        pass
+    assert time.monotonic() - t0 < 1.0
+
+
+def test_timeout_withdraws_ticket():
+    q = RenderQueue(concurrency=1, max_waiting=4, timeout=0.2)
+    release, entered = threading.Event(), threading.Event()
+    holder = threading.Thread(target=_hold, args=(q, "a", release, entered))
+    holder.start()
+    assert entered.wait(5)
+    with pytest.raises(QueueFull):
+        with q.slot("b"):
+            pass
+    release.set()
+    holder.join(5)
+    m = q.metrics()
+    assert (m["running"], m["waiting"], m["timed_out"]) == (0, 0, 1)
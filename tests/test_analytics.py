@@ -0,0 +1,20 @@
+import threading
+
+from sanmei import analytics
+
+
+def test_stop_survives_a_full_batch(tmp_path, monkeypatch):
+    sink = analytics.Sink(tmp_path / "analytics.db")
+    sink.close()                                  # 書き込み係は止め、キューの並びをこちらで決める
+    monkeypatch.setattr(analytics, "BATCH", 2)
+    sink._con = analytics._open(sink.path)
+    row = ("2026-01-01T00:00:00", "2026-01-01", "diagnosis", "p1", "")
+    for item in (row, analytics._STOP, row, row):  # 停止要求が BATCH で区切られるバッチの途中に来る
+        sink._q.put(item)
+
+    writer = threading.Thread(target=sink._run, daemon=True)
+    writer.start()
+    writer.join(analytics.INTERVAL * 3 + 2)
+    assert not writer.is_alive()
+    assert sink.stats()["written"] == 3
+    assert analytics.totals(sink.path)["p1"]["diagnosis"] == 3
@@ -0,0 +1,38 @@
+import os
+import time
+
+from sanmei import bulk
+
+
+def test_clean_periodically_removes_expired_without_new_zip(tmp_path):
+    old, fresh = tmp_path / "old.zip", tmp_path / "fresh.zip"
+    old.write_bytes(b"x")
+    fresh.write_bytes(b"x")
+    past = time.time() - bulk.MAX_AGE_S - 10
+    os.utime(old, (past, past))
+
+    bulk.clean_periodically(interval=0.05, directory=tmp_path)
+    deadline = time.monotonic() + 5
+    while old.exists() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert not old.exists()
+    assert fresh.exists()
+
+
+def test_write_file_leaves_only_the_finished_export(tmp_path):
+    import pyarrow.parquet as pq
+
+    from sanmei import export
+    from sanmei.batch import compute_codes
+    from sanmei.roster import parse_roster_csv
+    roster, _ = parse_roster_csv("社員ID,氏名,生年月日,部署\nA1,佐藤,1980-01-01,営業部\nA2,鈴木,1985-05-05,開発部")
+    batches = export.roster_batches(roster, compute_codes(roster["birth"]))
+
+    path, rows = bulk.write_file(lambda f: export.write(batches, f, "parquet"), ".parquet", directory=tmp_path)
+    assert rows == 2 and pq.read_table(path).num_rows == 2
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]
+    assert bulk.url_for(path) == f"{bulk.URL_PREFIX}/{path.name}"
+
+    past = time.time() - bulk.MAX_AGE_S - 10
+    os.utime(path, (past, past))
+    assert bulk.cleanup(directory=tmp_path) == 1
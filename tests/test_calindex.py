@@ -0,0 +1,62 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from sanmei import caltable, calindex
+from sanmei.engine import _TENCHU_GROUPS, BRANCHES, STAR_NAMES, STEMS
+
+
+def _scan(start, end, **pattern) -> list[date]:
+    """calindex を使わず、カレンダー表の全日の値を文字列に戻して条件を見る。"""
+    t = caltable.as_array()
+    pillar = lambda s, b: np.array([STEMS[x] + BRANCHES[y] for x, y in zip(t[s].tolist(), t[b].tolist())])
+    values = {
+        **{k: np.array(STAR_NAMES)[t[k]] for k in calindex.POSITIONS},
+        "day_pillar":   pillar("ds", "db"),
+        "month_pillar": pillar("ms", "mb"),
+        "year_pillar":  pillar("ys", "yb"),
+        "tenchu":       np.array(_TENCHU_GROUPS)[t["tenchu"]],
+    }
+    hit = np.ones(len(t), dtype=bool)
+    for key, want in pattern.items():
+        hit &= np.isin(values[key], [want] if isinstance(want, str) else list(want))
+    first, last = caltable.date_range()
+    days = [first + timedelta(days=int(o)) for o in np.flatnonzero(hit)]
+    return [d for d in days if (start is None or d >= start) and (end is None or d <= end)]
+
+
+def _runs(days: list[date]) -> list[tuple[date, date]]:
+    out: list = []
+    for d in days:
+        if out and out[-1][1] + timedelta(days=1) == d:
+            out[-1] = (out[-1][0], d)
+        else:
+            out.append((d, d))
+    return out
+
+
+@pytest.mark.parametrize("start, end, pattern", [
+    (None, None, {"center": "牽牛星", "head": "車騎星"}),
+    (date(1980, 1, 1), date(1990, 12, 31), {"day_pillar": "丁未"}),
+    (date(1975, 6, 1), date(1976, 6, 1), {"month_pillar": ["戊子", "己丑"], "tenchu": "午未"}),
+    (date(2000, 2, 1), date(2000, 3, 1), {"year_pillar": "庚辰", "left": ("貫索星", "石門星")}),
+    (date(1890, 1, 1), date(1901, 1, 1), {"feet": "禄存星", "right": "調舒星", "tenchu": ["子丑", "戌亥"]}),
+    (date(2010, 1, 1), date(2011, 1, 1), {}),
+    (date(2011, 1, 1), date(2010, 1, 1), {"center": "牽牛星"}),
+])
+def test_find_and_ranges_match_a_full_scan(start, end, pattern):
+    expected = _scan(start, end, **pattern)
+    got = calindex.find(start, end, **pattern)
+    assert [d.item() for d in got] == expected
+    assert calindex.count(start, end, **pattern) == len(expected)
+    assert calindex.ranges(start, end, **pattern) == _runs(expected)
+
+
+def test_unknown_keys_and_values_are_errors():
+    with pytest.raises(ValueError):
+        calindex.find(star="牽牛星")
+    with pytest.raises(ValueError):
+        calindex.find(center="牽牛")
+    with pytest.raises(ValueError):
+        calindex.find(center=[])
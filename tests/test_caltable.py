@@ -0,0 +1,44 @@
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from sanmei import caltable
+from sanmei.engine import calc_gototoku
+
+
+def _day(offset: int) -> date:
+    return caltable.date_range()[0] + timedelta(days=int(offset))
+
+
+def test_lookup_matches_the_engine_on_sample_dates():
+    first, last = caltable.date_range()
+    rng = random.Random(0)
+    days = [first, last, date(1988, 3, 14), date(2000, 2, 29)]
+    days += [first + timedelta(days=rng.randrange((last - first).days + 1)) for _ in range(500)]
+    for d in days:
+        assert caltable.lookup(d) == calc_gototoku(d), d
+
+
+def test_lookup_matches_the_engine_around_setsuiri_and_risshun():
+    term = caltable.as_array()["term"]
+    lo, hi = caltable.day_offset(date(1999, 12, 1)), caltable.day_offset(date(2002, 3, 1))
+    flagged = lo + np.flatnonzero(term[lo:hi])
+    years = [int(o) for o in flagged if term[o] & caltable.TERM_YEAR]
+    assert len(years) == 3 and len(flagged) == 27          # 立春は毎年 1 回、節入りは毎月 1 回
+    for o in flagged.tolist():
+        before, on = _day(o - 1), _day(o)
+        assert caltable.lookup(before) == calc_gototoku(before), before
+        assert caltable.lookup(on) == calc_gototoku(on), on
+        assert calc_gototoku(before)["month_pillar"] != calc_gototoku(on)["month_pillar"]
+    for o in years:                                        # 年柱は立春の日から変わる
+        assert _day(o).month == 2
+        assert calc_gototoku(_day(o - 1))["year_pillar"] != calc_gototoku(_day(o))["year_pillar"]
+
+
+def test_outside_the_table_is_an_error():
+    first, last = caltable.date_range()
+    for d in (first - timedelta(days=1), last + timedelta(days=1)):
+        with pytest.raises(ValueError):
+            caltable.lookup(d)
@@ -0,0 +1,70 @@
+import numpy as np
+
+from sanmei import batch
+from sanmei.distribution import aggregate, from_counts
+from sanmei.incremental import dept_buckets, new_state, partner_scores, restore, roster_codes, update
+from sanmei.roster import parse_roster_csv
+
+
+def _roster(rows):
+    roster, errors = parse_roster_csv("社員ID,氏名,生年月日,部署\n" + "\n".join(rows))
+    assert roster is not None, errors
+    return roster
+
+
+def test_buckets_give_the_same_distribution_as_a_full_recount():
+    state = new_state()
+    update(state, _roster(["A1,佐藤,1980-01-01,営業部", "A2,鈴木,1985-05-05,営業部", "A3,高橋,1990-09-09,開発部"]))
+    roster = _roster(["A2,鈴木,1985-05-06,開発部", "A3,高橋,1990-09-09,開発部", "A4,伊藤,1975-12-31,総務部"])
+    update(state, roster)
+
+    b = dept_buckets(state, roster)
+    full = aggregate(batch.compute_codes(roster["birth"]), roster["dept"], len(roster["dept_labels"]))
+    fed = from_counts(b["center"], b["tenchu"])
+    assert fed.keys() == full.keys()
+    for k in full:
+        assert np.array_equal(fed[k], full[k]), k
+    assert np.array_equal(roster_codes(state)["center"], batch.compute_codes(roster["birth"])["center"])
+
+
+def _check_against_a_rebuild(state: dict, roster: dict):
+    """差分更新した状態が、同じ名簿を最初から流し込んだ状態・全員の再計算と一致すること。"""
+    full = batch.compute_codes(roster["birth"])
+    fresh = new_state(with_matrix=True)
+    update(fresh, roster)
+    saved = restore(roster, full, state["log"], with_matrix=True)
+    for f in full:
+        assert np.array_equal(roster_codes(state)[f], full[f]), f
+        assert np.array_equal(roster_codes(saved)[f], full[f]), f
+    for other in (fresh, saved):
+        for name, b in dept_buckets(state, roster).items():
+            assert np.array_equal(b, dept_buckets(other, roster)[name]), name
+        rows = np.arange(len(roster["keys"]))
+        assert np.allclose([partner_scores(state, r) for r in rows], [partner_scores(other, r) for r in rows])
+    assert dept_buckets(state, roster)["center"].sum() == len(roster["keys"])
+
+
+def test_update_matches_a_full_recompute_after_hires_leavers_and_transfers():
+    state = new_state(with_matrix=True)
+    v1 = _roster(["A1,佐藤,1980-01-01,営業部", "A2,鈴木,1985-05-05,営業部",
+                  "A3,高橋,1990-09-09,開発部", "A4,田中,1972-07-07,総務部"])
+    update(state, v1)
+    _check_against_a_rebuild(state, v1)
+
+    v2 = _roster(["A2,鈴木,1985-05-05,開発部",       # 異動
+                  "A3,高橋,1990-09-10,開発部",       # 生年月日の訂正
+                  "A4,田中 一郎,1972-07-07,総務部",  # 改名
+                  "A5,伊藤,1995-02-04,企画部",       # 入社（新しい部署）
+                  "A6,渡辺,2000-02-03,営業部"])      # 入社（A1 は退職）
+    e = update(state, v2)
+    assert e["added"] == ["A5", "A6"] and e["removed"] == ["A1"]
+    assert e["changed"] == {"A2": ["dept"], "A3": ["birth"], "A4": ["name"]}
+    assert sorted(e["reports"]) == ["A3", "A4", "A5", "A6"]
+    assert e["recomputed"] == 3 and e["matrix_rows"] == 3
+    assert state["slot_of"]["A5"] == 0                  # 退職者（A1）の空きスロットを再利用
+    _check_against_a_rebuild(state, v2)
+
+    v3 = _roster(["A5,伊藤,1995-02-04,企画部", "A7,山本,1968-11-11,営業部"])   # 部署ごと退職
+    update(state, v3)
+    _check_against_a_rebuild(state, v3)
+    assert state["version"] == 3 and [x["version"] for x in state["log"]] == [1, 2, 3]
@@ -0,0 +1,56 @@
+import threading
+
+from sanmei import metrics
+
+
+def _in_thread(fn):
+    th = threading.Thread(target=fn)
+    th.start()
+    th.join(5)
+    return th.ident
+
+
+def test_trace_detaches_when_thread_ends():
+    entries = []
+
+    def run():                       # st.stop / 例外で trace(None) まで届かなかった再実行
+        metrics.trace(entries)
+        with metrics.stage("t.inside"):
+            pass
+
+    ident = _in_thread(run)
+    assert entries == [("stage", "t.inside", entries[0][2])]
+    assert ident not in metrics._traces and not metrics._traces
+    assert metrics.stage("t.after") is metrics._NULL      # 速い経路に戻る
+
+    _in_thread(lambda: metrics.count("t.reused"))        # 同じ thread id が再利用されても追記しない
+    assert len(entries) == 1
+
+
+def test_reattach_and_explicit_detach_from_other_thread():
+    entries, ident = [], []
+
+    def run():
+        metrics.trace(entries)
+        metrics.trace(entries)       # 同じ thread で付け直しても外れない
+        metrics.count("t.a")
+        ident.append(threading.get_ident())
+        metrics.trace(None, ident[0])
+        metrics.count("t.b")
+
+    _in_thread(run)
+    assert [e[1] for e in entries] == ["t.a"]
+    assert not metrics._traces
+
+
+def test_trace_length_is_capped(monkeypatch):
+    monkeypatch.setattr(metrics, "MAX_TRACE", 3)
+    entries = []
+    metrics.trace(entries)
+    try:
+        for _ in range(10):
+            metrics.count("t.n")
+    finally:
+        metrics.trace(None)
+    assert len(entries) == 3
+    assert not metrics._traces
@@ -0,0 +1,15 @@
+import numpy as np
+
+from sanmei.batch import RELATIONS, relation_codes
+
+
+def test_relation_codes_uint8_matches_signed():
+    ea, eb = np.meshgrid(np.arange(5), np.arange(5), indexing="ij")
+    expected = relation_codes(ea.astype(np.int64), eb.astype(np.int64))
+    np.testing.assert_array_equal(relation_codes(ea.astype(np.uint8), eb.astype(np.uint8)), expected)
+
+
+def test_relation_codes_uint8_water_feeds_wood():
+    # 水(4) → 木(0) は A→B 相生。uint8 のまま引くと 0 - 4 が 252 になり相克と判定していた
+    ea, eb = np.array([4], dtype=np.uint8), np.array([0], dtype=np.uint8)
+    assert RELATIONS[relation_codes(ea, eb)[0]] == "A→B 相生"
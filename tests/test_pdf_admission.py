@@ -0,0 +1,155 @@
+"""PDF の回数制限・描画枠は st.cache_data に無いときだけ通ること（app.py の _admission / _admitted）。"""
+
+from datetime import date
+from pathlib import Path
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from sanmei import admission
+from sanmei.engine import calc_gototoku
+
+APP = str(Path(__file__).resolve().parent.parent / "app.py")
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    st.cache_data.clear()
+    st.cache_resource.clear()      # 回数制限・描画キューは設定ごとに作り直す
+    yield
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+def _paid_personal(tmp_path) -> AppTest:
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.secrets["WORKSPACE_DB"]     = str(tmp_path / "workspace.db")
+    at.secrets["ANALYTICS_DB"]     = ""
+    at.secrets["RATE_LIMIT_STORE"] = "memory"
+    at.secrets["RATE_LIMITS"]      = "pdf.session=1/1, bulk.session=1/1"
+    at.run()
+    at.session_state["p1_result"] = calc_gototoku(date(1988, 3, 14))
+    at.session_state["p1_name"]   = "試験 太郎"
+    at.session_state["paid_p1"]   = True
+    return at
+
+
+def _pdf_buttons(at: AppTest) -> list:
+    return [b for b in at.get("download_button") if "PDF" in b.proto.label]
+
+
+def test_cache_hits_skip_the_limiter_and_evicted_pdfs_do_not(tmp_path):
+    at = _paid_personal(tmp_path)
+    at.run()
+    assert not at.exception and _pdf_buttons(at)
+
+    at.run()                                  # キャッシュ済み：回数制限の 1 回分を使い切っていても出せる
+    assert not at.exception and not at.error and _pdf_buttons(at)
+
+    st.cache_data.clear()                     # キャッシュから消えた PDF は描画し直すので制限に掛かる
+    at.run()
+    assert not _pdf_buttons(at)
+    assert any("お待ち" in e.value for e in at.error)
+
+
+def test_waiting_for_a_slot_is_shown_outside_the_cache(tmp_path, monkeypatch):
+    waited = []
+
+    class _Busy(admission.RenderQueue):      # 1 回目の要求だけ順番待ちになったことにする
+        def slot(self, session, on_wait=None):
+            if on_wait is not None and not waited:
+                waited.append(True)
+                on_wait(1)                   # _admission では _MustWait で抜ける
+            return super().slot(session, on_wait)
+
+    monkeypatch.setattr(admission, "RenderQueue", _Busy)
+    at = _paid_personal(tmp_path)
+    at.secrets["RATE_LIMIT_STORE"] = "off"
+    at.run()
+    assert waited and not at.exception and _pdf_buttons(at)
+    at.run()                                  # キャッシュから返すときに待ち表示は再生されない
+    assert not at.exception and _pdf_buttons(at)
+
+
+def _team(tmp_path) -> AppTest:
+    from sanmei.incremental import new_state, update
+    from sanmei.roster import parse_roster_csv, roster_hash
+    roster, errors = parse_roster_csv("社員ID,氏名,生年月日,部署\nA1,佐藤,1980-01-01,営業部\nA2,鈴木,1985-05-05,開発部")
+    assert roster is not None, errors
+    state = new_state()
+    update(state, roster)
+
+    at = _paid_personal(tmp_path)
+    at.session_state["paid_p1"]          = False
+    at.session_state["team_state"]       = state
+    at.session_state["team_roster"]      = roster
+    at.session_state["team_roster_hash"] = roster_hash(roster)
+    at.run()
+    return at
+
+
+def test_team_forecast_pdf_is_rendered_only_on_request(tmp_path):
+    at = _team(tmp_path)
+    at.selectbox(key="team_fc_dept").set_value("営業部").run()
+    at.slider(key="team_fc_years").set_value(5).run()
+    assert not at.exception and not at.error      # 条件を動かしただけでは描画せず、回数制限も使わない
+    assert not _pdf_buttons(at)
+
+    at.button(key="team_fc_pdf_btn").click().run()
+    assert not at.exception and not at.error and _pdf_buttons(at)
+    at.run()                                      # 作成済みの条件のままならキャッシュから返す
+    assert not at.error and _pdf_buttons(at)
+    at.slider(key="team_fc_years").set_value(6).run()
+    assert not _pdf_buttons(at)
+
+
+def test_bulk_zip_is_charged_per_job(tmp_path, monkeypatch):
+    from sanmei import bulk
+    jobs = []
+
+    def _write_zip(items, render, on_progress=None):
+        jobs.append([name for name, _ in items])
+        path = tmp_path / f"{len(jobs)}.zip"
+        path.write_bytes(b"zip")
+        return path
+
+    monkeypatch.setattr(bulk, "write_zip", _write_zip)
+    at = _team(tmp_path)
+    at.button(key="team_bulk_btn").click().run()
+    assert not at.exception and len(jobs) == 1 and len(jobs[0]) == 2
+    at.button(key="team_bulk_btn").click().run()     # 2 回目は作成せずに待ち時間を出す
+    assert len(jobs) == 1
+    assert any("お待ち" in w.value for w in at.warning)
+
+
+def test_bulk_zip_of_a_saved_org_is_offered_again_after_reopening(tmp_path, monkeypatch):
+    import zipfile
+
+    from sanmei import bulk, workspace
+
+    def _write_zip(items, render, on_progress=None):
+        path = tmp_path / "saved.zip"
+        with zipfile.ZipFile(path, "w") as zf:
+            for name, _ in items:
+                zf.writestr(name, b"%PDF")
+        return path
+
+    monkeypatch.setattr(bulk, "BULK_DIR", tmp_path)
+    monkeypatch.setattr(bulk, "write_zip", _write_zip)
+    at = _team(tmp_path)
+    at.text_input(key="team_ws_name").input("組織").run()
+    at.button(key="team_ws_save").click().run()
+    at.button(key="team_bulk_btn").click().run()
+    db = str(tmp_path / "workspace.db")
+    assert {r["key"]: r["ref"] for r in workspace.list_reports(db, "組織")} == {"A1": "saved.zip", "A2": "saved.zip"}
+
+    at.button(key="team_ws_open_btn").click().run()    # 開き直すと前の ZIP をそのまま渡す
+    assert not at.exception and at.session_state["team_bulk"] == (str(tmp_path / "saved.zip"), 2)
+
+    at.text_input(key="team_ws_q_dept").input("営業部").run()
+    assert [list(d.value["社員ID"]) for d in at.dataframe if "社員ID" in d.value] == [["A1"]]
+
+    at.checkbox(key="team_ws_delete_ok").check().run()
+    at.button(key="team_ws_delete_btn").click().run()
+    assert not at.exception and workspace.list_orgs(db) == [] and workspace.list_reports(db, "組織") == []
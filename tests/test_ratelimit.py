@@ -0,0 +1,26 @@
+import logging
+
+from sanmei import ratelimit
+
+
+def test_load_rules_falls_back_on_bad_spec(caplog):
+    with caplog.at_level(logging.ERROR, logger="sanmei.ratelimit"):
+        rules = ratelimit.load_rules("diagnosis.session=abc")
+    assert rules == ratelimit.DEFAULT_RULES
+    assert "RATE_LIMITS" in caplog.text
+    assert ratelimit.load_rules("pdf.client=0")["pdf"]["client"] is None
+
+
+def test_is_public():
+    assert ratelimit.is_public("8.8.8.8")
+    assert ratelimit.is_public("2001:4860:4860::8888")
+    for ip in ("10.0.0.5", "172.16.3.4", "192.168.1.1", "127.0.0.1", "::1", "fe80::1", "", None, "proxy"):
+        assert not ratelimit.is_public(ip)
+
+
+def test_client_bucket_only_when_given():
+    limiter = ratelimit.Limiter(ratelimit.MemoryStore(), ratelimit.parse_rules("checkout.session=1/1"))
+    assert limiter.check("checkout", "s1", "")[0] == 0
+    assert limiter.check("checkout", "s2", "")[0] == 0      # クライアント単位は見ない
+    wait, scope = limiter.check("checkout", "s1", "")
+    assert wait > 0 and scope == "session"
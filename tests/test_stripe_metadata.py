@@ -0,0 +1,56 @@
+"""決済完了の戻り URL（?status=success&session_id=…）で、Checkout セッションの metadata から
+氏名・生年月日を復元できること。stripe-python 8 以降の StripeObject は dict ではない。"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("stripe")
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+APP = str(Path(__file__).resolve().parent.parent / "app.py")
+
+
+class _StripeStub(BaseHTTPRequestHandler):
+    def do_GET(self):
+        session_id = self.path.split("?", 1)[0].rsplit("/", 1)[-1]
+        body = json.dumps({
+            "id": session_id, "object": "checkout.session", "payment_status": "paid",
+            "metadata": {"product": "p1", "name": "試験 太郎", "birth": "1985-06-15"},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stripe_api():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StripeStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_checkout_return_restores_metadata(stripe_api, tmp_path):
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.secrets["STRIPE_SECRET_KEY"] = "sk_test_restore"
+    at.secrets["STRIPE_API_BASE"]   = stripe_api
+    at.secrets["WORKSPACE_DB"]      = str(tmp_path / "workspace.db")
+    at.secrets["ANALYTICS_DB"]      = ""
+    at.secrets["RATE_LIMIT_STORE"]  = "off"
+    at.query_params["status"]     = "success"
+    at.query_params["session_id"] = "cs_test_restore_metadata"
+    at.query_params["product"]    = "p1"
+    at.run()
+    assert not at.exception
+    assert at.session_state["paid_p1"]
+    assert at.session_state["p1_name"] == "試験 太郎"
+    assert at.session_state["p1_result"] is not None
@@ -0,0 +1,53 @@
+import itertools
+from datetime import date
+
+import numpy as np
+import pytest
+
+from sanmei.batch import compute_codes
+from sanmei.teams import search_teams, team_score
+
+
+def _codes(n: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    births = np.datetime64(date(1960, 1, 1)) + rng.integers(0, 365 * 40, n).astype("timedelta64[D]")
+    return compute_codes(births)
+
+
+def _classes(codes: dict, team) -> tuple:
+    """チームのクラス構成（search_teams と同じ (五行, 右手, 足, 天中殺) の並び）。"""
+    return tuple(sorted((int(codes["center"][r] // 2), int(codes["right"][r]), int(codes["feet"][r]),
+                         int(codes["tenchu"][r])) for r in team))
+
+
+def _brute(codes: dict, pool, k: int) -> dict:
+    """クラス構成 → (スコア, その構成のチーム数) を全列挙で求める。"""
+    found: dict = {}
+    for team in itertools.combinations(pool, k):
+        key = _classes(codes, team)
+        score = team_score(codes, list(team))["score"]
+        prev = found.get(key)
+        assert prev is None or prev[0] == pytest.approx(score)   # 同じクラス構成なら同点
+        found[key] = (score, (prev[1] if prev else 0) + 1)
+    return found
+
+
+@pytest.mark.parametrize("seed, k, top", [(0, 3, 5), (1, 4, 8), (2, 5, 3)])
+def test_search_matches_brute_force(seed, k, top):
+    codes = _codes(40, seed)
+    pool = np.arange(3, 19)
+    found = _brute(codes, pool.tolist(), k)
+    best = sorted((s for s, _ in found.values()), reverse=True)[:top]
+
+    res = search_teams(codes, pool, k, top=top, time_budget=60.0)
+    assert not res["stats"]["timed_out"]
+    assert res["scores"] == pytest.approx(best)
+    for team, score, alts in zip(res["teams"], res["scores"], res["alternatives"]):
+        assert len(set(team.tolist())) == k and set(team.tolist()) <= set(pool.tolist())
+        assert team_score(codes, team)["score"] == pytest.approx(score)
+        assert found[_classes(codes, team)][1] == alts + 1    # 入れ替え案の数も全列挙と一致
+
+
+def test_pool_smaller_than_team():
+    res = search_teams(_codes(5, 0), [0, 1], 3)
+    assert res["teams"] == [] and res["stats"]["evaluated"] == 0
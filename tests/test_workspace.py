@@ -0,0 +1,46 @@
+from sanmei import workspace
+from sanmei.incremental import new_state, restore, roster_codes, update
+from sanmei.roster import parse_roster_csv
+
+
+def _roster(rows):
+    roster, errors = parse_roster_csv("社員ID,氏名,生年月日,部署\n" + "\n".join(rows))
+    assert roster is not None, errors
+    return roster
+
+
+def _save(db, org, state, roster):
+    workspace.save(db, org, roster, roster_codes(state), "h", state["log"])
+
+
+def test_resaving_other_roster_appends_version(tmp_path):
+    db = tmp_path / "ws.db"
+    a = _roster(["A1,佐藤,1980-01-01,営業部", "A2,鈴木,1985-05-05,営業部"])
+    sa = new_state()
+    update(sa, a)
+    _save(db, "組織", sa, a)
+
+    b = _roster(["B1,田中,1990-02-02,開発部"])      # 別のセッションで別の名簿を同じ名前に保存
+    sb = new_state()
+    update(sb, b)
+    _save(db, "組織", sb, b)
+    roster, _, meta = workspace.load(db, "組織")
+    assert roster["keys"] == ["B1"]
+    assert meta["version"] == 2
+    assert [(e["version"], e["added"]) for e in meta["log"]] == [(1, ["A1", "A2"]), (2, ["B1"])]
+    assert sb["log"][-1]["version"] == 2              # セッション側の版番号も保存先に揃う
+
+    workspace.add_reports(db, "組織", "bulk_zip", {"B1": "b1.zip"})
+    _save(db, "組織", sb, b)                           # 変更なしの再保存では版もレポート参照も変わらない
+    _, _, meta = workspace.load(db, "組織")
+    assert meta["version"] == 2 and len(meta["log"]) == 2
+    assert len(workspace.list_reports(db, "組織", "B1")) == 1
+
+    roster, codes, meta = workspace.load(db, "組織")  # 開いて更新してから保存すると続きの版になる
+    state = restore(roster, codes, meta["log"])
+    b2 = _roster(["B1,田中,1990-02-03,開発部"])
+    update(state, b2)
+    _save(db, "組織", state, b2)
+    _, _, meta = workspace.load(db, "組織")
+    assert [e["version"] for e in meta["log"]] == [1, 2, 3]
+    assert workspace.list_reports(db, "組織", "B1") == []